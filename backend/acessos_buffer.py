@@ -0,0 +1,132 @@
+"""
+Buffer de logs de acesso (/api/acessos)
+A rota só coloca o acesso numa fila em memória e responde na hora; uma task em segundo plano
+grava a fila na tabela acessos com COPY a cada ACESSOS_LOTE linhas ou ACESSOS_INTERVALO_MS.
+A fila é limitada: quando enche, novos acessos são descartados (e contados) em vez de acumular memória.
+"""
+
+import asyncio
+import os
+from collections import deque
+
+import db_async
+from logs import obter_logger
+
+ACESSOS_BUFFER_MAX = int(os.getenv("ACESSOS_BUFFER_MAX", "10000"))  # acessos esperando gravação
+ACESSOS_LOTE = int(os.getenv("ACESSOS_LOTE", "500"))  # linhas por COPY
+ACESSOS_INTERVALO_MS = float(os.getenv("ACESSOS_INTERVALO_MS", "1000"))  # tempo máximo até gravar
+
+# Ordem das colunas no COPY (e nas tuplas da fila)
+COLUNAS_ACESSO = (
+    "usuario_id", "ip_address", "user_agent", "pais", "cidade", "regiao", "timezone",
+    "latitude", "longitude", "endpoint", "metodo_http", "status_code", "tempo_resposta_ms",
+)
+
+logger = obter_logger("acessos")
+
+
+async def copiar_acessos(conn, linhas) -> int:
+    """Gravar as linhas (tuplas na ordem de COLUNAS_ACESSO) com um único COPY e confirmar"""
+    async with conn.cursor() as cur:
+        async with cur.copy(f"COPY acessos ({', '.join(COLUNAS_ACESSO)}) FROM STDIN") as copy:
+            for linha in linhas:
+                await copy.write_row(linha)
+    await conn.commit()
+    return len(linhas)
+
+
+class BufferAcessos:
+    """Fila limitada de acessos + task que grava em lotes"""
+
+    def __init__(self, maximo: int = ACESSOS_BUFFER_MAX, lote: int = ACESSOS_LOTE,
+                 intervalo_ms: float = ACESSOS_INTERVALO_MS):
+        self.maximo = maximo
+        self.lote = lote
+        self.intervalo = intervalo_ms / 1000
+        self._fila = deque()
+        self._task = None
+        self._acordar = None  # criado em iniciar(), dentro do event loop do servidor
+        self._metricas = {
+            "recebidos": 0,
+            "gravados": 0,
+            "descartados": 0,
+            "lotes": 0,
+            "erros_gravacao": 0,
+            "maior_fila": 0,
+        }
+
+    def iniciar(self):
+        if self._task:
+            return
+        self._acordar = asyncio.Event()
+        self._task = asyncio.create_task(self._executar(), name="buffer-acessos")
+        logger.info("Buffer de acessos iniciado (lotes de %d, máximo %d na fila)", self.lote, self.maximo)
+
+    async def parar(self):
+        """Parar a task e gravar o que ainda está na fila"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        while self._fila:
+            if not await self.gravar_lote():
+                break
+
+    def adicionar(self, linha: tuple) -> bool:
+        """Enfileirar um acesso; retorna False se a fila está cheia (acesso descartado)"""
+        self._metricas["recebidos"] += 1
+        if len(self._fila) >= self.maximo:
+            self._metricas["descartados"] += 1
+            return False
+        self._fila.append(linha)
+        self._metricas["maior_fila"] = max(self._metricas["maior_fila"], len(self._fila))
+        if len(self._fila) >= self.lote and self._acordar:
+            self._acordar.set()
+        return True
+
+    async def _executar(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._acordar.wait(), timeout=self.intervalo)
+            except asyncio.TimeoutError:
+                pass
+            self._acordar.clear()
+
+            # Gravar enquanto houver lotes completos (ou o resto da fila, ao fim do intervalo)
+            while self._fila:
+                if not await self.gravar_lote():
+                    break
+                if len(self._fila) < self.lote:
+                    break
+
+    async def gravar_lote(self) -> bool:
+        """Gravar até `lote` acessos; em caso de erro eles voltam para a fila (se couberem)"""
+        quantidade = min(self.lote, len(self._fila))
+        linhas = [self._fila.popleft() for _ in range(quantidade)]
+        if not linhas:
+            return True
+        try:
+            async with db_async.conexao() as conn:
+                await copiar_acessos(conn, linhas)
+        except asyncio.CancelledError:
+            self._fila.extendleft(reversed(linhas))
+            raise
+        except Exception as e:
+            self._metricas["erros_gravacao"] += 1
+            logger.warning("Erro ao gravar %d acesso(s): %s", len(linhas), e)
+            espaco = self.maximo - len(self._fila)
+            devolver = linhas[:max(espaco, 0)]
+            self._metricas["descartados"] += len(linhas) - len(devolver)
+            self._fila.extendleft(reversed(devolver))
+            return False
+
+        self._metricas["lotes"] += 1
+        self._metricas["gravados"] += len(linhas)
+        return True
+
+    def metricas(self) -> dict:
+        return {
+            **self._metricas,
+            "na_fila": len(self._fila),
+            "maximo": self.maximo,
+        }
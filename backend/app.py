@@ -5,20 +5,51 @@ Conecta com PostgreSQL usando pgvector
 from supabase_client import supabase
 
 
-from fastapi import FastAPI, HTTPException, Depends, Header, Request, Query
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Depends, Header, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
-from pydantic import BaseModel
-from typing import Optional, List
+from fastapi.responses import RedirectResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from typing import Optional, List, Literal
 from datetime import datetime
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import base64
+import json
+from contextlib import asynccontextmanager, AsyncExitStack
+import psycopg
 import os
 from dotenv import load_dotenv
 from langchain_openai import OpenAIEmbeddings
+import db_async
+from embedding_cache import CacheEmbeddings, EMBEDDING_DIMENSOES, ajustar_dimensoes, hash_texto, texto_para_embedding
+from embedding_lote import MicroLoteEmbeddings
+from logs import configurar_logs, obter_logger, MiddlewareRequestId
+from compressao import MiddlewareCompressao
+from acessos_buffer import BufferAcessos, COLUNAS_ACESSO, copiar_acessos
+from embedding_worker import WorkerEmbeddings, STATUS_PENDENTE, STATUS_PRONTO
+from cotas import GerenciadorCotas, CotaExcedidaError, RECURSO_BUSCAS, RECURSO_EMBEDDINGS
+from importacao import (
+    ArquivoGrandeDemaisError,
+    ImportadorIdeias,
+    FORMATOS,
+    IMPORTACAO_MAX_BYTES,
+    criar_importacao,
+    detectar_formato,
+    guardar_corpo,
+    linhas_do_stream,
+    pedacos_do_arquivo,
+    registros,
+)
+from cache_http import calcular_etag, headers_cache, nao_modificado, versao_ideias
+from busca_cache import CacheBuscas
+from busca_vetorial import EstrategiaBusca, BUSCA_PRESET_PADRAO
+from sugestoes import CacheSugestoes, SUGESTOES_LIMITE_MAX
+from respostas import JSON_RAPIDO, RespostaJSONRapida, SerializadorModelo
+from db import DB_CONFIG, PoolEsgotadoError
 from auth import (
     criar_token_jwt,
-    verificar_token_jwt,
+    obter_usuario_atual,
+    cache_tokens,
     obter_info_google_por_code,
     hash_senha,
     verificar_senha,
@@ -27,13 +58,25 @@ from auth import (
 
 load_dotenv()
 
+configurar_logs()
+logger = obter_logger("app")
+
 # Configurar embeddings (usa API Key do .env)
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+EMBEDDING_MODELO = "text-embedding-3-small"
+EMBEDDING_DIMENSOES_MODELO = 1536  # tamanho completo do modelo
+if not 1 <= EMBEDDING_DIMENSOES <= EMBEDDING_DIMENSOES_MODELO:
+    raise ValueError(f"EMBEDDING_DIMENSOES deve estar entre 1 e {EMBEDDING_DIMENSOES_MODELO}")
 embeddings_model = None
+# Com dimensão reduzida o vetor é outro: a dimensão entra na chave do cache de embeddings
+cache_embeddings = CacheEmbeddings(
+    EMBEDDING_MODELO if EMBEDDING_DIMENSOES == EMBEDDING_DIMENSOES_MODELO
+    else f"{EMBEDDING_MODELO}@{EMBEDDING_DIMENSOES}"
+)
 
 # Caminho ABSOLUTO do .env — funciona sempre
 env_path = os.path.join(os.path.dirname(__file__), ".env")
-print("🔍 Carregando .env de: ", env_path)
+logger.info("Carregando .env de: %s", env_path)
 
 load_dotenv(dotenv_path=env_path)
 
@@ -44,23 +87,54 @@ def get_embeddings_model():
     if embeddings_model is None and OPENAI_API_KEY:
         embeddings_model = OpenAIEmbeddings(
             openai_api_key=OPENAI_API_KEY,
-            model="text-embedding-3-small"
+            model=EMBEDDING_MODELO,
+            # A API já devolve o vetor encurtado e normalizado (Matryoshka)
+            dimensions=EMBEDDING_DIMENSOES if EMBEDDING_DIMENSOES != EMBEDDING_DIMENSOES_MODELO else None
         )
     return embeddings_model
 
 
-def gerar_embedding(texto: str):
-    """Gerar embedding para um texto"""
-    model = get_embeddings_model()
-    if not model:
+# Pedidos simultâneos (worker, buscas) viram uma só chamada embed_documents
+lote_embeddings = MicroLoteEmbeddings(get_embeddings_model)
+
+
+async def gerar_embedding_ou_erro(texto: str):
+    """Gerar embedding (numpy float32) para um texto (usa o cache antes de chamar a OpenAI); levanta o erro"""
+    if not get_embeddings_model():
+        raise RuntimeError("Modelo de embeddings não configurado (OPENAI_API_KEY)")
+    return await cache_embeddings.obter(texto, lote_embeddings.embed)
+
+
+async def gerar_embedding(texto: str):
+    """Como gerar_embedding_ou_erro, mas devolve None em caso de erro (rotas)"""
+    if not get_embeddings_model():
         return None
     try:
-        return model.embed_query(texto)
+        return await gerar_embedding_ou_erro(texto)
     except Exception as e:
-        print(f"Erro ao gerar embedding: {e}")
+        logger.warning("Erro ao gerar embedding: %s", e)
         return None
 
 
+# Busca vetorial exata para usuários pequenos, HNSW (iterative scan) para os grandes
+estrategia_busca = EstrategiaBusca()
+
+# Resultados de busca em cache; invalidados a cada escrita nas ideias do usuário
+cache_buscas = CacheBuscas()
+
+# Worker que gera os embeddings das ideias pendentes em segundo plano
+# (o worker precisa do erro real: grava em embedding_erro e decide o backoff)
+worker_embeddings = WorkerEmbeddings(gerar_embedding_ou_erro, ao_atualizar=cache_buscas.invalidar_usuarios)
+
+# Logs de acesso: enfileirados em memória e gravados em lote (COPY) em segundo plano
+buffer_acessos = BufferAcessos()
+
+# Cotas do plano (limite_buscas / limite_embeddings) verificadas em memória
+cotas = GerenciadorCotas()
+
+# Índices de prefixos para o autocomplete de títulos e tags
+cache_sugestoes = CacheSugestoes()
+
 app = FastAPI(title="Sacola de Ideias API")
 
 # Configurar CORS
@@ -70,38 +144,85 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # X-Proximo-Cursor: próxima página de GET /api/ideias; X-Request-ID: id da requisição nos logs
+    expose_headers=["X-Proximo-Cursor", "X-Request-ID"],
 )
 
-# Configuração do banco de dados
+# gzip/brotli conforme o Accept-Encoding (a partir de COMPRESSAO_MINIMO bytes, inclusive no export em streaming)
+app.add_middleware(MiddlewareCompressao)
+
+# request_id por requisição (header X-Request-ID) em todos os logs + linha de acesso
+app.add_middleware(MiddlewareRequestId)
+
+# Pool de conexões assíncrono com o banco de dados (configuração em db.py / .env)
+@app.on_event("startup")
+async def iniciar_pool():
+    """Abrir o pool ao subir o servidor (as conexões mínimas abrem em segundo plano)"""
+    await db_async.abrir_pool()
+    # Sem API Key as ideias ficam pendentes até a chave ser configurada
+    if get_embeddings_model():
+        worker_embeddings.iniciar()
+    buffer_acessos.iniciar()
+    cotas.iniciar()
 
-DB_CONFIG = {
-    "host": "aws-1-us-east-2.pooler.supabase.com",
-    "database": "postgres",
-    "user": "postgres.cldvwgtcfuuhziqelljf",
-    "password": os.getenv("SUPABASE_DB_PASSWORD"),
-    "port": 5432,
-}
 
+@app.on_event("shutdown")
+async def fechar_pool():
+    await worker_embeddings.parar()
+    await buffer_acessos.parar()  # grava os acessos que ainda estão na fila
+    await cotas.parar()  # grava o saldo das cotas
+    await db_async.fechar_pool()
 
-def get_db_connection():
-    """Criar conexão com o banco de dados"""
+
+@asynccontextmanager
+async def get_db_connection():
+    """Obter conexão do pool: `async with get_db_connection() as conn:`
+
+    Transações não confirmadas com `await conn.commit()` são desfeitas na devolução.
+    """
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        return conn
-    except psycopg2.OperationalError as e:
-        print(f"❌ Erro de conexão com o banco: {e}")
-        print(f"   Verifique se o PostgreSQL está rodando")
-        print(f"   Config: {DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}")
+        conn = await db_async.retirar()
+    except PoolEsgotadoError as e:
+        logger.error("Pool de conexões esgotado: %s", e)
+        raise HTTPException(
+            status_code=503,
+            detail="Servidor ocupado: nenhuma conexão com o banco disponível. Tente novamente."
+        )
+    except psycopg.OperationalError as e:
+        logger.error(
+            "Erro de conexão com o banco (%s:%s/%s): %s",
+            DB_CONFIG['host'], DB_CONFIG['port'], DB_CONFIG['database'], e
+        )
         raise HTTPException(
             status_code=503,
             detail=f"Erro ao conectar ao banco de dados. Verifique se o PostgreSQL está rodando. Detalhes: {str(e)}"
         )
     except Exception as e:
-        print(f"❌ Erro ao conectar ao banco: {e}")
+        logger.exception("Erro ao conectar ao banco")
         raise HTTPException(
             status_code=500,
             detail=f"Erro inesperado ao conectar ao banco: {str(e)}"
         )
+    try:
+        yield conn
+    finally:
+        await db_async.devolver(conn)
+
+
+async def verificar_cota(usuario_id: int, recurso: str):
+    """Gastar cota do plano do usuário ou responder 429 (Too Many Requests)"""
+    try:
+        await cotas.consumir(usuario_id, recurso)
+    except CotaExcedidaError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.segundos_para_tentar)}
+        )
+
+
+# Colunas devolvidas ao cliente (sem o embedding, que é grande e não faz parte da resposta)
+COLUNAS_IDEIA = "id, titulo, tag, ideia, data, created_at, updated_at, conteudo_hash, embedding_hash, embedding_status"
 
 
 # Modelos Pydantic
@@ -124,18 +245,68 @@ class IdeiaResponse(IdeiaBase):
     data: datetime
     created_at: datetime
     updated_at: datetime
+    # Fingerprints (sha256 do texto normalizado): se forem diferentes, o embedding está desatualizado
+    conteudo_hash: Optional[str] = None
+    embedding_hash: Optional[str] = None
+    # pending (na fila do worker), ready ou failed
+    embedding_status: Optional[str] = None
 
     class Config:
         from_attributes = True
 
 
+class IdeiaResumo(BaseModel):
+    """Ideia com projeção de campos (`fields=`): só os campos pedidos aparecem na resposta"""
+    id: int
+    data: datetime
+    titulo: Optional[str] = None
+    tag: Optional[str] = None
+    ideia: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    conteudo_hash: Optional[str] = None
+    embedding_hash: Optional[str] = None
+    embedding_status: Optional[str] = None
+
+
+class ImportacaoResponse(BaseModel):
+    id: int
+    formato: str
+    status: str  # processando, concluida ou interrompida
+    linhas_lidas: int
+    linhas_importadas: int
+    linhas_invalidas: int
+    erro: Optional[str] = None
+    criado_em: datetime
+    atualizado_em: datetime
+    concluido_em: Optional[datetime] = None
+
+
+class SugestaoResponse(BaseModel):
+    valor: str
+    frequencia: int
+
+
 class IdeiaComEmbedding(BaseModel):
     ideia: IdeiaCreate
     embedding: List[float]
 
 
+# Parâmetros da busca (padrões de BuscaRequest)
+BUSCA_LIMITE = 20
+BUSCA_LIMITE_MAXIMO = 100
+BUSCA_LIMIAR = 0.3  # similaridade mínima na busca vetorial
+
+
 class BuscaRequest(BaseModel):
     termo: str
+    # vetorial: similaridade de embeddings; textual: full-text (tsvector); hibrida: as duas combinadas (RRF)
+    modo: Literal["vetorial", "textual", "hibrida"] = "vetorial"
+    limite: int = Field(BUSCA_LIMITE, ge=1, le=BUSCA_LIMITE_MAXIMO)
+    # Similaridade de cosseno mínima (vetorial e parte vetorial da híbrida; o modo textual ignora)
+    limiar: float = Field(BUSCA_LIMIAR, ge=-1.0, le=1.0)
+    # hnsw.ef_search da busca: latencia < equilibrado < qualidade (busca_vetorial.BUSCA_PRESETS)
+    preset: Literal["latencia", "equilibrado", "qualidade"] = BUSCA_PRESET_PADRAO
 
 
 class BuscaResponse(BaseModel):
@@ -147,6 +318,12 @@ class BuscaResponse(BaseModel):
     similarity: float
 
 
+# Serializadores prontos para JSON_RAPIDO=1 (linhas do banco direto para bytes, sem validar no response_model)
+serializador_ideia = SerializadorModelo(IdeiaResponse)
+serializador_resumo = SerializadorModelo(IdeiaResumo)
+serializador_busca = SerializadorModelo(BuscaResponse)
+
+
 class AcessoCreate(BaseModel):
     usuario_id: Optional[int] = None
     ip_address: Optional[str] = None
@@ -189,390 +366,514 @@ class LoginRequest(BaseModel):
     senha: str
 
 
-# Função para obter usuário autenticado
-async def obter_usuario_atual(request: Request) -> dict:
-    """Extrair usuário do token JWT - LANÇA EXCEÇÃO se não autenticado"""
-    import sys
-    sys.stdout.flush()  # Forçar saída imediata
-    print("=" * 80, flush=True)
-    print("🔐 [obter_usuario_atual] Processando autenticação", flush=True)
-
-    # Tentar obter o header Authorization de diferentes formas
-    authorization = request.headers.get("Authorization") or request.headers.get("authorization")
-
-    print(f"   Authorization header recebido: {bool(authorization)}")
-
-    if not authorization:
-        print("❌ ERRO: Authorization header não recebido!")
-        print(f"   Headers disponíveis: {list(request.headers.keys())}")
-        print("=" * 80)
-        raise HTTPException(status_code=401, detail="Token de autenticação não fornecido")
-
-    print(f"   Authorization header: {authorization[:50]}..." if len(
-        authorization) > 50 else f"   Authorization header: {authorization}")
-
-    if not authorization.startswith("Bearer "):
-        print(f"❌ ERRO: Authorization header inválido (não começa com 'Bearer '): {authorization[:30]}...")
-        print("=" * 80)
-        raise HTTPException(status_code=401, detail="Formato de token inválido. Use 'Bearer <token>'")
-
-    token = authorization.split(" ")[1]
-    print(f"   Token extraído: {token[:30]}...")
+# Rotas
+@app.get("/")
+async def root():
+    return {"message": "Sacola de Ideias API", "status": "online"}
 
-    payload = verificar_token_jwt(token)
 
-    if not payload:
-        print("❌ ERRO: Token inválido ou expirado - verificar_token_jwt retornou None")
-        print("=" * 80)
-        raise HTTPException(status_code=401, detail="Token inválido ou expirado")
+@app.get("/api/metricas")
+async def obter_metricas():
+    """Métricas internas (pool de conexões, embeddings e cache de tokens)"""
+    return {
+        "pool": db_async.metricas(),
+        "cache_embeddings": cache_embeddings.metricas(),
+        "lotes_embeddings": lote_embeddings.metricas(),
+        "worker_embeddings": worker_embeddings.metricas(),
+        "cache_tokens": cache_tokens.metricas(),
+        "buffer_acessos": buffer_acessos.metricas(),
+        "cotas": cotas.metricas(),
+        "cache_sugestoes": cache_sugestoes.metricas(),
+        "cache_buscas": cache_buscas.metricas(),
+        "busca_vetorial": estrategia_busca.metricas(),
+        "exportacoes": {"ativas": exportacoes_ativas, "maximo": EXPORTACAO_MAX},
+    }
 
-    user_id = payload.get('user_id')
-    email = payload.get('email', 'N/A')
-    print(f"✅ Token válido decodificado!")
-    print(f"   Payload completo: {payload}")
-    print(f"   user_id extraído: {user_id}")
-    print(f"   email extraído: {email}")
 
-    if not user_id:
-        print("❌ ERRO CRÍTICO: Token não contém 'user_id'!")
-        print(f"   Payload completo: {payload}")
-        print(f"   Chaves disponíveis no payload: {list(payload.keys())}")
-        print("=" * 80)
-        raise HTTPException(status_code=401, detail="Token inválido: user_id não encontrado no token")
+# Paginação de GET /api/ideias
+IDEIAS_LIMITE_MAXIMO = 500
+CAMPOS_IDEIA = [c.strip() for c in COLUNAS_IDEIA.split(",")]
+CAMPOS_OBRIGATORIOS = ["id", "data"]  # usados pelo cursor
 
-    print("=" * 80)
-    return payload
 
+def codificar_cursor(data: datetime, ideia_id: int) -> str:
+    """Cursor opaco com a posição (data, id) da última ideia da página"""
+    bruto = f"{data.isoformat()}|{ideia_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(bruto).decode("ascii").rstrip("=")
 
-# Rotas
-@app.get("/")
-def root():
-    return {"message": "Sacola de Ideias API", "status": "online"}
 
-
-@app.get("/api/ideias", response_model=List[IdeiaResponse])
-def buscar_todas_ideias(user: dict = Depends(obter_usuario_atual)):
-    """Buscar todas as ideias do usuário autenticado"""
+def decodificar_cursor(cursor: str):
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        data, ideia_id = bruto.rsplit("|", 1)
+        return datetime.fromisoformat(data), int(ideia_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def escolher_campos(fields: Optional[str]) -> List[str]:
+    """Colunas pedidas em `fields=titulo,tag` (id e data sempre vão junto)"""
+    if not fields:
+        return CAMPOS_IDEIA
+    pedidos = [c.strip() for c in fields.split(",") if c.strip()]
+    invalidos = [c for c in pedidos if c not in CAMPOS_IDEIA]
+    if invalidos:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Campos inválidos: {', '.join(invalidos)}. Permitidos: {', '.join(CAMPOS_IDEIA)}"
+        )
+    return CAMPOS_OBRIGATORIOS + [c for c in CAMPOS_IDEIA if c in pedidos and c not in CAMPOS_OBRIGATORIOS]
+
+
+@app.get("/api/ideias", response_model=List[IdeiaResumo], response_model_exclude_unset=True)
+async def buscar_todas_ideias(
+    request: Request,
+    response: Response,
+    limite: Optional[int] = Query(None, ge=1, le=IDEIAS_LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    user: dict = Depends(obter_usuario_atual)
+):
+    """
+    Buscar as ideias do usuário autenticado (mais recentes primeiro)
+
+    - `limite`: tamanho da página; se houver mais ideias, o header X-Proximo-Cursor traz o cursor
+    - `cursor`: continuar a partir da página anterior (paginação por (data, id), sem OFFSET)
+    - `fields`: colunas a retornar, ex. `fields=titulo,tag` (sem o conteúdo das ideias)
+    Sem `limite`, retorna todas as ideias.
+    Responde com ETag/Last-Modified; com If-None-Match igual (coleção sem mudanças) responde 304 sem consultar as ideias.
+    """
     if not user:
-        print("❌ ERRO: Tentativa de buscar ideias sem autenticação!")
+        logger.warning("Tentativa de buscar ideias sem autenticação")
         raise HTTPException(status_code=401, detail="Não autenticado")
 
     usuario_id = user.get("user_id")
-    usuario_email = user.get("email", "N/A")
 
     if not usuario_id:
-        print(f"❌ ERRO: Token não contém 'user_id'! Payload: {user}")
+        logger.warning("Token sem user_id ao buscar ideias (chaves: %s)", list(user.keys()))
         raise HTTPException(status_code=401, detail="Token inválido: user_id não encontrado")
 
-    print(f"🔍 Buscando ideias para usuario_id: {usuario_id} (email: {usuario_email})")
+    campos = escolher_campos(fields)
+    filtros = ["usuario_id = %s"]
+    parametros = [usuario_id]
+    if cursor:
+        filtros.append("(data, id) < (%s, %s)")
+        parametros.extend(decodificar_cursor(cursor))
+
+    sql = f"SELECT {', '.join(campos)} FROM ideias WHERE {' AND '.join(filtros)} ORDER BY data DESC, id DESC"
+    if limite:
+        # Uma linha a mais só para saber se existe próxima página
+        sql += " LIMIT %s"
+        parametros.append(limite + 1)
 
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            # Primeiro, verificar se existem ideias sem dono (para debug)
-            cur.execute("SELECT COUNT(*) as total FROM ideias WHERE usuario_id IS NULL")
-            sem_dono = cur.fetchone()["total"]
-            if sem_dono > 0:
-                print(f"⚠️  AVISO: Existem {sem_dono} ideia(s) sem dono (usuario_id IS NULL) no banco!")
-
-            # Verificar total de ideias no banco (para debug)
-            cur.execute("SELECT COUNT(*) as total FROM ideias")
-            total_geral = cur.fetchone()["total"]
-            print(f"📊 Total de ideias no banco: {total_geral}")
-
-            # Buscar apenas ideias do usuário (garantir que usuario_id não é NULL)
-            cur.execute(
-                "SELECT id, titulo, tag, ideia, data, created_at, updated_at FROM ideias WHERE usuario_id = %s ORDER BY data DESC",
-                (usuario_id,)
-            )
-            ideias = cur.fetchall()
-            print(f"✅ Encontradas {len(ideias)} ideia(s) para usuario_id: {usuario_id} (email: {usuario_email})")
-
-            # Log detalhado de cada ideia retornada
-            for ideia in ideias:
-                print(f"   • ID {ideia['id']}: '{ideia['titulo']}' | Tag: '{ideia.get('tag', 'N/A')}'")
-
-            # Converter para dict e garantir formato correto
-            resultado = []
-            for ideia in ideias:
-                ideia_dict = dict(ideia)
-                # Garantir que não retornamos ideias sem usuario_id (double-check)
-                # Converter datetime para string ISO
-                if 'data' in ideia_dict and ideia_dict['data']:
-                    if hasattr(ideia_dict['data'], 'isoformat'):
-                        ideia_dict['data'] = ideia_dict['data'].isoformat()
-                if 'created_at' in ideia_dict and ideia_dict['created_at']:
-                    if hasattr(ideia_dict['created_at'], 'isoformat'):
-                        ideia_dict['created_at'] = ideia_dict['created_at'].isoformat()
-                if 'updated_at' in ideia_dict and ideia_dict['updated_at']:
-                    if hasattr(ideia_dict['updated_at'], 'isoformat'):
-                        ideia_dict['updated_at'] = ideia_dict['updated_at'].isoformat()
-                resultado.append(ideia_dict)
-
-            print(f"✅ Retornando {len(resultado)} ideia(s) para o frontend")
-            return resultado
+        async with get_db_connection() as conn, conn.cursor() as cur:
+            versao, atualizado_em = await versao_ideias(cur, usuario_id)
+            etag = calcular_etag(usuario_id, versao, f"{request.url.path}?{request.url.query}")
+            headers = headers_cache(etag, atualizado_em)
+            if nao_modificado(request, etag, atualizado_em):
+                return Response(status_code=304, headers=headers)
+
+            await cur.execute(sql, parametros)
+            ideias = await cur.fetchall()
+
+        if limite and len(ideias) > limite:
+            ideias = ideias[:limite]
+            ultima = ideias[-1]
+            headers["X-Proximo-Cursor"] = codificar_cursor(ultima["data"], ultima["id"])
+
+        logger.debug("Retornando %d ideia(s) para usuario_id %s", len(ideias), usuario_id, extra={"amostragem": 0.1})
+        if JSON_RAPIDO:
+            return RespostaJSONRapida(serializador_resumo.lista(ideias), headers=headers)
+        response.headers.update(headers)
+        return ideias
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Erro ao buscar ideias: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Erro ao buscar ideias")
         raise HTTPException(status_code=500, detail=f"Erro ao buscar ideias: {str(e)}")
+
+
+@app.post("/api/ideias/import", response_model=ImportacaoResponse, status_code=202)
+async def importar_ideias(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    formato: Optional[Literal["ndjson", "csv"]] = None,
+    user: dict = Depends(obter_usuario_atual)
+):
+    """
+    Importar muitas ideias de uma vez (NDJSON ou CSV com cabeçalho titulo,tag,ideia).
+    Responde com o job assim que o arquivo chega; a importação roda em segundo plano e o
+    progresso pode ser acompanhado em GET /api/ideias/import/{id}.
+    Os embeddings são gerados depois pelo worker.
+    """
+    usuario_id = user["user_id"]
+    formato = formato or detectar_formato(request.headers.get("content-type"))
+    if formato not in FORMATOS:
+        raise HTTPException(
+            status_code=415,
+            detail="Envie NDJSON (application/x-ndjson) ou CSV (text/csv), ou informe ?formato=ndjson|csv"
+        )
+
+    try:
+        if int(request.headers.get("content-length", "0")) > IMPORTACAO_MAX_BYTES:
+            raise ArquivoGrandeDemaisError(IMPORTACAO_MAX_BYTES)
+        arquivo = await guardar_corpo(request.stream())
+    except ArquivoGrandeDemaisError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Content-Length inválido")
+    try:
+        async with get_db_connection() as conn:
+            importacao = await criar_importacao(conn, usuario_id, formato)
+    except BaseException:
+        arquivo.close()
+        raise
+
+    async def gastar_cota(quantidade: int) -> int:
+        # Grava o que couber no saldo; sem saldo, CotaExcedidaError interrompe o job com o motivo
+        return await cotas.consumir_ate(usuario_id, RECURSO_EMBEDDINGS, quantidade)
+
+    def lote_gravado():
+        cache_buscas.invalidar(usuario_id)
+        worker_embeddings.notificar()
+
+    importador = ImportadorIdeias(
+        importacao["id"], usuario_id,
+        antes_do_lote=gastar_cota,
+        depois_do_lote=lote_gravado,
+        lote_nao_gravado=lambda quantidade: cotas.devolver(usuario_id, RECURSO_EMBEDDINGS, quantidade),
+    )
+    background_tasks.add_task(_executar_importacao, importador, formato, arquivo)
+    return importacao
+
+
+async def _executar_importacao(importador: ImportadorIdeias, formato: str, arquivo):
+    """Processar o arquivo guardado (o job registra status e erro em importacoes)"""
+    try:
+        await importador.executar(registros(formato, linhas_do_stream(pedacos_do_arquivo(arquivo))))
+    except CotaExcedidaError as e:
+        logger.info("Importação %s interrompida após %d ideia(s): %s",
+                    importador.importacao_id, importador.linhas_importadas, e)
+    except Exception:
+        logger.exception("Erro na importação %s", importador.importacao_id)
     finally:
-        if conn:
-            conn.close()
+        arquivo.close()
+
+
+async def _obter_importacao(importacao_id: int, usuario_id: int):
+    async with get_db_connection() as conn, conn.cursor() as cur:
+        await cur.execute(
+            "SELECT * FROM importacoes WHERE id = %s AND usuario_id = %s",
+            (importacao_id, usuario_id)
+        )
+        importacao = await cur.fetchone()
+    if not importacao:
+        raise HTTPException(status_code=404, detail="Importação não encontrada")
+    return importacao
+
+
+@app.get("/api/ideias/import", response_model=List[ImportacaoResponse])
+async def listar_importacoes(user: dict = Depends(obter_usuario_atual)):
+    """Importações recentes do usuário (a mais nova primeiro)"""
+    async with get_db_connection() as conn, conn.cursor() as cur:
+        await cur.execute(
+            "SELECT * FROM importacoes WHERE usuario_id = %s ORDER BY id DESC LIMIT 20",
+            (user["user_id"],)
+        )
+        return await cur.fetchall()
+
+
+@app.get("/api/ideias/import/{importacao_id}", response_model=ImportacaoResponse)
+async def status_importacao(importacao_id: int, user: dict = Depends(obter_usuario_atual)):
+    """Progresso de uma importação"""
+    return await _obter_importacao(importacao_id, user["user_id"])
+
+
+EXPORTACAO_LOTE = int(os.getenv("EXPORTACAO_LOTE", "500"))  # linhas por ida ao banco no cursor do export
+# Exports abertos ao mesmo tempo: cada um prende uma conexão do pool enquanto o cliente lê
+EXPORTACAO_MAX = int(os.getenv("EXPORTACAO_MAX", "2"))
+exportacoes_ativas = 0
+# Formatos do embedding no export: base64 dos floats little-endian
+FORMATOS_EMBEDDING = {"float32": "<f4", "float16": "<f2"}
+
+
+def _valor_json(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+def codificar_embedding(embedding, formato: str) -> Optional[str]:
+    """Embedding (numpy float32 lido do banco) em base64 compacto: 4 (float32) ou 2 (float16) bytes por dimensão"""
+    if embedding is None:
+        return None
+    return base64.b64encode(embedding.astype(FORMATOS_EMBEDDING[formato]).tobytes()).decode("ascii")
+
+
+@app.get("/api/ideias/export")
+async def exportar_ideias(
+    embeddings: Optional[Literal["float32", "float16"]] = None,
+    user: dict = Depends(obter_usuario_atual)
+):
+    """
+    Exportar todas as ideias do usuário em NDJSON (uma ideia por linha).
+    As linhas saem de um cursor no servidor, em lotes: a memória não cresce com o número de ideias.
+    `embeddings=float32|float16` inclui o embedding de cada ideia em base64 (floats little-endian).
+    """
+    global exportacoes_ativas
+    usuario_id = user["user_id"]
+    colunas = COLUNAS_IDEIA + (", embedding" if embeddings else "")
+
+    if exportacoes_ativas >= EXPORTACAO_MAX:
+        raise HTTPException(
+            status_code=503,
+            detail="Muitos exports em andamento, tente novamente mais tarde",
+            headers={"Retry-After": "5"}
+        )
+
+    # A conexão fica com a resposta até o fim do stream (ou até o cliente desconectar)
+    pilha = AsyncExitStack()
+    conn = await pilha.enter_async_context(get_db_connection())
+    exportacoes_ativas += 1
+
+    def fim_exportacao():
+        global exportacoes_ativas
+        exportacoes_ativas -= 1
+
+    pilha.callback(fim_exportacao)  # junto com a devolução da conexão (pilha.aclose só roda uma vez)
+
+    async def gerar_linhas():
+        try:
+            # binary=True: embeddings chegam no formato binário do pgvector, sem parse de texto
+            async with conn.cursor(name="exportacao_ideias", binary=True) as cur:
+                await cur.execute(
+                    f"SELECT {colunas} FROM ideias WHERE usuario_id = %s ORDER BY data DESC, id DESC",
+                    (usuario_id,)
+                )
+                while True:
+                    lote = await cur.fetchmany(EXPORTACAO_LOTE)
+                    if not lote:
+                        break
+                    partes = []
+                    for ideia in lote:
+                        if embeddings:
+                            ideia["embedding"] = codificar_embedding(ideia["embedding"], embeddings)
+                        partes.append(json.dumps(ideia, ensure_ascii=False, default=_valor_json))
+                    yield ("\n".join(partes) + "\n").encode("utf-8")
+            await conn.rollback()
+        except Exception:
+            logger.exception("Erro no export de ideias do usuário %s", usuario_id)
+            raise
+        finally:
+            # Depois do async with: o cursor no servidor já foi fechado nesta conexão
+            await pilha.aclose()
+
+    async def encerrar():
+        # Cliente desconectou: o gerador fica parado no yield. Fechá-lo fecha o cursor e devolve a
+        # conexão, nessa ordem; se o stream nem começou, o finally não roda e a devolução é aqui
+        await gerador.aclose()
+        await pilha.aclose()
+
+    gerador = gerar_linhas()
+    return StreamingResponse(
+        gerador,
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="ideias.ndjson"'},
+        background=BackgroundTask(encerrar),
+    )
+
+
+@app.get("/api/ideias/sugestoes", response_model=List[SugestaoResponse])
+async def sugerir_valores(
+    campo: Literal["titulo", "tag"],
+    prefixo: str = Query("", max_length=255),
+    limite: int = Query(10, ge=1, le=SUGESTOES_LIMITE_MAX),
+    user: dict = Depends(obter_usuario_atual)
+):
+    """
+    Autocomplete: títulos ou tags das ideias do usuário que começam com `prefixo`
+    (sem diferenciar maiúsculas), os mais frequentes primeiro. Sem prefixo, os mais usados.
+    """
+    if not user:
+        raise HTTPException(status_code=401, detail="Não autenticado")
+
+    usuario_id = user["user_id"]
+    try:
+        async with get_db_connection() as conn, conn.cursor() as cur:
+            sugestoes = await cache_sugestoes.sugerir(cur, usuario_id, campo, prefixo, limite)
+        return [{"valor": valor, "frequencia": frequencia} for valor, frequencia in sugestoes]
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar sugestões: {str(e)}")
 
 
 @app.get("/api/ideias/{ideia_id}", response_model=IdeiaResponse)
-def buscar_ideia_por_id(ideia_id: int, user: dict = Depends(obter_usuario_atual)):
-    """Buscar ideia por ID (apenas do usuário autenticado)"""
+async def buscar_ideia_por_id(request: Request, response: Response, ideia_id: int, user: dict = Depends(obter_usuario_atual)):
+    """Buscar ideia por ID (apenas do usuário autenticado), com ETag/Last-Modified e 304"""
     if not user:
         raise HTTPException(status_code=401, detail="Não autenticado")
 
     usuario_id = user["user_id"]
-    conn = get_db_connection()
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("SELECT * FROM ideias WHERE id = %s AND usuario_id = %s", (ideia_id, usuario_id))
-            ideia = cur.fetchone()
+        async with get_db_connection() as conn, conn.cursor() as cur:
+            versao, atualizado_em = await versao_ideias(cur, usuario_id)
+            etag = calcular_etag(usuario_id, versao, request.url.path)
+            headers = headers_cache(etag, atualizado_em)
+            if nao_modificado(request, etag, atualizado_em):
+                return Response(status_code=304, headers=headers)
+
+            await cur.execute(f"SELECT {COLUNAS_IDEIA} FROM ideias WHERE id = %s AND usuario_id = %s", (ideia_id, usuario_id))
+            ideia = await cur.fetchone()
             if not ideia:
                 raise HTTPException(status_code=404, detail="Ideia não encontrada")
+            if JSON_RAPIDO:
+                return RespostaJSONRapida(serializador_ideia.item(ideia), headers=headers)
+            response.headers.update(headers)
             return dict(ideia)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao buscar ideia: {str(e)}")
-    finally:
-        conn.close()
 
 
 @app.post("/api/ideias", response_model=IdeiaResponse)
-async def criar_ideia(ideia: IdeiaCreate, request: Request, user: dict = Depends(obter_usuario_atual)):
+async def criar_ideia(ideia: IdeiaCreate, user: dict = Depends(obter_usuario_atual)):
     """Criar nova ideia com embedding automático (associada ao usuário)"""
-    import sys
-    sys.stdout.flush()  # Forçar saída imediata
-    print("=" * 80, flush=True)
-    print("📝 NOVA REQUISIÇÃO: Criar Ideia", flush=True)
-    print(
-        f"   Payload recebido: titulo='{ideia.titulo}', tag='{ideia.tag}', ideia='{ideia.ideia[:50] if ideia.ideia else ''}...'")
-
-    # Verificar headers diretamente
-    auth_header = request.headers.get("Authorization") or request.headers.get("authorization")
-    print(f"   Authorization header direto: {'Presente' if auth_header else 'AUSENTE!'}")
-
-    print(f"   User object recebido: {user}")
-    print(f"   Tipo do user: {type(user)}")
-    print("=" * 80)
-
     if not user:
-        print("❌ ERRO CRÍTICO: Tentativa de criar ideia sem autenticação!")
-        print("   O header Authorization não foi enviado ou o token é inválido")
-        print(f"   Headers recebidos: {list(request.headers.keys())}")
+        logger.warning("Tentativa de criar ideia sem autenticação")
         raise HTTPException(status_code=401, detail="Não autenticado")
 
     usuario_id = user.get("user_id") if isinstance(user, dict) else None
-    usuario_email = user.get("email", "N/A") if isinstance(user, dict) else "N/A"
 
     if not usuario_id:
-        print(f"❌ ERRO CRÍTICO: Token não contém 'user_id'!")
-        print(f"   Payload completo do token: {user}")
-        print(f"   Tipo do user: {type(user)}")
-        if isinstance(user, dict):
-            print(f"   Chaves disponíveis no user: {list(user.keys())}")
+        logger.warning(
+            "Token sem user_id ao criar ideia (chaves: %s)",
+            list(user.keys()) if isinstance(user, dict) else type(user).__name__
+        )
         raise HTTPException(status_code=401, detail="Token inválido: user_id não encontrado")
 
-    print(f"✅ Autenticação OK: usuario_id={usuario_id}, email={usuario_email}")
-    print(f"📝 Criando ideia para usuario_id: {usuario_id}, titulo: '{ideia.titulo}'")
+    logger.debug("Criando ideia para usuario_id %s: '%s'", usuario_id, ideia.titulo)
 
-    conn = get_db_connection()
-    try:
-        # Gerar embedding automaticamente se API Key estiver configurada
-        embedding_str = None
-        modelo = get_embeddings_model()
-        if modelo:
-            try:
-                texto_completo = f"{ideia.titulo} {ideia.tag or ''} {ideia.ideia}".strip()
-                embedding = gerar_embedding(texto_completo)
-                if embedding:
-                    embedding_str = "[" + ",".join(map(str, embedding)) + "]"
-                    print(f"   ✅ Embedding gerado: {len(embedding)} dimensões")
-            except Exception as e:
-                print(f"⚠️  Erro ao gerar embedding (salvando sem embedding): {e}")
+    # Cada ideia nova gera um embedding (chamada à OpenAI) no worker; devolvida se a ideia não for salva
+    await verificar_cota(usuario_id, RECURSO_EMBEDDINGS)
 
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            # VALIDAÇÃO FINAL CRÍTICA: Garantir que usuario_id não é None antes do INSERT
-            if usuario_id is None or usuario_id == "":
-                error_msg = f"ERRO CRÍTICO: usuario_id é None ou vazio antes do INSERT! user={user}"
-                print(f"   ❌ {error_msg}")
-                conn.rollback()
-                raise ValueError(error_msg)
+    usuario_cota, salva = usuario_id, False
+    try:
+        # O embedding é gerado em segundo plano pelo worker (embedding_status = 'pending'),
+        # assim a resposta não espera a chamada à OpenAI
+        conteudo_hash = hash_texto(texto_para_embedding(ideia.titulo, ideia.tag, ideia.ideia))
 
-            # Garantir que é um número inteiro
-            try:
-                usuario_id = int(usuario_id)
-            except (ValueError, TypeError):
-                error_msg = f"ERRO CRÍTICO: usuario_id não é um número válido! usuario_id={usuario_id}, tipo={type(usuario_id)}"
-                print(f"   ❌ {error_msg}")
-                conn.rollback()
-                raise ValueError(error_msg)
-
-            print(f"   💾 Executando INSERT com usuario_id={usuario_id} (tipo: {type(usuario_id)})", flush=True)
-            print(f"   📋 Valores a inserir: titulo='{ideia.titulo}', tag='{ideia.tag}', usuario_id={usuario_id}",
-                  flush=True)
-
-            # ÚLTIMA VERIFICAÇÃO ANTES DO INSERT - NUNCA PERMITIR NULL
-            if usuario_id is None:
-                import sys
-                sys.stderr.write(f"❌ ERRO CRÍTICO: Tentativa de INSERT com usuario_id=None bloqueada!\n")
-                sys.stderr.flush()
-                conn.rollback()
-                raise ValueError("usuario_id NÃO PODE SER None - operação bloqueada por segurança")
-
-            # Garantir que é int
+        # Garantir que é um número inteiro (NUNCA permitir INSERT com usuario_id NULL)
+        try:
             usuario_id = int(usuario_id)
+        except (ValueError, TypeError):
+            raise ValueError(f"usuario_id não é um número válido! usuario_id={usuario_id}, tipo={type(usuario_id)}")
 
-            if embedding_str:
-                cur.execute(
-                    "INSERT INTO ideias (titulo, tag, ideia, embedding, usuario_id) VALUES (%s, %s, %s, %s::vector, %s) RETURNING *",
-                    (ideia.titulo, ideia.tag, ideia.ideia, embedding_str, usuario_id)
-                )
-            else:
-                cur.execute(
-                    "INSERT INTO ideias (titulo, tag, ideia, usuario_id) VALUES (%s, %s, %s, %s) RETURNING *",
-                    (ideia.titulo, ideia.tag, ideia.ideia, usuario_id)
-                )
+        async with get_db_connection() as conn, conn.cursor() as cur:
+            await cur.execute(
+                f"INSERT INTO ideias (titulo, tag, ideia, usuario_id, conteudo_hash, embedding_status) VALUES (%s, %s, %s, %s, %s, %s) RETURNING {COLUNAS_IDEIA}, usuario_id",
+                (ideia.titulo, ideia.tag, ideia.ideia, usuario_id, conteudo_hash, STATUS_PENDENTE)
+            )
 
-            nova_ideia = cur.fetchone()
+            nova_ideia = await cur.fetchone()
 
             if not nova_ideia:
-                error_msg = "ERRO: INSERT não retornou nenhum resultado!"
-                print(f"   ❌ {error_msg}")
-                conn.rollback()
-                raise ValueError(error_msg)
+                await conn.rollback()
+                raise ValueError("INSERT não retornou nenhum resultado!")
 
             # Verificar o que foi realmente salvo
-            usuario_id_salvo = nova_ideia.get('usuario_id') if nova_ideia else None
-            print(f"   📊 Resultado do INSERT:")
-            print(f"      • ID: {nova_ideia['id']}")
-            print(f"      • Título: '{nova_ideia['titulo']}'")
-            print(f"      • usuario_id SALVO: {usuario_id_salvo} (tipo: {type(usuario_id_salvo)})")
-
+            usuario_id_salvo = nova_ideia.get('usuario_id')
             if usuario_id_salvo is None:
-                error_msg = "ERRO CRÍTICO: usuario_id foi salvo como NULL no banco apesar de validações!"
-                print(f"   ❌ {error_msg}")
-                conn.rollback()
-                raise ValueError(error_msg)
+                await conn.rollback()
+                raise ValueError("usuario_id foi salvo como NULL no banco apesar de validações!")
 
-            if int(usuario_id_salvo) != int(usuario_id):
-                print(f"   ⚠️  ATENÇÃO: usuario_id esperado ({usuario_id}) diferente do salvo ({usuario_id_salvo})")
+            if int(usuario_id_salvo) != usuario_id:
+                logger.warning(
+                    "usuario_id esperado (%s) diferente do salvo (%s) na ideia %s",
+                    usuario_id, usuario_id_salvo, nova_ideia['id']
+                )
 
-            conn.commit()
-            print(f"✅ Ideia criada com sucesso: ID {nova_ideia['id']}, usuario_id={usuario_id_salvo}")
-            print("=" * 80)
+            await conn.commit()
+            salva = True
+            cache_buscas.invalidar(usuario_id)
+            worker_embeddings.notificar()
+            logger.info("Ideia criada: ID %s, usuario_id=%s", nova_ideia['id'], usuario_id_salvo)
             return dict(nova_ideia)
     except HTTPException:
         raise
     except Exception as e:
-        if conn:
-            conn.rollback()
-        print(f"❌ ERRO ao criar ideia: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Erro ao criar ideia")
         raise HTTPException(status_code=500, detail=f"Erro ao criar ideia: {str(e)}")
     finally:
-        if conn:
-            conn.close()
+        if not salva:
+            cotas.devolver(usuario_cota, RECURSO_EMBEDDINGS)
 
 
 @app.post("/api/ideias/com-embedding", response_model=IdeiaResponse)
-def criar_ideia_com_embedding(dados: IdeiaComEmbedding, user: dict = Depends(obter_usuario_atual)):
+async def criar_ideia_com_embedding(dados: IdeiaComEmbedding, user: dict = Depends(obter_usuario_atual)):
     """Criar ideia com embedding (associada ao usuário)"""
-    print("=" * 80)
-    print("📝 NOVA REQUISIÇÃO: Criar Ideia COM Embedding")
-    print(f"   Payload recebido: titulo='{dados.ideia.titulo}', tag='{dados.ideia.tag}'")
-    print(f"   User object recebido: {user}")
-    print("=" * 80)
-
     if not user:
-        print("❌ ERRO CRÍTICO: Tentativa de criar ideia com embedding sem autenticação!")
-        print("   O header Authorization não foi enviado ou o token é inválido")
+        logger.warning("Tentativa de criar ideia com embedding sem autenticação")
         raise HTTPException(status_code=401, detail="Não autenticado")
 
     usuario_id = user.get("user_id")
-    usuario_email = user.get("email", "N/A")
 
     if not usuario_id:
-        print(f"❌ ERRO CRÍTICO: Token não contém 'user_id'!")
-        print(f"   Payload completo do token: {user}")
+        logger.warning("Token sem user_id ao criar ideia com embedding (chaves: %s)", list(user.keys()))
         raise HTTPException(status_code=401, detail="Token inválido: user_id não encontrado")
 
-    print(f"✅ Autenticação OK: usuario_id={usuario_id}, email={usuario_email}")
-    print(f"📝 Criando ideia com embedding para usuario_id: {usuario_id}, titulo: '{dados.ideia.titulo}'")
+    logger.debug("Criando ideia com embedding para usuario_id %s: '%s'", usuario_id, dados.ideia.titulo)
 
-    conn = get_db_connection()
     try:
-        embedding_str = "[" + ",".join(map(str, dados.embedding)) + "]"
-
-        # Garantir que usuario_id não é None antes do INSERT
-        if usuario_id is None:
-            raise ValueError("usuario_id não pode ser None no momento do INSERT")
+        conteudo_hash = hash_texto(texto_para_embedding(dados.ideia.titulo, dados.ideia.tag, dados.ideia.ideia))
 
-        print(f"   💾 Executando INSERT com usuario_id={usuario_id}")
-
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(
-                "INSERT INTO ideias (titulo, tag, ideia, embedding, usuario_id) VALUES (%s, %s, %s, %s::vector, %s) RETURNING *",
-                (dados.ideia.titulo, dados.ideia.tag, dados.ideia.ideia, embedding_str, usuario_id)
+        async with get_db_connection() as conn, conn.cursor() as cur:
+            await cur.execute(
+                f"INSERT INTO ideias (titulo, tag, ideia, embedding, usuario_id, conteudo_hash, embedding_hash, embedding_status) VALUES (%s, %s, %s, %b, %s, %s, %s, %s) RETURNING {COLUNAS_IDEIA}, usuario_id",
+                (dados.ideia.titulo, dados.ideia.tag, dados.ideia.ideia, ajustar_dimensoes(dados.embedding), usuario_id, conteudo_hash, conteudo_hash, STATUS_PRONTO)
             )
-            nova_ideia = cur.fetchone()
+            nova_ideia = await cur.fetchone()
 
             # Verificar o que foi realmente salvo
             usuario_id_salvo = nova_ideia.get('usuario_id') if nova_ideia else None
-            print(f"   📊 Resultado do INSERT:")
-            print(f"      • ID: {nova_ideia['id'] if nova_ideia else 'N/A'}")
-            print(f"      • Título: '{nova_ideia['titulo'] if nova_ideia else 'N/A'}'")
-            print(f"      • usuario_id SALVO: {usuario_id_salvo}")
-
             if usuario_id_salvo is None:
-                print("   ❌ ERRO: usuario_id foi salvo como NULL no banco!")
-                conn.rollback()
+                await conn.rollback()
                 raise ValueError("usuario_id não pode ser NULL - problema no INSERT")
 
             if usuario_id_salvo != usuario_id:
-                print(f"   ⚠️  ATENÇÃO: usuario_id esperado ({usuario_id}) diferente do salvo ({usuario_id_salvo})")
+                logger.warning(
+                    "usuario_id esperado (%s) diferente do salvo (%s) na ideia %s",
+                    usuario_id, usuario_id_salvo, nova_ideia['id']
+                )
 
-            conn.commit()
-            print(f"✅ Ideia criada com embedding com sucesso: ID {nova_ideia['id']}, usuario_id={usuario_id_salvo}")
-            print("=" * 80)
+            await conn.commit()
+            cache_buscas.invalidar(usuario_id)
+            logger.info("Ideia criada com embedding: ID %s, usuario_id=%s", nova_ideia['id'], usuario_id_salvo)
             return dict(nova_ideia)
     except HTTPException:
         raise
     except Exception as e:
-        if conn:
-            conn.rollback()
-        print(f"❌ ERRO ao criar ideia: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Erro ao criar ideia com embedding")
         raise HTTPException(status_code=500, detail=f"Erro ao criar ideia: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
 
 
 @app.put("/api/ideias/{ideia_id}", response_model=IdeiaResponse)
-def atualizar_ideia(ideia_id: int, ideia: IdeiaUpdate, user: dict = Depends(obter_usuario_atual)):
+async def atualizar_ideia(ideia_id: int, ideia: IdeiaUpdate, user: dict = Depends(obter_usuario_atual)):
     """Atualizar ideia existente (apenas do usuário autenticado)"""
     if not user:
         raise HTTPException(status_code=401, detail="Não autenticado")
 
     usuario_id = user["user_id"]
-    conn = get_db_connection()
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        async with get_db_connection() as conn, conn.cursor() as cur:
             # Verificar se a ideia existe e pertence ao usuário
-            cur.execute("SELECT * FROM ideias WHERE id = %s AND usuario_id = %s", (ideia_id, usuario_id))
-            ideia_existente = cur.fetchone()
+            await cur.execute(
+                f"SELECT {COLUNAS_IDEIA} FROM ideias WHERE id = %s AND usuario_id = %s",
+                (ideia_id, usuario_id)
+            )
+            ideia_existente = await cur.fetchone()
             if not ideia_existente:
                 raise HTTPException(status_code=404,
                                     detail="Ideia não encontrada ou você não tem permissão para editar")
@@ -582,194 +883,310 @@ def atualizar_ideia(ideia_id: int, ideia: IdeiaUpdate, user: dict = Depends(obte
             tag_final = ideia.tag if ideia.tag is not None else ideia_existente['tag']
             ideia_final = ideia.ideia if ideia.ideia is not None else ideia_existente['ideia']
 
-            # Regenerar embedding automaticamente se API Key estiver configurada
-            embedding_str = None
-            modelo = get_embeddings_model()
-            if modelo:
-                try:
-                    texto_completo = f"{titulo_final} {tag_final or ''} {ideia_final}".strip()
-                    embedding = gerar_embedding(texto_completo)
-                    if embedding:
-                        embedding_str = "[" + ",".join(map(str, embedding)) + "]"
-                except Exception as e:
-                    print(f"⚠️  Erro ao regenerar embedding (continuando sem atualizar embedding): {e}")
-
-            # Atualizar ideia (verificar se pertence ao usuário)
-            if embedding_str:
-                cur.execute(
-                    "UPDATE ideias SET titulo = %s, tag = %s, ideia = %s, embedding = %s::vector, updated_at = NOW() WHERE id = %s AND usuario_id = %s RETURNING *",
-                    (titulo_final, tag_final, ideia_final, embedding_str, ideia_id, usuario_id)
-                )
-            else:
-                cur.execute(
-                    "UPDATE ideias SET titulo = %s, tag = %s, ideia = %s, updated_at = NOW() WHERE id = %s AND usuario_id = %s RETURNING *",
-                    (titulo_final, tag_final, ideia_final, ideia_id, usuario_id)
-                )
+            # Cliente reenviou exatamente os mesmos campos: nada a fazer
+            if (titulo_final, tag_final, ideia_final) == (
+                    ideia_existente['titulo'], ideia_existente['tag'], ideia_existente['ideia']):
+                return ideia_existente
+
+            # O embedding só volta para a fila se o texto embutido mudou de verdade (espaços extras não contam).
+            # A comparação é feita no UPDATE, com a linha travada, para não competir com o worker.
+            conteudo_hash = hash_texto(texto_para_embedding(titulo_final, tag_final, ideia_final))
+            await cur.execute(
+                f"""
+                UPDATE ideias
+                SET titulo = %s, tag = %s, ideia = %s, conteudo_hash = %s, updated_at = NOW(),
+                    embedding_status = CASE WHEN embedding IS NOT NULL AND embedding_hash = %s THEN %s ELSE %s END,
+                    embedding_tentativas = 0,
+                    embedding_proxima_tentativa = NULL,
+                    embedding_erro = NULL
+                WHERE id = %s AND usuario_id = %s
+                RETURNING {COLUNAS_IDEIA}
+                """,
+                (titulo_final, tag_final, ideia_final, conteudo_hash,
+                 conteudo_hash, STATUS_PRONTO, STATUS_PENDENTE, ideia_id, usuario_id)
+            )
 
-            ideia_atualizada = cur.fetchone()
-            conn.commit()
+            ideia_atualizada = await cur.fetchone()
+            if not ideia_atualizada:
+                raise HTTPException(status_code=404,
+                                    detail="Ideia não encontrada ou você não tem permissão para editar")
+            await conn.commit()
+            cache_buscas.invalidar(usuario_id)
+            if ideia_atualizada['embedding_status'] == STATUS_PENDENTE:
+                worker_embeddings.notificar()
             return dict(ideia_atualizada)
     except HTTPException:
         raise
     except Exception as e:
-        conn.rollback()
         raise HTTPException(status_code=500, detail=f"Erro ao atualizar ideia: {str(e)}")
-    finally:
-        conn.close()
 
 
 @app.put("/api/ideias/{ideia_id}/embedding")
-def atualizar_embedding(ideia_id: int, embedding: List[float]):
+async def atualizar_embedding(ideia_id: int, embedding: List[float]):
     """Atualizar embedding de uma ideia"""
-    conn = get_db_connection()
     try:
-        embedding_str = "[" + ",".join(map(str, embedding)) + "]"
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(
-                "UPDATE ideias SET embedding = %s::vector WHERE id = %s RETURNING *",
-                (embedding_str, ideia_id)
+        async with get_db_connection() as conn, conn.cursor() as cur:
+            await cur.execute(
+                f"UPDATE ideias SET embedding = %b, embedding_hash = conteudo_hash, embedding_status = %s WHERE id = %s RETURNING {COLUNAS_IDEIA}, usuario_id",
+                (ajustar_dimensoes(embedding), STATUS_PRONTO, ideia_id)
             )
-            ideia = cur.fetchone()
+            ideia = await cur.fetchone()
             if not ideia:
                 raise HTTPException(status_code=404, detail="Ideia não encontrada")
-            conn.commit()
-            return {"message": "Embedding atualizado com sucesso", "ideia": dict(ideia)}
+            await conn.commit()
+            ideia = dict(ideia)
+            cache_buscas.invalidar(ideia.pop("usuario_id"))
+            return {"message": "Embedding atualizado com sucesso", "ideia": ideia}
     except HTTPException:
         raise
     except Exception as e:
-        conn.rollback()
         raise HTTPException(status_code=500, detail=f"Erro ao atualizar embedding: {str(e)}")
-    finally:
-        conn.close()
+
+
+@app.get("/api/ideias/{ideia_id}/embedding/status")
+async def status_embedding(ideia_id: int, user: dict = Depends(obter_usuario_atual)):
+    """Consultar se o embedding da ideia já foi gerado (para o cliente fazer polling)"""
+    if not user:
+        raise HTTPException(status_code=401, detail="Não autenticado")
+
+    async with get_db_connection() as conn, conn.cursor() as cur:
+        await cur.execute("""
+                    SELECT id,
+                           embedding_status,
+                           embedding_tentativas,
+                           embedding_proxima_tentativa,
+                           embedding_erro
+                    FROM ideias
+                    WHERE id = %s AND usuario_id = %s
+                    """, (ideia_id, user["user_id"]))
+        status = await cur.fetchone()
+        if not status:
+            raise HTTPException(status_code=404, detail="Ideia não encontrada")
+        return status
 
 
 @app.delete("/api/ideias/{ideia_id}")
-def deletar_ideia(ideia_id: int, user: dict = Depends(obter_usuario_atual)):
+async def deletar_ideia(ideia_id: int, user: dict = Depends(obter_usuario_atual)):
     """Deletar ideia (apenas do usuário autenticado)"""
     if not user:
         raise HTTPException(status_code=401, detail="Não autenticado")
 
     usuario_id = user["user_id"]
-    conn = get_db_connection()
     try:
-        with conn.cursor() as cur:
-            cur.execute("DELETE FROM ideias WHERE id = %s AND usuario_id = %s RETURNING id", (ideia_id, usuario_id))
-            if not cur.fetchone():
+        async with get_db_connection() as conn, conn.cursor() as cur:
+            await cur.execute("DELETE FROM ideias WHERE id = %s AND usuario_id = %s RETURNING id", (ideia_id, usuario_id))
+            if not await cur.fetchone():
                 raise HTTPException(status_code=404,
                                     detail="Ideia não encontrada ou você não tem permissão para deletar")
-            conn.commit()
+            await conn.commit()
+            cache_buscas.invalidar(usuario_id)
             return {"message": "Ideia deletada com sucesso", "success": True}
     except HTTPException:
         raise
     except Exception as e:
-        conn.rollback()
         raise HTTPException(status_code=500, detail=f"Erro ao deletar ideia: {str(e)}")
-    finally:
-        conn.close()
+
+
+# Parâmetros da busca híbrida
+BUSCA_CANDIDATOS = int(os.getenv("BUSCA_CANDIDATOS", "50"))  # resultados de cada lista antes da fusão (modo híbrido)
+BUSCA_RRF_K = int(os.getenv("BUSCA_RRF_K", "60"))  # constante do reciprocal rank fusion
+
+
+async def _buscar_textual(cur, usuario_id: int, termo: str, limite: int):
+    """Busca full-text na coluna busca_tsv (índice GIN); similarity = ts_rank_cd"""
+    await cur.execute("""
+                SELECT id,
+                       titulo,
+                       tag,
+                       ideia,
+                       data,
+                       ts_rank_cd(busca_tsv, consulta) AS similarity
+                FROM ideias,
+                     websearch_to_tsquery('portuguese', %(termo)s) AS consulta
+                WHERE usuario_id = %(usuario_id)s
+                  AND busca_tsv @@ consulta
+                ORDER BY similarity DESC, data DESC
+                    LIMIT %(limite)s
+                """, {"termo": termo, "usuario_id": usuario_id, "limite": limite})
+    return await cur.fetchall()
+
+
+async def _buscar_vetorial(cur, usuario_id: int, vetor, busca: BuscaRequest):
+    """
+    Busca por similaridade de cosseno (pgvector); o vetor da busca é enviado uma única vez.
+    Exata ou pelo HNSW conforme o tamanho do usuário (busca_vetorial.py). O limiar é aplicado
+    depois dos vizinhos: o ORDER BY distância ... LIMIT continua usando o índice.
+    """
+    sql_vizinhos = await estrategia_busca.preparar(cur, usuario_id, busca.limite, busca.preset)
+    await cur.execute(f"""
+                WITH consulta AS (SELECT %(vetor)b AS vetor),
+                vizinhos AS ({sql_vizinhos})
+                SELECT i.id,
+                       i.titulo,
+                       i.tag,
+                       i.ideia,
+                       i.data,
+                       1 - v.distancia AS similarity
+                FROM vizinhos v
+                JOIN ideias i ON i.id = v.id
+                WHERE v.distancia <= 1 - %(limiar)s
+                ORDER BY v.distancia
+                """, {"vetor": vetor, "usuario_id": usuario_id, "limiar": busca.limiar, "vizinhos": busca.limite})
+    return await cur.fetchall()
+
+
+async def _buscar_hibrida(cur, usuario_id: int, vetor, busca: BuscaRequest):
+    """
+    Busca híbrida: junta o ranking vetorial e o textual com reciprocal rank fusion.
+    Cada ideia recebe 1 / (k + posição) em cada lista onde aparece; similarity = soma.
+    """
+    candidatos = max(BUSCA_CANDIDATOS, busca.limite)
+    sql_vizinhos = await estrategia_busca.preparar(cur, usuario_id, candidatos, busca.preset)
+    await cur.execute(f"""
+                WITH consulta AS (SELECT %(vetor)b AS vetor),
+                vetorial AS (
+                    SELECT id,
+                           ROW_NUMBER() OVER (ORDER BY distancia) AS posicao
+                    FROM ({sql_vizinhos}) vizinhos
+                    WHERE distancia <= 1 - %(limiar)s
+                ),
+                textual AS (
+                    SELECT id,
+                           ROW_NUMBER() OVER (ORDER BY ts_rank_cd(busca_tsv, consulta) DESC) AS posicao
+                    FROM ideias,
+                         websearch_to_tsquery('portuguese', %(termo)s) AS consulta
+                    WHERE usuario_id = %(usuario_id)s
+                      AND busca_tsv @@ consulta
+                    ORDER BY ts_rank_cd(busca_tsv, consulta) DESC
+                        LIMIT %(candidatos)s
+                ),
+                fusao AS (
+                    SELECT COALESCE(v.id, t.id) AS id,
+                           COALESCE(1.0 / (%(k)s + v.posicao), 0) + COALESCE(1.0 / (%(k)s + t.posicao), 0) AS pontuacao
+                    FROM vetorial v
+                    FULL OUTER JOIN textual t ON t.id = v.id
+                )
+                SELECT i.id,
+                       i.titulo,
+                       i.tag,
+                       i.ideia,
+                       i.data,
+                       f.pontuacao AS similarity
+                FROM fusao f
+                JOIN ideias i ON i.id = f.id
+                ORDER BY f.pontuacao DESC, i.data DESC
+                    LIMIT %(limite)s
+                """, {
+                    "vetor": vetor,
+                    "termo": busca.termo,
+                    "usuario_id": usuario_id,
+                    "limiar": busca.limiar,
+                    "candidatos": candidatos,
+                    "vizinhos": candidatos,
+                    "k": BUSCA_RRF_K,
+                    "limite": busca.limite,
+                })
+    return await cur.fetchall()
 
 
 @app.post("/api/ideias/buscar", response_model=List[BuscaResponse])
-def buscar_por_similaridade(busca: BuscaRequest, user: dict = Depends(obter_usuario_atual)):
-    """Buscar ideias por similaridade (apenas do usuário autenticado)"""
+async def buscar_por_similaridade(busca: BuscaRequest, user: dict = Depends(obter_usuario_atual)):
+    """Buscar ideias (vetorial, textual ou híbrida) apenas do usuário autenticado"""
     if not user:
         raise HTTPException(status_code=401, detail="Não autenticado")
 
     usuario_id = user["user_id"]
-    conn = get_db_connection()
+    modo = busca.modo
+    # Sem API Key não há embedding: usar a busca textual (índice GIN em vez de LIKE)
+    if modo != "textual" and not get_embeddings_model():
+        modo = "textual"
+
+    # Mesma busca desde a última escrita nas ideias do usuário: sem embedding e sem consulta
+    parametros = (busca.limite,) if modo == "textual" else (busca.limite, busca.limiar, busca.preset)
+    # Lida antes de consultar: uma escrita durante a busca impede que o resultado antigo fique no cache
+    geracao = cache_buscas.geracao(usuario_id)
+    resultados = cache_buscas.obter(usuario_id, busca.termo, modo, parametros)
+    if resultados is not None:
+        if JSON_RAPIDO:
+            return RespostaJSONRapida(serializador_busca.lista(resultados))
+        return resultados
+
+    # A cota de buscas paga o embedding da busca: buscas do cache e textuais não gastam,
+    # e a cota volta se a busca não terminar usando o embedding
+    cobrada = usou_embedding = False
     try:
-        # Gerar embedding do termo de busca automaticamente
-        modelo = get_embeddings_model()
-        if not modelo:
-            # Se não tiver API Key, fazer busca simples (apenas do usuário)
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                termo = busca.termo.lower()
-                cur.execute("""
-                            SELECT id,
-                                   titulo,
-                                   tag,
-                                   ideia,
-                                   data,
-                                   0.0 AS similarity
-                            FROM ideias
-                            WHERE usuario_id = %s
-                              AND (LOWER(titulo) LIKE %s
-                                OR LOWER(tag) LIKE %s
-                                OR LOWER(ideia) LIKE %s)
-                            ORDER BY data DESC LIMIT 20
-                            """, (usuario_id, f'%{termo}%', f'%{termo}%', f'%{termo}%'))
-                resultados = cur.fetchall()
-                return [dict(resultado) for resultado in resultados]
-
-        # Gerar embedding da busca
-        embedding_busca = gerar_embedding(busca.termo)
-        if not embedding_busca:
-            raise HTTPException(status_code=500, detail="Erro ao gerar embedding da busca")
-
-        embedding_str = "[" + ",".join(map(str, embedding_busca)) + "]"
-
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                        SELECT id,
-                               titulo,
-                               tag,
-                               ideia,
-                               data,
-                               1 - (embedding <=> %s::vector) AS similarity
-                        FROM ideias
-                        WHERE usuario_id = %s
-                          AND embedding IS NOT NULL
-                          AND (1 - (embedding <=> %s::vector)) >= 0.3
-                        ORDER BY embedding <=> %s::vector
-                            LIMIT 20
-                        """, (usuario_id, embedding_str, embedding_str, embedding_str))
-            resultados = cur.fetchall()
-            return [dict(resultado) for resultado in resultados]
+        modo_executado = modo
+        embedding_busca = None
+        if modo != "textual":
+            await verificar_cota(usuario_id, RECURSO_BUSCAS)
+            cobrada = True
+            # Gerar embedding da busca
+            embedding_busca = await gerar_embedding(busca.termo)
+            if embedding_busca is None and modo == "hibrida":
+                modo_executado = "textual"  # a parte textual ainda responde
+            elif embedding_busca is None:
+                raise HTTPException(status_code=500, detail="Erro ao gerar embedding da busca")
+
+        async with get_db_connection() as conn, conn.cursor() as cur:
+            if modo_executado == "textual":
+                resultados = await _buscar_textual(cur, usuario_id, busca.termo, busca.limite)
+            elif modo_executado == "hibrida":
+                resultados = await _buscar_hibrida(cur, usuario_id, embedding_busca, busca)
+            else:
+                resultados = await _buscar_vetorial(cur, usuario_id, embedding_busca, busca)
+        resultados = [dict(resultado) for resultado in resultados]
+        usou_embedding = embedding_busca is not None
+        if modo_executado == modo:
+            # Resultado degradado por falha no embedding não fica no cache
+            cache_buscas.guardar(usuario_id, busca.termo, modo, parametros, resultados, geracao)
+        if JSON_RAPIDO:
+            return RespostaJSONRapida(serializador_busca.lista(resultados))
+        return resultados
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro na busca por similaridade: {str(e)}")
     finally:
-        conn.close()
+        if cobrada and not usou_embedding:
+            cotas.devolver(usuario_id, RECURSO_BUSCAS)
 
 
 @app.post("/api/auth/register", response_model=UserResponse)
-def registrar_usuario(register_data: RegisterRequest):
+async def registrar_usuario(register_data: RegisterRequest):
     """Registrar novo usuário (email/senha)"""
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        async with get_db_connection() as conn, conn.cursor() as cur:
             # Verificar se email já existe
-            cur.execute("SELECT id FROM usuarios WHERE email = %s", (register_data.email,))
-            if cur.fetchone():
+            await cur.execute("SELECT id FROM usuarios WHERE email = %s", (register_data.email,))
+            if await cur.fetchone():
                 raise HTTPException(status_code=400, detail="Email já cadastrado")
 
-            # Criar hash da senha
-            senha_hash = hash_senha(register_data.senha)
+            # Criar hash da senha (bcrypt é lento: rodar fora do event loop)
+            senha_hash = await run_in_threadpool(hash_senha, register_data.senha)
 
             # Criar usuário (verifica quais colunas existem)
             try:
-                cur.execute("""
+                await cur.execute("""
                             INSERT INTO usuarios (email, senha_hash, nome, metodo_auth, role)
                             VALUES (%s, %s, %s, 'email', 'user') RETURNING id, email, nome, foto_url, metodo_auth, role
                             """, (register_data.email, senha_hash, register_data.nome))
-            except psycopg2.errors.UndefinedColumn:
+            except psycopg.errors.UndefinedColumn:
                 # Se colunas não existirem, criar sem elas
-                cur.execute("""
+                await cur.execute("""
                             INSERT INTO usuarios (email, senha_hash, nome)
                             VALUES (%s, %s, %s) RETURNING id, email, nome
                             """, (register_data.email, senha_hash, register_data.nome))
 
-            usuario = cur.fetchone()
+            usuario = await cur.fetchone()
             usuario_id = usuario["id"]
 
             # Criar assinatura free
-            cur.execute("""
+            await cur.execute("""
                         INSERT INTO assinaturas (usuario_id, plano, status, limite_buscas, limite_embeddings)
                         VALUES (%s, 'free', 'ativa', 10, 10)
                         """, (usuario_id,))
 
-            conn.commit()
+            await conn.commit()
 
             # Gerar token (usar valores padrão se colunas não existirem)
             role = usuario.get("role", "user")
@@ -787,38 +1204,26 @@ def registrar_usuario(register_data: RegisterRequest):
     except HTTPException:
         raise
     except Exception as e:
-        if conn:
-            conn.rollback()
-        print(f"Erro ao registrar usuário: {e}")
+        logger.exception("Erro ao registrar usuário")
         raise HTTPException(status_code=500, detail=f"Erro ao registrar usuário: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
 
 
 @app.post("/api/auth/login", response_model=UserResponse)
-def login_usuario(login_data: LoginRequest):
+async def login_usuario(login_data: LoginRequest):
     """Login com email e senha"""
-    import sys
-    sys.stdout.flush()
-    print("=" * 80, flush=True)
-    print("🔐 [LOGIN] Nova tentativa de login", flush=True)
-    print(f"   Email: {login_data.email}", flush=True)
-    print("=" * 80, flush=True)
-
-    conn = None
+    logger.debug("Nova tentativa de login: %s", login_data.email)
+
     try:
-        conn = get_db_connection()
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        async with get_db_connection() as conn, conn.cursor() as cur:
             # Buscar usuário - verifica quais colunas existem dinamicamente
-            cur.execute("""
+            await cur.execute("""
                         SELECT column_name
                         FROM information_schema.columns
                         WHERE table_name = 'usuarios'
                           AND column_name IN ('foto_url', 'metodo_auth', 'role', 'ativo')
                         """)
-            # RealDictCursor retorna dicionários, não tuplas
-            colunas_existentes = {row['column_name'] for row in cur.fetchall()}
+            # Cursores retornam dicionários (row_factory=dict_row), não tuplas
+            colunas_existentes = {row['column_name'] for row in await cur.fetchall()}
 
             # Montar SELECT baseado nas colunas que existem
             colunas_base = ['id', 'email', 'senha_hash', 'nome']
@@ -832,9 +1237,9 @@ def login_usuario(login_data: LoginRequest):
                 colunas_base.append('ativo')
 
             query = f"SELECT {', '.join(colunas_base)} FROM usuarios WHERE email = %s"
-            cur.execute(query, (login_data.email,))
+            await cur.execute(query, (login_data.email,))
 
-            usuario = cur.fetchone()
+            usuario = await cur.fetchone()
 
             if not usuario:
                 raise HTTPException(status_code=401, detail="Email ou senha incorretos")
@@ -843,22 +1248,17 @@ def login_usuario(login_data: LoginRequest):
                 raise HTTPException(status_code=403, detail="Usuário inativo")
 
             # Verificar senha
-            print(f"🔐 Tentando login para: {login_data.email}")
-            print(f"   Usuário encontrado: ID {usuario['id']}")
-            print(f"   Tem senha_hash: {bool(usuario.get('senha_hash'))}")
-
             if not usuario.get("senha_hash"):
-                print("❌ Usuário não tem senha_hash!")
+                logger.info("Login por senha para usuário sem senha_hash (ID %s)", usuario['id'])
                 raise HTTPException(status_code=401, detail="Email ou senha incorretos")
 
-            senha_valida = verificar_senha(login_data.senha, usuario["senha_hash"])
-            print(f"   Senha válida: {senha_valida}")
+            senha_valida = await run_in_threadpool(verificar_senha, login_data.senha, usuario["senha_hash"])
 
             if not senha_valida:
-                print(f"❌ Senha incorreta para {login_data.email}")
+                logger.info("Senha incorreta para o usuário ID %s", usuario['id'])
                 raise HTTPException(status_code=401, detail="Email ou senha incorretos")
 
-            print(f"✅ Login bem-sucedido para {login_data.email}")
+            logger.info("Login bem-sucedido: usuário ID %s", usuario['id'])
 
             # Validar dados antes de criar resposta
             usuario_id = usuario["id"]
@@ -868,16 +1268,12 @@ def login_usuario(login_data: LoginRequest):
             usuario_metodo_auth = usuario.get("metodo_auth", "email")
             usuario_role = usuario.get("role", "user")
 
-            print(f"   Dados do usuário: id={usuario_id}, email={usuario_email}, role={usuario_role}")
 
             # Gerar token
             try:
                 token = criar_token_jwt(usuario_id, usuario_email, usuario_role)
-                print(f"   ✅ Token gerado com sucesso")
             except Exception as e:
-                print(f"   ❌ Erro ao gerar token: {e}")
-                import traceback
-                traceback.print_exc()
+                logger.exception("Erro ao gerar token")
                 raise HTTPException(status_code=500, detail=f"Erro ao gerar token: {str(e)}")
 
             # Criar resposta
@@ -891,30 +1287,21 @@ def login_usuario(login_data: LoginRequest):
                     role=usuario_role,
                     token=token
                 )
-                print(f"   ✅ UserResponse criado com sucesso")
                 return response
-            except Exception as e:
-                print(f"   ❌ Erro ao criar UserResponse: {e}")
-                print(
-                    f"   Dados: id={usuario_id}, email={usuario_email}, nome={usuario_nome}, foto_url={usuario_foto_url}, metodo_auth={usuario_metodo_auth}, role={usuario_role}, token_len={len(token) if token else 0}")
-                import traceback
-                traceback.print_exc()
+            except Exception:
+                logger.exception(
+                    "Erro ao criar UserResponse (id=%s, metodo_auth=%s, role=%s)",
+                    usuario_id, usuario_metodo_auth, usuario_role
+                )
                 raise
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Erro no login: {e}")
-        import traceback
-        print("📋 Traceback completo:")
-        traceback.print_exc()
+        logger.exception("Erro no login")
         raise HTTPException(status_code=500, detail=f"Erro ao fazer login: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
-
 
 @app.get("/api/auth/google/login")
-def login_google_redirect():
+async def login_google_redirect():
     """Gerar URL de login do Google"""
     if not GOOGLE_CLIENT_ID:
         # Se não configurado, retornar erro amigável
@@ -941,8 +1328,7 @@ def login_google_redirect():
     google_auth_url = f"https://accounts.google.com/o/oauth2/v2/auth?{query_string}"
 
     # Log para debug (remover em produção)
-    print(f"🔍 Redirect URI sendo usado: {redirect_uri}")
-    print(f"🔍 URL completa gerada: {google_auth_url}")
+    logger.debug("Login Google: redirect_uri=%s", redirect_uri)
 
     return {"auth_url": google_auth_url}
 
@@ -966,90 +1352,86 @@ async def google_callback(auth_request: GoogleAuthRequest):
         foto_url = google_info.get("foto_url")
 
         # Buscar ou criar usuário no banco
-        conn = get_db_connection()
-        try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                # Verificar se usuário já existe (por google_id ou email)
-                cur.execute("""
-                            SELECT id, email, nome, foto_url, metodo_auth
-                            FROM usuarios
-                            WHERE google_id = %s
-                               OR email = %s LIMIT 1
-                            """, (google_id, email))
-
-                usuario = cur.fetchone()
-
-                if usuario:
-                    # Usuário existe, atualizar dados
-                    usuario_id = usuario["id"]
-                    cur.execute("""
-                                UPDATE usuarios
-                                SET google_id     = %s,
-                                    nome          = COALESCE(%s, nome),
-                                    foto_url      = COALESCE(%s, foto_url),
-                                    metodo_auth   = 'google',
-                                    atualizado_em = CURRENT_TIMESTAMP
-                                WHERE id = %s
-                                """, (google_id, nome, foto_url, usuario_id))
-
-                    # Criar assinatura free se não tiver
-                    cur.execute("""
-                                SELECT id
-                                FROM assinaturas
-                                WHERE usuario_id = %s
-                                  AND status = 'ativa'
-                                """, (usuario_id,))
-                    if not cur.fetchone():
-                        cur.execute("""
-                                    INSERT INTO assinaturas (usuario_id, plano, status, limite_buscas, limite_embeddings)
-                                    VALUES (%s, 'free', 'ativa', 10, 10)
-                                    """, (usuario_id,))
-                else:
-                    # Criar novo usuário
-                    cur.execute("""
-                                INSERT INTO usuarios (email, nome, foto_url, google_id, metodo_auth, senha_hash)
-                                VALUES (%s, %s, %s, %s, 'google', NULL) RETURNING id
-                                """, (email, nome, foto_url, google_id))
-
-                    usuario_id = cur.fetchone()["id"]
-
-                    # Criar assinatura free para novo usuário
-                    cur.execute("""
+        async with get_db_connection() as conn, conn.cursor() as cur:
+            # Verificar se usuário já existe (por google_id ou email)
+            await cur.execute("""
+                        SELECT id, email, nome, foto_url, metodo_auth
+                        FROM usuarios
+                        WHERE google_id = %s
+                           OR email = %s LIMIT 1
+                        """, (google_id, email))
+
+            usuario = await cur.fetchone()
+
+            if usuario:
+                # Usuário existe, atualizar dados
+                usuario_id = usuario["id"]
+                await cur.execute("""
+                            UPDATE usuarios
+                            SET google_id     = %s,
+                                nome          = COALESCE(%s, nome),
+                                foto_url      = COALESCE(%s, foto_url),
+                                metodo_auth   = 'google',
+                                atualizado_em = CURRENT_TIMESTAMP
+                            WHERE id = %s
+                            """, (google_id, nome, foto_url, usuario_id))
+
+                # Criar assinatura free se não tiver
+                await cur.execute("""
+                            SELECT id
+                            FROM assinaturas
+                            WHERE usuario_id = %s
+                              AND status = 'ativa'
+                            """, (usuario_id,))
+                if not await cur.fetchone():
+                    await cur.execute("""
                                 INSERT INTO assinaturas (usuario_id, plano, status, limite_buscas, limite_embeddings)
                                 VALUES (%s, 'free', 'ativa', 10, 10)
                                 """, (usuario_id,))
+            else:
+                # Criar novo usuário
+                await cur.execute("""
+                            INSERT INTO usuarios (email, nome, foto_url, google_id, metodo_auth, senha_hash)
+                            VALUES (%s, %s, %s, %s, 'google', NULL) RETURNING id
+                            """, (email, nome, foto_url, google_id))
+
+                usuario_id = (await cur.fetchone())["id"]
+
+                # Criar assinatura free para novo usuário
+                await cur.execute("""
+                            INSERT INTO assinaturas (usuario_id, plano, status, limite_buscas, limite_embeddings)
+                            VALUES (%s, 'free', 'ativa', 10, 10)
+                            """, (usuario_id,))
 
-                conn.commit()
+            await conn.commit()
 
-                # Buscar dados atualizados
-                cur.execute("""
-                            SELECT id, email, nome, foto_url, metodo_auth
-                            FROM usuarios
-                            WHERE id = %s
-                            """, (usuario_id,))
-                usuario = cur.fetchone()
-
-                # Buscar role do usuário
-                cur.execute("SELECT role FROM usuarios WHERE id = %s", (usuario_id,))
-                role = cur.fetchone()["role"] or "user"
-
-                # Gerar token JWT
-                token = criar_token_jwt(usuario_id, email, role)
-
-                return UserResponse(
-                    id=usuario["id"],
-                    email=usuario["email"],
-                    nome=usuario["nome"],
-                    foto_url=usuario["foto_url"],
-                    metodo_auth=usuario["metodo_auth"],
-                    role=role,
-                    token=token
-                )
-        finally:
-            conn.close()
+            # Buscar dados atualizados
+            await cur.execute("""
+                        SELECT id, email, nome, foto_url, metodo_auth
+                        FROM usuarios
+                        WHERE id = %s
+                        """, (usuario_id,))
+            usuario = await cur.fetchone()
+
+            # Buscar role do usuário
+            await cur.execute("SELECT role FROM usuarios WHERE id = %s", (usuario_id,))
+            role = (await cur.fetchone())["role"] or "user"
+
+            # Gerar token JWT
+            token = criar_token_jwt(usuario_id, email, role)
+
+            return UserResponse(
+                id=usuario["id"],
+                email=usuario["email"],
+                nome=usuario["nome"],
+                foto_url=usuario["foto_url"],
+                metodo_auth=usuario["metodo_auth"],
+                role=role,
+                token=token
+            )
 
     except Exception as e:
-        print(f"Erro no callback Google: {e}")
+        logger.exception("Erro no callback Google")
         raise HTTPException(status_code=500, detail=f"Erro ao processar autenticação: {str(e)}")
 
 
@@ -1078,91 +1460,86 @@ async def google_callback_get(code: str = Query(...), error: Optional[str] = Que
         foto_url = google_info.get("foto_url")
 
         # Buscar ou criar usuário no banco
-        conn = get_db_connection()
-        try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                # Verificar se usuário já existe (por google_id ou email)
-                cur.execute("""
-                            SELECT id, email, nome, foto_url, metodo_auth
-                            FROM usuarios
-                            WHERE google_id = %s
-                               OR email = %s LIMIT 1
-                            """, (google_id, email))
-
-                usuario = cur.fetchone()
-
-                if usuario:
-                    # Usuário existe, atualizar dados
-                    usuario_id = usuario["id"]
-                    cur.execute("""
-                                UPDATE usuarios
-                                SET google_id     = %s,
-                                    nome          = COALESCE(%s, nome),
-                                    foto_url      = COALESCE(%s, foto_url),
-                                    metodo_auth   = 'google',
-                                    atualizado_em = CURRENT_TIMESTAMP
-                                WHERE id = %s
-                                """, (google_id, nome, foto_url, usuario_id))
-
-                    # Criar assinatura free se não tiver
-                    cur.execute("""
-                                SELECT id
-                                FROM assinaturas
-                                WHERE usuario_id = %s
-                                  AND status = 'ativa'
-                                """, (usuario_id,))
-                    if not cur.fetchone():
-                        cur.execute("""
-                                    INSERT INTO assinaturas (usuario_id, plano, status, limite_buscas, limite_embeddings)
-                                    VALUES (%s, 'free', 'ativa', 10, 10)
-                                    """, (usuario_id,))
-                else:
-                    # Criar novo usuário
-                    cur.execute("""
-                                INSERT INTO usuarios (email, nome, foto_url, google_id, metodo_auth, senha_hash)
-                                VALUES (%s, %s, %s, %s, 'google', NULL) RETURNING id
-                                """, (email, nome, foto_url, google_id))
-
-                    usuario_id = cur.fetchone()["id"]
-
-                    # Criar assinatura free para novo usuário
-                    cur.execute("""
+        async with get_db_connection() as conn, conn.cursor() as cur:
+            # Verificar se usuário já existe (por google_id ou email)
+            await cur.execute("""
+                        SELECT id, email, nome, foto_url, metodo_auth
+                        FROM usuarios
+                        WHERE google_id = %s
+                           OR email = %s LIMIT 1
+                        """, (google_id, email))
+
+            usuario = await cur.fetchone()
+
+            if usuario:
+                # Usuário existe, atualizar dados
+                usuario_id = usuario["id"]
+                await cur.execute("""
+                            UPDATE usuarios
+                            SET google_id     = %s,
+                                nome          = COALESCE(%s, nome),
+                                foto_url      = COALESCE(%s, foto_url),
+                                metodo_auth   = 'google',
+                                atualizado_em = CURRENT_TIMESTAMP
+                            WHERE id = %s
+                            """, (google_id, nome, foto_url, usuario_id))
+
+                # Criar assinatura free se não tiver
+                await cur.execute("""
+                            SELECT id
+                            FROM assinaturas
+                            WHERE usuario_id = %s
+                              AND status = 'ativa'
+                            """, (usuario_id,))
+                if not await cur.fetchone():
+                    await cur.execute("""
                                 INSERT INTO assinaturas (usuario_id, plano, status, limite_buscas, limite_embeddings)
                                 VALUES (%s, 'free', 'ativa', 10, 10)
                                 """, (usuario_id,))
-
-                conn.commit()
-
-                # Buscar dados atualizados
-                cur.execute("""
-                            SELECT id, email, nome, foto_url, metodo_auth
-                            FROM usuarios
-                            WHERE id = %s
+            else:
+                # Criar novo usuário
+                await cur.execute("""
+                            INSERT INTO usuarios (email, nome, foto_url, google_id, metodo_auth, senha_hash)
+                            VALUES (%s, %s, %s, %s, 'google', NULL) RETURNING id
+                            """, (email, nome, foto_url, google_id))
+
+                usuario_id = (await cur.fetchone())["id"]
+
+                # Criar assinatura free para novo usuário
+                await cur.execute("""
+                            INSERT INTO assinaturas (usuario_id, plano, status, limite_buscas, limite_embeddings)
+                            VALUES (%s, 'free', 'ativa', 10, 10)
                             """, (usuario_id,))
-                usuario = cur.fetchone()
 
-                # Buscar role do usuário
-                cur.execute("SELECT role FROM usuarios WHERE id = %s", (usuario_id,))
-                role = cur.fetchone()["role"] or "user"
+            await conn.commit()
 
-                # Gerar token JWT
-                token = criar_token_jwt(usuario_id, email, role)
+            # Buscar dados atualizados
+            await cur.execute("""
+                        SELECT id, email, nome, foto_url, metodo_auth
+                        FROM usuarios
+                        WHERE id = %s
+                        """, (usuario_id,))
+            usuario = await cur.fetchone()
 
-        finally:
-            conn.close()
+            # Buscar role do usuário
+            await cur.execute("SELECT role FROM usuarios WHERE id = %s", (usuario_id,))
+            role = (await cur.fetchone())["role"] or "user"
+
+            # Gerar token JWT
+            token = criar_token_jwt(usuario_id, email, role)
 
         # Redirecionar para frontend com token
         frontend_url = os.getenv("FRONTEND_URL", "http://localhost:5173")
         return RedirectResponse(url=f"{frontend_url}/auth/google/callback?code={code}&token={token}")
 
-    except Exception as e:
-        print(f"Erro no callback Google (GET): {e}")
+    except Exception:
+        logger.exception("Erro no callback Google (GET)")
         frontend_url = os.getenv("FRONTEND_URL", "http://localhost:5173")
         return RedirectResponse(url=f"{frontend_url}/auth/google/callback?error=server_error")
 
 
 @app.get("/api/auth/google/debug")
-def debug_google_oauth():
+async def debug_google_oauth():
     """Endpoint de debug para verificar configuração do Google OAuth"""
     redirect_uri = os.getenv("GOOGLE_REDIRECT_URI", "http://143.198.133.156:8002/api/auth/google/callback")
     from urllib.parse import quote
@@ -1188,84 +1565,119 @@ async def obter_usuario_logado(user: dict = Depends(obter_usuario_atual)):
     if not user:
         raise HTTPException(status_code=401, detail="Não autenticado")
 
-    conn = get_db_connection()
-    try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                        SELECT id, email, nome, foto_url, metodo_auth, role
-                        FROM usuarios
-                        WHERE id = %s
-                        """, (user["user_id"],))
-            usuario = cur.fetchone()
+    async with get_db_connection() as conn, conn.cursor() as cur:
+        await cur.execute("""
+                    SELECT id, email, nome, foto_url, metodo_auth, role
+                    FROM usuarios
+                    WHERE id = %s
+                    """, (user["user_id"],))
+        usuario = await cur.fetchone()
 
-            if not usuario:
-                raise HTTPException(status_code=404, detail="Usuário não encontrado")
+        if not usuario:
+            raise HTTPException(status_code=404, detail="Usuário não encontrado")
 
-            return dict(usuario)
-    finally:
-        conn.close()
+        return dict(usuario)
+
+
+@app.post("/api/acessos", status_code=202)
+async def registrar_acesso(acesso: AcessoCreate):
+    """Registrar log de acesso com localização (gravado em lote, em segundo plano)"""
+    linha = tuple(getattr(acesso, coluna) for coluna in COLUNAS_ACESSO)
+    if not buffer_acessos.adicionar(linha):
+        # Fila cheia (banco lento ou fora do ar): o cliente pode tentar de novo mais tarde
+        raise HTTPException(
+            status_code=503,
+            detail="Fila de acessos cheia, tente novamente mais tarde",
+            headers={"Retry-After": "1"}
+        )
+    return {"message": "Acesso registrado com sucesso"}
 
 
-@app.post("/api/acessos")
-def registrar_acesso(acesso: AcessoCreate):
-    """Registrar log de acesso com localização"""
-    conn = None
+ACESSOS_BATCH_MAX = int(os.getenv("ACESSOS_BATCH_MAX", "1000"))  # acessos por requisição em /api/acessos/batch
+ACESSOS_BATCH_BYTES = int(os.getenv("ACESSOS_BATCH_BYTES", str(1024 * 1024)))  # tamanho máximo do corpo
+_validador_acesso = TypeAdapter(AcessoCreate)
+_validador_acessos = TypeAdapter(List[AcessoCreate])
+
+
+def _lote_grande_demais(quantidade: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Máximo de {ACESSOS_BATCH_MAX} acessos por requisição (recebidos: {quantidade})"
+    )
+
+
+async def _ler_corpo_limitado(request: Request, limite: int) -> bytes:
+    """Ler o corpo parando em `limite` bytes (413 sem ler o resto; vale também sem Content-Length)"""
+    excedido = HTTPException(status_code=413, detail=f"Corpo maior que {limite} bytes")
+    try:
+        if int(request.headers.get("content-length", "0")) > limite:
+            raise excedido
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Content-Length inválido")
+
+    partes, tamanho = [], 0
+    async for parte in request.stream():
+        tamanho += len(parte)
+        if tamanho > limite:
+            raise excedido
+        partes.append(parte)
+    return b"".join(partes)
+
+
+@app.post("/api/acessos/batch")
+async def registrar_acessos_em_lote(request: Request):
+    """
+    Registrar vários acessos numa requisição, gravados com um único COPY.
+    Corpo: array JSON de acessos ou NDJSON (um acesso por linha, Content-Type: application/x-ndjson)
+    """
+    corpo = await _ler_corpo_limitado(request, ACESSOS_BATCH_BYTES)
+    # O número de acessos é conferido antes de validar qualquer um
+    try:
+        if "ndjson" in request.headers.get("content-type", ""):
+            registros = [linha for linha in corpo.splitlines() if linha.strip()]
+            if len(registros) > ACESSOS_BATCH_MAX:
+                raise _lote_grande_demais(len(registros))
+            acessos = [_validador_acesso.validate_json(linha) for linha in registros]
+        else:
+            try:
+                registros = json.loads(corpo)
+            except ValueError:
+                raise HTTPException(status_code=422, detail="Corpo não é um JSON válido")
+            if isinstance(registros, list) and len(registros) > ACESSOS_BATCH_MAX:
+                raise _lote_grande_demais(len(registros))
+            acessos = _validador_acessos.validate_python(registros)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+
+    if not acessos:
+        return {"message": "Nenhum acesso recebido", "registrados": 0}
+
+    linhas = [tuple(getattr(acesso, coluna) for coluna in COLUNAS_ACESSO) for acesso in acessos]
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cur:
-            cur.execute("""
-                        INSERT INTO acessos (usuario_id, ip_address, user_agent, pais, cidade, regiao,
-                                             timezone, latitude, longitude, endpoint, metodo_http,
-                                             status_code, tempo_resposta_ms)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING id
-                        """, (
-                            acesso.usuario_id,
-                            acesso.ip_address,
-                            acesso.user_agent,
-                            acesso.pais,
-                            acesso.cidade,
-                            acesso.regiao,
-                            acesso.timezone,
-                            acesso.latitude,
-                            acesso.longitude,
-                            acesso.endpoint,
-                            acesso.metodo_http,
-                            acesso.status_code,
-                            acesso.tempo_resposta_ms
-                        ))
-            acesso_id = cur.fetchone()[0]
-            conn.commit()
-            return {"id": acesso_id, "message": "Acesso registrado com sucesso"}
-    except psycopg2.OperationalError:
-        # Se tabela não existe ainda, não bloquear a aplicação
-        if conn:
-            conn.rollback()
-        return {"message": "Tabela de acessos não encontrada (ignore se ainda não criou)"}
+        async with get_db_connection() as conn:
+            registrados = await copiar_acessos(conn, linhas)
+    except HTTPException:
+        raise
     except Exception as e:
-        if conn:
-            conn.rollback()
-        # Não bloquear a aplicação se der erro ao registrar acesso
-        print(f"⚠️ Erro ao registrar acesso (ignorado): {e}")
-        return {"message": "Erro ao registrar acesso (ignorado)"}
-    finally:
-        if conn:
-            conn.close()
+        logger.warning("Erro ao registrar %d acesso(s) em lote: %s", len(linhas), e)
+        raise HTTPException(status_code=500, detail=f"Erro ao registrar acessos: {str(e)}")
+
+    return {"message": "Acessos registrados com sucesso", "registrados": registrados}
 
 
 @app.delete("/api/ideias/limpar")
-def limpar_todas_ideias():
+async def limpar_todas_ideias():
     """⚠️ LIMPAR TODAS AS IDEIAS - CUIDADO!"""
-    conn = get_db_connection()
     try:
-        with conn.cursor() as cur:
-            cur.execute("TRUNCATE TABLE ideias RESTART IDENTITY CASCADE")
-            conn.commit()
+        async with get_db_connection() as conn, conn.cursor() as cur:
+            await cur.execute("TRUNCATE TABLE ideias RESTART IDENTITY CASCADE")
+            await conn.commit()
+            cache_buscas.limpar()
             return {"message": "Todas as ideias foram deletadas", "success": True}
+    except HTTPException:
+        raise
     except Exception as e:
-        conn.rollback()
         raise HTTPException(status_code=500, detail=f"Erro ao limpar ideias: {str(e)}")
-    finally:
-        conn.close()
 
 
 if __name__ == "__main__":
@@ -5,10 +5,14 @@ Módulo de autenticação - Google OAuth e JWT
 import jwt
 import httpx
 import bcrypt
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional
 import os
 from dotenv import load_dotenv
+from fastapi import HTTPException, Request
+from logs import obter_logger
 
 load_dotenv()
 
@@ -17,6 +21,13 @@ JWT_SECRET = os.getenv("JWT_SECRET", "sua-chave-secreta-mude-em-producao")
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24 * 7  # 7 dias
 
+# Cache de tokens já verificados (evita decodificar/verificar o HMAC a cada requisição)
+JWT_CACHE_TAMANHO = int(os.getenv("JWT_CACHE_TAMANHO", "10000"))
+JWT_CACHE_TTL = float(os.getenv("JWT_CACHE_TTL", "300"))  # segundos (nunca passa do exp do token)
+
+# Debug da autenticação: desligado por padrão (LOG_NIVEL=DEBUG para ver)
+logger = obter_logger("auth")
+
 # Google OAuth
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
@@ -43,24 +54,101 @@ def verificar_senha(senha: str, senha_hash: str) -> bool:
     except Exception:
         return False
 
+class CacheTokens:
+    """
+    Cache LRU de payloads de tokens válidos.
+    Cada entrada vale por `ttl` segundos ou até o exp do token, o que vier primeiro.
+    """
+
+    def __init__(self, tamanho: int = JWT_CACHE_TAMANHO, ttl: float = JWT_CACHE_TTL):
+        self.tamanho = tamanho
+        self.ttl = ttl
+        self._itens = OrderedDict()  # token -> (expira_em, payload)
+        self.hits = 0
+        self.misses = 0
+
+    def obter(self, token: str) -> Optional[dict]:
+        item = self._itens.get(token)
+        if item is None:
+            self.misses += 1
+            return None
+        expira_em, payload = item
+        if time.time() >= expira_em:
+            del self._itens[token]
+            self.misses += 1
+            return None
+        self._itens.move_to_end(token)
+        self.hits += 1
+        return dict(payload)  # cópia: quem chama pode alterar o dicionário
+
+    def guardar(self, token: str, payload: dict):
+        expira_em = time.time() + self.ttl
+        if "exp" in payload:
+            expira_em = min(expira_em, float(payload["exp"]))
+        self._itens[token] = (expira_em, dict(payload))
+        self._itens.move_to_end(token)
+        while len(self._itens) > self.tamanho:
+            self._itens.popitem(last=False)
+
+    def limpar(self):
+        self._itens.clear()
+
+    def metricas(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "itens": len(self._itens),
+            "tamanho_maximo": self.tamanho,
+            "taxa_acerto": round(self.hits / total, 3) if total else 0.0,
+        }
+
+cache_tokens = CacheTokens()
+
 def verificar_token_jwt(token: str) -> Optional[dict]:
-    """Verificar e decodificar token JWT"""
+    """Verificar e decodificar token JWT (tokens já verificados vêm do cache)"""
+    payload = cache_tokens.obter(token)
+    if payload is not None:
+        return payload
+
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        print(f"   ✅ Token decodificado com sucesso!")
-        return payload
     except jwt.ExpiredSignatureError as e:
-        print(f"   ❌ Token expirado: {e}")
+        logger.debug("Token expirado: %s", e)
         return None
     except jwt.InvalidTokenError as e:
-        print(f"   ❌ Token inválido: {e}")
+        logger.debug("Token inválido: %s", e)
         return None
-    except Exception as e:
-        print(f"   ❌ Erro inesperado ao decodificar token: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Erro inesperado ao decodificar token")
         return None
 
+    cache_tokens.guardar(token, payload)
+    return payload
+
+async def obter_usuario_atual(request: Request) -> dict:
+    """Extrair usuário do token JWT - LANÇA EXCEÇÃO se não autenticado (dependência das rotas)"""
+    authorization = request.headers.get("authorization")
+
+    if not authorization:
+        logger.debug("Authorization header não recebido (%s %s)", request.method, request.url.path)
+        raise HTTPException(status_code=401, detail="Token de autenticação não fornecido")
+
+    esquema, _, token = authorization.partition(" ")
+    if esquema != "Bearer" or not token:
+        logger.debug("Authorization header sem 'Bearer ' (%s %s)", request.method, request.url.path)
+        raise HTTPException(status_code=401, detail="Formato de token inválido. Use 'Bearer <token>'")
+
+    payload = verificar_token_jwt(token)
+    if not payload:
+        raise HTTPException(status_code=401, detail="Token inválido ou expirado")
+
+    if not payload.get("user_id"):
+        logger.debug("Token sem user_id (chaves: %s)", list(payload.keys()))
+        raise HTTPException(status_code=401, detail="Token inválido: user_id não encontrado no token")
+
+    return payload
+
 async def validar_token_google(token: str) -> Optional[dict]:
     """
     Validar token do Google e retornar informações do usuário
@@ -102,7 +190,7 @@ async def validar_token_google(token: str) -> Optional[dict]:
             return None
             
     except Exception as e:
-        print(f"Erro ao validar token Google: {e}")
+        logger.warning("Erro ao validar token Google: %s", e)
         return None
 
 async def obter_info_google_por_code(code: str, redirect_uri: str) -> Optional[dict]:
@@ -127,7 +215,7 @@ async def obter_info_google_por_code(code: str, redirect_uri: str) -> Optional[d
             )
             
             if token_response.status_code != 200:
-                print(f"Erro ao trocar code: {token_response.text}")
+                logger.warning("Erro ao trocar code do Google: %s", token_response.text)
                 return None
             
             tokens = token_response.json()
@@ -162,6 +250,6 @@ async def obter_info_google_por_code(code: str, redirect_uri: str) -> Optional[d
             return None
             
     except Exception as e:
-        print(f"Erro ao obter info Google: {e}")
+        logger.warning("Erro ao obter info Google: %s", e)
         return None
 
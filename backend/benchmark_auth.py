@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark da autenticação por requisição (obter_usuario_atual)
+Compara a verificação completa do JWT com o caminho do cache de tokens.
+Meta: menos de 50µs por requisição com o cache quente.
+
+Uso: python benchmark_auth.py [iteracoes]
+"""
+
+import asyncio
+import sys
+import time
+
+from starlette.requests import Request
+
+from auth import cache_tokens, criar_token_jwt, obter_usuario_atual
+
+META_US = 50.0
+
+
+def criar_request(token: str) -> Request:
+    """Request mínimo do Starlette com o header Authorization"""
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/api/ideias",
+        "query_string": b"",
+        "headers": [
+            (b"host", b"localhost"),
+            (b"user-agent", b"benchmark"),
+            (b"accept", b"application/json"),
+            (b"authorization", f"Bearer {token}".encode()),
+        ],
+    }
+    return Request(scope)
+
+
+async def medir(token: str, iteracoes: int, limpar_cache: bool) -> float:
+    """Média em microssegundos por chamada de obter_usuario_atual"""
+    inicio = time.perf_counter()
+    for _ in range(iteracoes):
+        if limpar_cache:
+            cache_tokens.limpar()
+        # Cada requisição real cria um Request novo (headers ainda não parseados)
+        await obter_usuario_atual(criar_request(token))
+    return (time.perf_counter() - inicio) / iteracoes * 1_000_000
+
+
+async def main():
+    iteracoes = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    token = criar_token_jwt(42, "benchmark@example.com")
+
+    # Aquecimento
+    await medir(token, 1000, limpar_cache=False)
+
+    sem_cache = await medir(token, iteracoes, limpar_cache=True)
+    com_cache = await medir(token, iteracoes, limpar_cache=False)
+
+    print(f"🔐 obter_usuario_atual ({iteracoes} iterações)")
+    print(f"   Sem cache (jwt.decode a cada requisição): {sem_cache:8.2f} µs")
+    print(f"   Com cache de tokens:                      {com_cache:8.2f} µs")
+    print(f"   Ganho: {sem_cache / com_cache:.1f}x")
+
+    if com_cache < META_US:
+        print(f"✅ Abaixo da meta de {META_US:.0f}µs por requisição")
+    else:
+        print(f"❌ Acima da meta de {META_US:.0f}µs por requisição")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
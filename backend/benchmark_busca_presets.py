@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos presets da busca vetorial (BuscaRequest.preset)
+Usa os mesmos dados sintéticos de benchmark_busca_tenants.py e força o caminho do HNSW
+(EstrategiaBusca com exata_max = 0) para medir, em cada preset, recall@20 contra a busca exata
+e a latência (p50/p95) por tamanho de usuário.
+Precisa do banco configurado no .env com pgvector.
+
+Uso: python benchmark_busca_presets.py [total_ideias] [consultas_por_usuario]
+"""
+
+import asyncio
+import statistics
+import sys
+
+from benchmark_busca_tenants import (
+    DIMENSOES,
+    K,
+    SCHEMA,
+    TAMANHOS,
+    conectar,
+    consultas_do_usuario,
+    criar_dados,
+    percentil,
+    remover_dados,
+    usar_schema,
+    vizinhos,
+)
+from busca_vetorial import BUSCA_PRESETS, PGVECTOR_ITERATIVO, EstrategiaBusca, ef_search_preset
+
+
+async def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    consultas = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    conn = await conectar()
+    try:
+        print(f"📦 Criando dados em {SCHEMA} ({total} ideias, {DIMENSOES} dimensões)")
+        await criar_dados(conn, total)
+        await usar_schema(conn)
+
+        estrategia = EstrategiaBusca(exata_max=0)  # todo usuário pelo HNSW
+        print(f"\n🔎 recall@{K} x latência por preset ({consultas} consultas por usuário)")
+        cabecalho = " | ".join(f"{preset:>24}" for preset in BUSCA_PRESETS)
+        print(f"   {'ideias':>7} | {cabecalho}")
+        for usuario_id, tamanho in TAMANHOS.items():
+            medidas = {preset: ([], []) for preset in BUSCA_PRESETS}
+            for vetor in await consultas_do_usuario(conn, usuario_id, consultas):
+                gabarito, _ = await vizinhos(conn, usuario_id, vetor, exata=True)
+                esperado = set(gabarito)
+                for preset in BUSCA_PRESETS:
+                    ids, duracao = await vizinhos(conn, usuario_id, vetor,
+                                                  estrategia=estrategia, preset=preset)
+                    medidas[preset][0].append(len(esperado & set(ids)) / len(esperado) if esperado else 1.0)
+                    medidas[preset][1].append(duracao)
+
+            colunas = []
+            for preset in BUSCA_PRESETS:
+                recalls, tempos = medidas[preset]
+                colunas.append(f"{statistics.mean(recalls):5.3f} "
+                               f"{percentil(tempos, 50):6.2f}/{percentil(tempos, 95):6.2f}ms")
+            print(f"   {tamanho:>7} | " + " | ".join(f"{coluna:>24}" for coluna in colunas))
+
+        iterativo = estrategia.versao_pgvector >= PGVECTOR_ITERATIVO
+        efs = ", ".join(f"{preset}={ef_search_preset(preset, K, iterativo)}" for preset in BUSCA_PRESETS)
+        print("\n   Formato: recall p50/p95 (ms)")
+        print(f"   pgvector {estrategia.metricas()['pgvector']} "
+              f"(iterative scan: {'sim' if iterativo else 'não'}); hnsw.ef_search: {efs}")
+    finally:
+        await remover_dados(conn)
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
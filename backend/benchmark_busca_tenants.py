@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Benchmark da busca vetorial por usuário (busca_vetorial.py)
+Cria um schema separado (benchmark_busca) com ideias sintéticas de vários usuários na mesma tabela,
+com um índice HNSW global, e compara para usuários de tamanhos diferentes:
+- global: o que a busca fazia antes (HNSW global + WHERE usuario_id, ef_search padrão)
+- exata: varredura exata das ideias do usuário (gabarito da recall)
+- estrategia: o que a busca faz agora (exata até BUSCA_EXATA_MAX, HNSW com iterative scan acima)
+Mostra recall@20 e latência (p50/p95). Precisa do banco configurado no .env com pgvector.
+
+Uso: python benchmark_busca_tenants.py [total_ideias] [consultas_por_usuario]
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+
+import numpy as np
+import psycopg
+from pgvector.psycopg import register_vector_async
+from psycopg.rows import dict_row
+
+from busca_vetorial import EstrategiaBusca, BUSCA_PRESET_PADRAO, sql_vizinhos
+from db import DB_CONFIG
+from db_async import _parametros_conexao
+
+SCHEMA = "benchmark_busca"
+DIMENSOES = 1536
+K = 20
+TOPICOS = 300  # centros globais; cada ideia é um centro + ruído
+# Usuários medidos (ids negativos para não colidir com usuários reais em versoes_ideias)
+TAMANHOS = {-1: 50, -2: 500, -3: 5000, -4: 20000}
+USUARIOS_RUIDO = 400  # usuários pequenos que completam o total da tabela
+
+rng = np.random.default_rng(42)
+centros = rng.standard_normal((TOPICOS, DIMENSOES)).astype(np.float32)
+
+
+def gerar_vetores(quantidade: int) -> np.ndarray:
+    topicos = rng.integers(0, TOPICOS, quantidade)
+    vetores = centros[topicos] + 0.8 * rng.standard_normal((quantidade, DIMENSOES)).astype(np.float32)
+    return vetores / np.linalg.norm(vetores, axis=1, keepdims=True)
+
+
+async def criar_dados(conn, total: int):
+    async with conn.cursor() as cur:
+        await cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await cur.execute(f"CREATE SCHEMA {SCHEMA}")
+        await cur.execute(f"""
+            CREATE TABLE {SCHEMA}.ideias (
+                id BIGSERIAL PRIMARY KEY,
+                usuario_id BIGINT NOT NULL,
+                titulo TEXT NOT NULL,
+                tag TEXT,
+                ideia TEXT NOT NULL,
+                data TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                embedding vector({DIMENSOES})
+            )
+        """)
+
+        restante = max(total - sum(TAMANHOS.values()), 0)
+        usuarios = dict(TAMANHOS)
+        for i in range(USUARIOS_RUIDO):
+            usuarios[-100 - i] = restante // USUARIOS_RUIDO
+
+        inicio = time.perf_counter()
+        for usuario_id, quantidade in usuarios.items():
+            for lote in range(0, quantidade, 5000):
+                vetores = gerar_vetores(min(5000, quantidade - lote))
+                async with cur.copy(
+                    f"COPY {SCHEMA}.ideias (usuario_id, titulo, ideia, embedding) FROM STDIN"
+                ) as copy:
+                    for vetor in vetores:
+                        await copy.write_row((usuario_id, "benchmark", "benchmark", vetor))
+        await conn.commit()
+        print(f"   {sum(usuarios.values())} ideias de {len(usuarios)} usuários em {time.perf_counter() - inicio:.1f}s")
+
+        inicio = time.perf_counter()
+        await cur.execute("SET maintenance_work_mem = '1GB'")
+        await cur.execute(f"CREATE INDEX ON {SCHEMA}.ideias (usuario_id)")
+        await cur.execute(f"CREATE INDEX ON {SCHEMA}.ideias USING hnsw (embedding vector_cosine_ops)")
+        await cur.execute(f"ANALYZE {SCHEMA}.ideias")
+        await conn.commit()
+        print(f"   Índices (btree usuario_id + HNSW) em {time.perf_counter() - inicio:.1f}s")
+
+
+async def conectar():
+    conn = await psycopg.AsyncConnection.connect(**_parametros_conexao(DB_CONFIG))
+    await register_vector_async(conn)
+    conn.row_factory = dict_row
+    return conn
+
+
+async def usar_schema(conn):
+    """As consultas da aplicação (sem schema) passam a usar a tabela do benchmark"""
+    await conn.execute(f"SET search_path = {SCHEMA}, public")
+    await conn.commit()
+
+
+async def remover_dados(conn):
+    await conn.rollback()
+    await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    await conn.commit()
+
+
+async def consultas_do_usuario(conn, usuario_id: int, quantidade: int) -> list:
+    """Vetores de consulta próximos de ideias do usuário (como um termo parecido com o que ele escreveu)"""
+    async with conn.cursor() as cur:
+        await cur.execute("SELECT embedding FROM ideias WHERE usuario_id = %s ORDER BY random() LIMIT %s",
+                          (usuario_id, quantidade))
+        linhas = await cur.fetchall()
+    await conn.rollback()
+    consultas = []
+    for linha in linhas:
+        vetor = linha["embedding"] + np.float32(0.3) * rng.standard_normal(DIMENSOES).astype(np.float32)
+        consultas.append((vetor / np.linalg.norm(vetor)).astype(np.float32))
+    return consultas
+
+
+async def vizinhos(conn, usuario_id: int, vetor, exata: bool = False, estrategia=None,
+                   preset: str = BUSCA_PRESET_PADRAO):
+    """ids dos K vizinhos + tempo (ms); cada consulta na própria transação (set_config local)"""
+    async with conn.cursor() as cur:
+        inicio = time.perf_counter()
+        if estrategia is not None:
+            sql = await estrategia.preparar(cur, usuario_id, K, preset)
+        else:
+            sql = sql_vizinhos(exata)
+        await cur.execute(
+            f"WITH consulta AS (SELECT %(vetor)b AS vetor) {sql}",
+            {"vetor": vetor, "usuario_id": usuario_id, "vizinhos": K}
+        )
+        ids = [linha["id"] for linha in await cur.fetchall()]
+        duracao = (time.perf_counter() - inicio) * 1000
+    await conn.rollback()
+    return ids, duracao
+
+
+def percentil(valores, p: float) -> float:
+    return float(np.percentile(valores, p)) if valores else 0.0
+
+
+async def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    consultas = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    conn = await conectar()
+    try:
+        print(f"📦 Criando dados em {SCHEMA} ({total} ideias, {DIMENSOES} dimensões)")
+        await criar_dados(conn, total)
+        await usar_schema(conn)
+
+        estrategia = EstrategiaBusca()
+        print(f"\n🔎 recall@{K} e latência por tamanho de usuário ({consultas} consultas cada)")
+        print(f"   {'ideias':>7} | {'global (antes)':>24} | {'exata':>16} | {'estratégia (agora)':>30}")
+        for usuario_id, tamanho in TAMANHOS.items():
+            medidas = {"global": ([], []), "exata": ([], []), "estrategia": ([], [])}
+            escolhas = {"exata": 0, "indice": 0}
+            for vetor in await consultas_do_usuario(conn, usuario_id, consultas):
+                gabarito, t_exata = await vizinhos(conn, usuario_id, vetor, exata=True)
+                globais, t_global = await vizinhos(conn, usuario_id, vetor, exata=False)
+                antes = dict(estrategia.metricas())
+                atuais, t_estrategia = await vizinhos(conn, usuario_id, vetor, estrategia=estrategia)
+                escolhas["exata" if estrategia.metricas()["exatas"] > antes["exatas"] else "indice"] += 1
+
+                esperado = set(gabarito)
+                for nome, ids, duracao in (("global", globais, t_global), ("exata", gabarito, t_exata),
+                                           ("estrategia", atuais, t_estrategia)):
+                    medidas[nome][0].append(len(esperado & set(ids)) / len(esperado) if esperado else 1.0)
+                    medidas[nome][1].append(duracao)
+
+            def resumo(nome):
+                recalls, tempos = medidas[nome]
+                return f"{statistics.mean(recalls):5.3f} {percentil(tempos, 50):6.2f}/{percentil(tempos, 95):6.2f}ms"
+
+            caminho = "exata" if escolhas["exata"] >= escolhas["indice"] else "HNSW"
+            print(f"   {tamanho:>7} | {resumo('global'):>24} | {resumo('exata'):>16} | "
+                  f"{resumo('estrategia'):>23} ({caminho})")
+
+        print("\n   Formato: recall p50/p95 (ms)")
+        print(f"   pgvector {estrategia.metricas()['pgvector']}, BUSCA_EXATA_MAX = {estrategia.exata_max}")
+    finally:
+        await remover_dados(conn)
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
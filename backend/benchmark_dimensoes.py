@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Benchmark da dimensão dos embeddings (EMBEDDING_DIMENSOES, Matryoshka)
+Encurta os embeddings para 256/512/1024 dimensões (ajustar_dimensoes: primeiros N valores + norma L2)
+e compara com o tamanho completo:
+- qualidade: recall@20 contra os vizinhos exatos com o embedding completo (sem índice e pelo HNSW)
+- velocidade: latência p50/p95 da busca pelo HNSW
+- armazenamento: tamanho da tabela e do índice HNSW
+Usa os embeddings reais de ideias (gerados pela OpenAI); sem embeddings suficientes, usa vetores
+sintéticos com a variância concentrada nas primeiras dimensões (aproximação do Matryoshka).
+Os dados ficam num schema separado (benchmark_dimensoes), apagado no fim.
+Precisa do banco configurado no .env com pgvector.
+
+Uso: python benchmark_dimensoes.py [max_ideias] [consultas]
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from benchmark_busca_tenants import conectar, percentil
+from busca_vetorial import BUSCA_EF_SEARCH
+from embedding_cache import ajustar_dimensoes
+
+SCHEMA = "benchmark_dimensoes"
+K = 20
+DIMENSOES = [256, 512, 1024, 1536]
+MINIMO_REAIS = 1000  # abaixo disso, dados sintéticos
+
+rng = np.random.default_rng(42)
+
+
+async def carregar_embeddings(conn, maximo: int) -> np.ndarray:
+    async with conn.cursor() as cur:
+        await cur.execute("SELECT embedding FROM ideias WHERE embedding IS NOT NULL LIMIT %s", (maximo,))
+        linhas = await cur.fetchall()
+    await conn.rollback()
+    if len(linhas) >= MINIMO_REAIS:
+        print(f"   {len(linhas)} embeddings reais de ideias")
+        return np.stack([ajustar_dimensoes(linha["embedding"], 1536) for linha in linhas])
+
+    print(f"   ⚠️  Só {len(linhas)} embeddings reais; usando {maximo} vetores sintéticos")
+    dimensoes = 1536
+    escala = (1.0 / np.sqrt(1.0 + np.arange(dimensoes) / 64.0)).astype(np.float32)
+    centros = rng.standard_normal((200, dimensoes)).astype(np.float32) * escala
+    vetores = centros[rng.integers(0, 200, maximo)]
+    vetores = vetores + 0.7 * rng.standard_normal((maximo, dimensoes)).astype(np.float32) * escala
+    return vetores / np.linalg.norm(vetores, axis=1, keepdims=True)
+
+
+def encurtar(vetores: np.ndarray, dimensoes: int) -> np.ndarray:
+    """ajustar_dimensoes em todas as linhas de uma vez"""
+    curtos = vetores[:, :dimensoes]
+    return (curtos / np.linalg.norm(curtos, axis=1, keepdims=True)).astype(np.float32)
+
+
+def vizinhos_exatos(vetores: np.ndarray, consultas: np.ndarray) -> list:
+    """Top-K por cosseno (vetores normalizados) de cada consulta, sem a própria linha"""
+    similaridades = vetores[consultas] @ vetores.T
+    similaridades[np.arange(len(consultas)), consultas] = -np.inf
+    melhores = np.argpartition(-similaridades, K, axis=1)[:, :K]
+    return [set(linha) for linha in melhores]
+
+
+def recall(esperados: list, obtidos: list) -> float:
+    return statistics.mean(len(e & o) / K for e, o in zip(esperados, obtidos))
+
+
+async def medir_dimensao(conn, vetores: np.ndarray, consultas: np.ndarray, gabarito: list, dimensoes: int):
+    curtos = encurtar(vetores, dimensoes)
+    tabela = f"{SCHEMA}.vetores_{dimensoes}"
+    async with conn.cursor() as cur:
+        await cur.execute(f"CREATE TABLE {tabela} (id INT PRIMARY KEY, embedding vector({dimensoes}))")
+        async with cur.copy(f"COPY {tabela} (id, embedding) FROM STDIN") as copy:
+            for posicao, vetor in enumerate(curtos):
+                await copy.write_row((posicao, vetor))
+        await conn.commit()
+
+        inicio = time.perf_counter()
+        await cur.execute("SET maintenance_work_mem = '1GB'")
+        await cur.execute(f"CREATE INDEX idx_vetores_{dimensoes} ON {tabela} "
+                          "USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)")
+        await conn.commit()
+        construcao = time.perf_counter() - inicio
+
+        await cur.execute(
+            "SELECT pg_table_size(%s::regclass) AS tabela, pg_relation_size(%s::regclass) AS indice",
+            (tabela, f"{SCHEMA}.idx_vetores_{dimensoes}")
+        )
+        tamanhos = await cur.fetchone()
+
+        await cur.execute(f"SET hnsw.ef_search = {BUSCA_EF_SEARCH}")
+        obtidos, tempos = [], []
+        for consulta in consultas:
+            inicio = time.perf_counter()
+            await cur.execute(
+                f"SELECT id FROM {tabela} WHERE id <> %s ORDER BY embedding <=> %b LIMIT %s",
+                (int(consulta), curtos[consulta], K)
+            )
+            obtidos.append({linha["id"] for linha in await cur.fetchall()})
+            tempos.append((time.perf_counter() - inicio) * 1000)
+    await conn.rollback()
+
+    return {
+        "recall_exata": recall(gabarito, vizinhos_exatos(curtos, consultas)),
+        "recall_hnsw": recall(gabarito, obtidos),
+        "p50": percentil(tempos, 50),
+        "p95": percentil(tempos, 95),
+        "tabela": tamanhos["tabela"],
+        "indice": tamanhos["indice"],
+        "construcao": construcao,
+    }
+
+
+async def main():
+    maximo = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    quantidade = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    conn = await conectar()
+    try:
+        print("📦 Carregando embeddings")
+        vetores = await carregar_embeddings(conn, maximo)
+        consultas = rng.choice(len(vetores), size=min(quantidade, len(vetores)), replace=False)
+        gabarito = vizinhos_exatos(vetores, consultas)
+
+        async with conn.cursor() as cur:
+            await cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            await cur.execute(f"CREATE SCHEMA {SCHEMA}")
+        await conn.commit()
+
+        completas = vetores.shape[1]  # menor que 1536 se a coluna já foi encurtada (migração 003)
+        print(f"\n🔎 {len(vetores)} vetores, {len(consultas)} consultas, recall@{K} contra {completas} dimensões "
+              f"(hnsw.ef_search = {BUSCA_EF_SEARCH})")
+        print(f"   {'dim':>5} | {'recall exata':>12} | {'recall HNSW':>11} | {'p50/p95 (ms)':>15} | "
+              f"{'tabela':>9} | {'índice':>9} | {'construção':>10}")
+        for dimensoes in [d for d in DIMENSOES if d <= completas]:
+            r = await medir_dimensao(conn, vetores, consultas, gabarito, dimensoes)
+            print(f"   {dimensoes:>5} | {r['recall_exata']:>12.3f} | {r['recall_hnsw']:>11.3f} | "
+                  f"{r['p50']:>6.2f}/{r['p95']:>6.2f}ms | {r['tabela'] / 1024 ** 2:>7.1f}MB | "
+                  f"{r['indice'] / 1024 ** 2:>7.1f}MB | {r['construcao']:>9.1f}s")
+    finally:
+        await conn.rollback()
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.commit()
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos índices de precisão reduzida (BUSCA_QUANTIZACAO)
+Usa os dados sintéticos de benchmark_busca_tenants.py, cria os mesmos índices das migrações
+(database/migracoes: halfvec e binário) e compara com o índice vector completo:
+- memória: tamanho de cada índice HNSW e da tabela
+- recall@20 contra a busca exata e latência (p50/p95), forçando o caminho do HNSW
+Precisa do banco configurado no .env com pgvector >= 0.7.
+
+Uso: python benchmark_quantizacao.py [total_ideias] [consultas_por_usuario]
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+
+from benchmark_busca_tenants import (
+    DIMENSOES,
+    K,
+    SCHEMA,
+    TAMANHOS,
+    conectar,
+    consultas_do_usuario,
+    criar_dados,
+    percentil,
+    remover_dados,
+    usar_schema,
+    vizinhos,
+)
+from busca_vetorial import (
+    BUSCA_RESCORE_FATOR,
+    EstrategiaBusca,
+    QUANTIZACAO_BINARIA,
+    QUANTIZACAO_HALFVEC,
+    QUANTIZACAO_NENHUMA,
+)
+
+# Mesmos índices das migrações 001 e 002, no schema do benchmark
+INDICES = {
+    QUANTIZACAO_NENHUMA: ("ideias_embedding_idx", None),  # criado por criar_dados
+    QUANTIZACAO_HALFVEC: (
+        "idx_bench_embedding_halfvec",
+        f"USING hnsw ((embedding::halfvec({DIMENSOES})) halfvec_cosine_ops)",
+    ),
+    QUANTIZACAO_BINARIA: (
+        "idx_bench_embedding_binario",
+        f"USING hnsw ((binary_quantize(embedding)::bit({DIMENSOES})) bit_hamming_ops)",
+    ),
+}
+
+
+def formatar_bytes(tamanho: int) -> str:
+    for unidade in ("B", "KB", "MB"):
+        if tamanho < 1024:
+            return f"{tamanho:.0f} {unidade}"
+        tamanho /= 1024
+    return f"{tamanho:.1f} GB"
+
+
+async def criar_indices_quantizados(conn):
+    async with conn.cursor() as cur:
+        await cur.execute("SET maintenance_work_mem = '1GB'")
+        for modo, (nome, definicao) in INDICES.items():
+            if definicao is None:
+                continue
+            inicio = time.perf_counter()
+            await cur.execute(f"CREATE INDEX {nome} ON {SCHEMA}.ideias {definicao}")
+            await conn.commit()
+            print(f"   Índice {modo} em {time.perf_counter() - inicio:.1f}s")
+
+
+async def tamanhos(conn) -> dict:
+    async with conn.cursor() as cur:
+        await cur.execute(
+            """
+            SELECT c.relname AS indice, pg_relation_size(c.oid) AS tamanho
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE i.indrelid = %s::regclass
+            """,
+            (f"{SCHEMA}.ideias",)
+        )
+        por_indice = {linha["indice"]: linha["tamanho"] for linha in await cur.fetchall()}
+        await cur.execute("SELECT pg_table_size(%s::regclass) AS tabela, count(*) AS linhas FROM ideias",
+                          (f"{SCHEMA}.ideias",))
+        tabela = await cur.fetchone()
+    await conn.rollback()
+    return {"indices": por_indice, "tabela": tabela["tabela"], "linhas": tabela["linhas"]}
+
+
+async def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    consultas = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    conn = await conectar()
+    try:
+        print(f"📦 Criando dados em {SCHEMA} ({total} ideias, {DIMENSOES} dimensões)")
+        await criar_dados(conn, total)
+        await criar_indices_quantizados(conn)
+        await usar_schema(conn)
+
+        medidos = await tamanhos(conn)
+        print(f"\n💾 Memória ({medidos['linhas']} linhas; tabela com TOAST: {formatar_bytes(medidos['tabela'])})")
+        for modo, (nome, _) in INDICES.items():
+            tamanho = medidos["indices"].get(nome, 0)
+            print(f"   {modo:>8}: índice {formatar_bytes(tamanho):>9} "
+                  f"({tamanho / max(medidos['linhas'], 1):.0f} bytes/linha)")
+
+        estrategias = {modo: EstrategiaBusca(exata_max=0, quantizacao=modo) for modo in INDICES}
+        print(f"\n🔎 recall@{K} e latência pelo HNSW ({consultas} consultas por usuário, "
+              f"reordenação com {BUSCA_RESCORE_FATOR}x candidatos)")
+        cabecalho = " | ".join(f"{modo:>24}" for modo in INDICES)
+        print(f"   {'ideias':>7} | {cabecalho}")
+        for usuario_id, tamanho in TAMANHOS.items():
+            medidas = {modo: ([], []) for modo in INDICES}
+            for vetor in await consultas_do_usuario(conn, usuario_id, consultas):
+                gabarito, _ = await vizinhos(conn, usuario_id, vetor, exata=True)
+                esperado = set(gabarito)
+                for modo, estrategia in estrategias.items():
+                    ids, duracao = await vizinhos(conn, usuario_id, vetor, estrategia=estrategia)
+                    medidas[modo][0].append(len(esperado & set(ids)) / len(esperado) if esperado else 1.0)
+                    medidas[modo][1].append(duracao)
+
+            colunas = []
+            for modo in INDICES:
+                recalls, tempos = medidas[modo]
+                colunas.append(f"{statistics.mean(recalls):5.3f} "
+                               f"{percentil(tempos, 50):6.2f}/{percentil(tempos, 95):6.2f}ms")
+            print(f"   {tamanho:>7} | " + " | ".join(f"{coluna:>24}" for coluna in colunas))
+
+        print("\n   Formato: recall p50/p95 (ms)")
+        for modo, estrategia in estrategias.items():
+            if estrategia.quantizacao != modo:
+                print(f"   ⚠️  {modo}: pgvector {estrategia.metricas()['pgvector']} sem suporte; medido como vector")
+    finally:
+        await remover_dados(conn)
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark da serialização das respostas de listagem e busca
+Compara o caminho padrão do FastAPI (validação no response_model + jsonable + json.dumps)
+com os serializadores prontos de respostas.py (JSON_RAPIDO=1) em respostas de 10k linhas.
+
+Uso: python benchmark_serializacao.py [linhas] [repeticoes]
+"""
+
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app import BuscaResponse, IdeiaResponse, serializador_busca, serializador_ideia
+from respostas import orjson
+
+
+def gerar_ideias(quantidade: int) -> list:
+    """Linhas no formato que o psycopg devolve (dicts com datetime com fuso)"""
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "id": i,
+            "titulo": f"Ideia {i}",
+            "tag": "produto" if i % 3 else None,
+            "ideia": "Texto da ideia com algumas palavras para ocupar espaço. " * 4,
+            "data": base + timedelta(minutes=i),
+            "created_at": base + timedelta(minutes=i),
+            "updated_at": base + timedelta(minutes=i, seconds=30),
+            "conteudo_hash": "a" * 64,
+            "embedding_hash": "a" * 64,
+            "embedding_status": "ready",
+        }
+        for i in range(quantidade)
+    ]
+
+
+def gerar_busca(quantidade: int) -> list:
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "id": i,
+            "titulo": f"Ideia {i}",
+            "tag": None,
+            "ideia": "Texto da ideia com algumas palavras para ocupar espaço. " * 4,
+            "data": base + timedelta(minutes=i),
+            # a busca híbrida devolve numeric (Decimal)
+            "similarity": Decimal("0.0163934426229508") if i % 2 else 0.87,
+        }
+        for i in range(quantidade)
+    ]
+
+
+async def caminho_padrao(modelo, linhas) -> bytes:
+    """O que o FastAPI faz com response_model=List[modelo] e JSONResponse"""
+    campo = create_response_field(name="Response", type_=List[modelo], mode="serialization")
+    conteudo = await serialize_response(field=campo, response_content=linhas)
+    return JSONResponse(conteudo).body
+
+
+async def medir(funcao, repeticoes: int) -> float:
+    """Melhor tempo (ms) entre as repetições"""
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        await funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor * 1000
+
+
+async def comparar(nome: str, modelo, serializador, linhas, repeticoes: int):
+    async def padrao():
+        return await caminho_padrao(modelo, linhas)
+
+    async def rapido():
+        return serializador.lista(linhas)
+
+    tamanho = len(await rapido())
+    t_padrao = await medir(padrao, repeticoes)
+    t_rapido = await medir(rapido, repeticoes)
+    print(f"📦 {nome} ({len(linhas)} linhas, {tamanho / 1024:.0f} KB)")
+    print(f"   Padrão (response_model + json): {t_padrao:8.2f} ms")
+    print(f"   Serializador pronto:            {t_rapido:8.2f} ms")
+    print(f"   Ganho: {t_padrao / t_rapido:.1f}x")
+
+
+async def main():
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeticoes = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    print(f"Serializador rápido: {'orjson' if orjson else 'json da stdlib (orjson não instalado)'}")
+    await comparar("IdeiaResponse", IdeiaResponse, serializador_ideia, gerar_ideias(linhas), repeticoes)
+    await comparar("BuscaResponse", BuscaResponse, serializador_busca, gerar_busca(linhas), repeticoes)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+"""
+Cache de resultados de busca (POST /api/ideias/buscar)
+Buscas repetidas (paginação, voltar, refazer o mesmo termo) não geram embedding nem consultam o pgvector.
+Chave: (usuário, termo normalizado, modo, parâmetros). Cada usuário tem uma geração:
+qualquer escrita nas ideias dele (criar, editar, apagar, worker de embeddings, importação)
+troca a geração e os resultados antigos deixam de valer. BUSCA_CACHE_TTL limita o tempo
+de vida para escritas que não passam por este processo.
+A geração é lida antes da consulta (geracao) e conferida ao guardar: um resultado calculado
+enquanto uma escrita invalidava o usuário é descartado em vez de valer para a geração nova.
+"""
+
+import itertools
+import os
+import time
+from collections import OrderedDict
+
+from embedding_cache import normalizar_texto
+
+BUSCA_CACHE_TAMANHO = int(os.getenv("BUSCA_CACHE_TAMANHO", "1000"))  # resultados guardados
+BUSCA_CACHE_TTL = float(os.getenv("BUSCA_CACHE_TTL", "300"))  # segundos
+
+
+class CacheBuscas:
+    """LRU de resultados de busca invalidado por geração por usuário"""
+
+    def __init__(self, tamanho: int = BUSCA_CACHE_TAMANHO, ttl: float = BUSCA_CACHE_TTL):
+        self.tamanho = tamanho
+        self.ttl = ttl
+        self._lru = OrderedDict()  # chave -> (geracao, expira_em, resultados)
+        # Geração atual de cada usuário; o contador é global, então esquecer um usuário nunca
+        # faz uma geração antiga voltar a valer. Usuários sem entrada estão na geração base,
+        # que avança a cada limpar()
+        self._geracoes = {}
+        self._contador = itertools.count(1)
+        self._base = 0
+        self._metricas = {
+            "hits": 0,
+            "misses": 0,
+            "invalidacoes": 0,
+            "descartados": 0,
+        }
+
+    def _chave(self, usuario_id: int, termo: str, modo: str, parametros: tuple):
+        return usuario_id, normalizar_texto(termo), modo, parametros
+
+    def geracao(self, usuario_id: int) -> int:
+        """Geração atual do usuário; ler antes de consultar o banco e passar para guardar()"""
+        return self._geracoes.get(usuario_id, self._base)
+
+    def obter(self, usuario_id: int, termo: str, modo: str, parametros: tuple = ()):
+        """Resultados guardados para a busca, ou None"""
+        chave = self._chave(usuario_id, termo, modo, parametros)
+        item = self._lru.get(chave)
+        if item is not None:
+            geracao, expira_em, resultados = item
+            if geracao == self.geracao(usuario_id) and expira_em > time.monotonic():
+                self._lru.move_to_end(chave)
+                self._metricas["hits"] += 1
+                return resultados
+            del self._lru[chave]
+        self._metricas["misses"] += 1
+        return None
+
+    def guardar(self, usuario_id: int, termo: str, modo: str, parametros: tuple, resultados: list, geracao: int):
+        """Guardar resultados calculados na `geracao` lida antes da consulta (descarta se ela mudou)"""
+        if geracao != self.geracao(usuario_id):
+            self._metricas["descartados"] += 1
+            return
+        chave = self._chave(usuario_id, termo, modo, parametros)
+        self._lru[chave] = (geracao, time.monotonic() + self.ttl, resultados)
+        self._lru.move_to_end(chave)
+        while len(self._lru) > self.tamanho:
+            self._lru.popitem(last=False)
+
+    def invalidar(self, usuario_id: int):
+        """As ideias do usuário mudaram: buscas anteriores não valem mais"""
+        self._metricas["invalidacoes"] += 1
+        if len(self._geracoes) >= self.tamanho * 10:
+            self.limpar()  # todos vão para uma geração base nova
+        self._geracoes[usuario_id] = next(self._contador)
+
+    def invalidar_usuarios(self, usuarios):
+        for usuario_id in usuarios:
+            self.invalidar(usuario_id)
+
+    def limpar(self):
+        """Descartar tudo (ex.: TRUNCATE em ideias)"""
+        self._lru.clear()
+        self._geracoes.clear()
+        # Nova base: gerações lidas antes da limpeza (inclusive a base antiga) não valem mais
+        self._base = next(self._contador)
+
+    def metricas(self) -> dict:
+        consultas = self._metricas["hits"] + self._metricas["misses"]
+        return {
+            **self._metricas,
+            "hit_rate": round(self._metricas["hits"] / consultas, 4) if consultas else 0.0,
+            "itens": len(self._lru),
+            "tamanho": self.tamanho,
+        }
@@ -0,0 +1,236 @@
+"""
+Busca vetorial com vários usuários na mesma tabela
+O índice HNSW é global: com WHERE usuario_id = X, o índice devolve os vizinhos mais próximos
+de todos os usuários e o filtro descarta os dos outros. Para um usuário pequeno sobram poucos
+(ou nenhum) resultados, e a recall cai.
+Estratégia por usuário:
+- até BUSCA_EXATA_MAX ideias com embedding: varredura exata (índice de usuario_id + distância
+  de todas as ideias dele). Recall de 100%, custo proporcional ao usuário e não à tabela.
+- acima disso: HNSW. No pgvector >= 0.8 com iterative scan (hnsw.iterative_scan = relaxed_order),
+  que continua descendo no grafo até achar vizinhos suficientes do usuário; nas versões
+  anteriores, ef_search maior (BUSCA_EF_SEARCH_SEM_ITERATIVO) para compensar o filtro.
+O total de ideias de cada usuário fica em memória e é recontado quando a versão das ideias muda.
+Cada busca pode escolher um preset (BUSCA_PRESETS): o ef_search do HNSW naquela transação,
+trocando recall por latência. A busca exata não muda com o preset.
+Com BUSCA_QUANTIZACAO (halfvec ou binaria), o caminho do HNSW usa um índice de precisão reduzida
+(database/migracoes) para achar BUSCA_RESCORE_FATOR x vizinhos candidatos e os reordena pela
+distância exata com o embedding completo, que continua na tabela.
+"""
+
+import os
+from collections import OrderedDict
+
+from cache_http import versao_ideias
+from embedding_cache import EMBEDDING_DIMENSOES
+from logs import obter_logger
+
+# A busca exata lê o vetor inteiro de cada ideia do usuário (4 bytes por dimensão) a cada busca: o padrão
+# limita isso a ~12 MB (2048 ideias com 1536 dimensões, 6144 com 512). Acima, o HNSW lê só parte do grafo,
+# com recall um pouco menor e latência que quase não cresce com o usuário
+BUSCA_EXATA_BYTES = 12 * 1024 * 1024
+BUSCA_EXATA_MAX = int(os.getenv(
+    "BUSCA_EXATA_MAX", str(BUSCA_EXATA_BYTES // (4 * EMBEDDING_DIMENSOES))
+))  # ideias com embedding; até aqui, busca exata
+BUSCA_EF_SEARCH = int(os.getenv("BUSCA_EF_SEARCH", "100"))  # hnsw.ef_search com iterative scan
+BUSCA_EF_SEARCH_SEM_ITERATIVO = int(os.getenv("BUSCA_EF_SEARCH_SEM_ITERATIVO", "400"))  # pgvector < 0.8
+BUSCA_EF_SEARCH_LATENCIA = int(os.getenv("BUSCA_EF_SEARCH_LATENCIA", "40"))
+BUSCA_EF_SEARCH_QUALIDADE = int(os.getenv("BUSCA_EF_SEARCH_QUALIDADE", "400"))
+BUSCA_TOTAIS_CACHE_MAX = int(os.getenv("BUSCA_TOTAIS_CACHE_MAX", "10000"))  # usuários com total em memória
+BUSCA_QUANTIZACAO = os.getenv("BUSCA_QUANTIZACAO", "nenhuma").strip().lower()  # nenhuma, halfvec ou binaria
+BUSCA_RESCORE_FATOR = int(os.getenv("BUSCA_RESCORE_FATOR", "4"))  # candidatos do índice reduzido por vizinho
+
+PGVECTOR_ITERATIVO = (0, 8, 0)
+PGVECTOR_QUANTIZACAO = (0, 7, 0)  # halfvec e binary_quantize
+EF_SEARCH_MAXIMO = 1000  # limite do pgvector para hnsw.ef_search
+
+# hnsw.ef_search de cada preset (com iterative scan); "equilibrado" é o padrão da busca
+BUSCA_PRESETS = {
+    "latencia": BUSCA_EF_SEARCH_LATENCIA,
+    "equilibrado": BUSCA_EF_SEARCH,
+    "qualidade": BUSCA_EF_SEARCH_QUALIDADE,
+}
+BUSCA_PRESET_PADRAO = "equilibrado"
+
+QUANTIZACAO_NENHUMA = "nenhuma"
+QUANTIZACAO_HALFVEC = "halfvec"
+QUANTIZACAO_BINARIA = "binaria"
+# Expressão de ordenação de cada índice reduzido: precisa ser igual à do CREATE INDEX da migração
+ORDEM_QUANTIZADA = {
+    QUANTIZACAO_HALFVEC: (
+        f"embedding::halfvec({EMBEDDING_DIMENSOES}) <=> "
+        f"(SELECT vetor FROM consulta)::halfvec({EMBEDDING_DIMENSOES})"
+    ),
+    QUANTIZACAO_BINARIA: (
+        f"binary_quantize(embedding)::bit({EMBEDDING_DIMENSOES}) <~> "
+        f"binary_quantize((SELECT vetor FROM consulta))"
+    ),
+}
+
+logger = obter_logger("busca_vetorial")
+
+# Vizinhos mais próximos do usuário: (id, distancia), ordenados pela distância.
+# Esperam o CTE `consulta` (vetor da busca) e os parâmetros usuario_id e vizinhos.
+SQL_VIZINHOS_EXATA = """
+    SELECT id, distancia
+    FROM (
+        SELECT id, embedding <=> (SELECT vetor FROM consulta) AS distancia
+        FROM ideias
+        WHERE usuario_id = %(usuario_id)s
+          AND embedding IS NOT NULL
+        OFFSET 0  -- barreira: o ORDER BY de fora não pode virar uma varredura do HNSW
+    ) todas
+    ORDER BY distancia
+    LIMIT %(vizinhos)s
+"""
+
+SQL_VIZINHOS_INDICE = """
+    SELECT id, embedding <=> (SELECT vetor FROM consulta) AS distancia
+    FROM ideias
+    WHERE usuario_id = %(usuario_id)s
+      AND embedding IS NOT NULL
+    ORDER BY distancia
+    LIMIT %(vizinhos)s
+"""
+
+
+# Candidatos pelo índice reduzido, reordenados pela distância com o embedding completo
+SQL_VIZINHOS_QUANTIZADA = """
+    SELECT id, embedding <=> (SELECT vetor FROM consulta) AS distancia
+    FROM (
+        SELECT id, embedding
+        FROM ideias
+        WHERE usuario_id = %(usuario_id)s
+          AND embedding IS NOT NULL
+        ORDER BY {ordem}
+        LIMIT %(vizinhos)s * {fator}
+    ) candidatos
+    ORDER BY distancia
+    LIMIT %(vizinhos)s
+"""
+
+
+def sql_vizinhos(exata: bool, quantizacao: str = QUANTIZACAO_NENHUMA) -> str:
+    if exata:
+        return SQL_VIZINHOS_EXATA
+    if quantizacao == QUANTIZACAO_NENHUMA:
+        return SQL_VIZINHOS_INDICE
+    return SQL_VIZINHOS_QUANTIZADA.format(ordem=ORDEM_QUANTIZADA[quantizacao], fator=BUSCA_RESCORE_FATOR)
+
+
+def ef_search_preset(preset: str, vizinhos: int, iterativo: bool = True) -> int:
+    """
+    hnsw.ef_search do preset para `vizinhos` resultados.
+    Sem iterative scan, escala na mesma proporção de BUSCA_EF_SEARCH_SEM_ITERATIVO / BUSCA_EF_SEARCH.
+    """
+    ef_search = BUSCA_PRESETS[preset]
+    if not iterativo:
+        ef_search = ef_search * BUSCA_EF_SEARCH_SEM_ITERATIVO // BUSCA_EF_SEARCH
+    return min(max(ef_search, vizinhos), EF_SEARCH_MAXIMO)
+
+
+def _versao_tupla(versao: str) -> tuple:
+    partes = []
+    for parte in versao.split("."):
+        digitos = "".join(c for c in parte if c.isdigit())
+        partes.append(int(digitos or 0))
+    return tuple(partes + [0] * (3 - len(partes)))
+
+
+class EstrategiaBusca:
+    """Escolhe busca exata ou HNSW por usuário e ajusta os parâmetros do HNSW na transação"""
+
+    def __init__(self, exata_max: int = BUSCA_EXATA_MAX, quantizacao: str = BUSCA_QUANTIZACAO):
+        if quantizacao != QUANTIZACAO_NENHUMA and quantizacao not in ORDEM_QUANTIZADA:
+            raise ValueError(f"BUSCA_QUANTIZACAO inválida: {quantizacao}")
+        self.exata_max = exata_max
+        self.quantizacao = quantizacao
+        self.versao_pgvector = None  # tupla, lida na primeira busca
+        self._totais = OrderedDict()  # usuario_id -> (versao das ideias, total com embedding até exata_max + 1)
+        self._metricas = {
+            "exatas": 0,
+            "indice": 0,
+            "recontagens": 0,
+        }
+        self._presets = {preset: 0 for preset in BUSCA_PRESETS}
+
+    async def _detectar_pgvector(self, cur):
+        await cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        linha = await cur.fetchone()
+        self.versao_pgvector = _versao_tupla(linha["extversion"]) if linha else (0, 0, 0)
+        logger.info("pgvector %s (iterative scan: %s)", ".".join(map(str, self.versao_pgvector)),
+                    "sim" if self.versao_pgvector >= PGVECTOR_ITERATIVO else "não")
+        if self.quantizacao != QUANTIZACAO_NENHUMA and self.versao_pgvector < PGVECTOR_QUANTIZACAO:
+            logger.warning("BUSCA_QUANTIZACAO=%s precisa do pgvector >= 0.7; usando o embedding completo",
+                           self.quantizacao)
+            self.quantizacao = QUANTIZACAO_NENHUMA
+
+    async def _total(self, cur, usuario_id: int) -> int:
+        """Ideias com embedding do usuário (contagem limitada a exata_max + 1)"""
+        versao, _ = await versao_ideias(cur, usuario_id)
+        item = self._totais.get(usuario_id)
+        if item is not None and item[0] == versao:
+            self._totais.move_to_end(usuario_id)
+            return item[1]
+
+        self._metricas["recontagens"] += 1
+        await cur.execute(
+            """
+            SELECT count(*) AS total
+            FROM (
+                SELECT 1 FROM ideias
+                WHERE usuario_id = %s AND embedding IS NOT NULL
+                LIMIT %s
+            ) limitadas
+            """,
+            (usuario_id, self.exata_max + 1)
+        )
+        total = (await cur.fetchone())["total"]
+        self._totais[usuario_id] = (versao, total)
+        self._totais.move_to_end(usuario_id)
+        while len(self._totais) > BUSCA_TOTAIS_CACHE_MAX:
+            self._totais.popitem(last=False)
+        return total
+
+    async def preparar(self, cur, usuario_id: int, vizinhos: int, preset: str = BUSCA_PRESET_PADRAO) -> str:
+        """
+        Escolher a estratégia para a busca do usuário e devolver o SQL dos vizinhos (sql_vizinhos).
+        No caminho do HNSW, ajusta ef_search (do preset)/iterative scan só nesta transação (set_config local).
+        """
+        if preset not in BUSCA_PRESETS:
+            raise ValueError(f"Preset de busca desconhecido: {preset}")
+        if self.versao_pgvector is None:
+            await self._detectar_pgvector(cur)
+        self._presets[preset] += 1
+
+        if await self._total(cur, usuario_id) <= self.exata_max:
+            self._metricas["exatas"] += 1
+            return sql_vizinhos(True)
+
+        self._metricas["indice"] += 1
+        if self.quantizacao != QUANTIZACAO_NENHUMA:
+            vizinhos *= BUSCA_RESCORE_FATOR  # o índice reduzido precisa devolver todos os candidatos
+        if self.versao_pgvector >= PGVECTOR_ITERATIVO:
+            await cur.execute(
+                """
+                SELECT set_config('hnsw.iterative_scan', 'relaxed_order', true),
+                       set_config('hnsw.ef_search', %s, true)
+                """,
+                (str(ef_search_preset(preset, vizinhos)),)
+            )
+        else:
+            # Sem iterative scan o HNSW devolve no máximo ef_search linhas antes do filtro por usuário
+            await cur.execute(
+                "SELECT set_config('hnsw.ef_search', %s, true)",
+                (str(ef_search_preset(preset, vizinhos, iterativo=False)),)
+            )
+        return sql_vizinhos(False, self.quantizacao)
+
+    def metricas(self) -> dict:
+        return {
+            **self._metricas,
+            "presets": dict(self._presets),
+            "exata_max": self.exata_max,
+            "quantizacao": self.quantizacao,
+            "pgvector": ".".join(map(str, self.versao_pgvector)) if self.versao_pgvector else None,
+            "usuarios_em_memoria": len(self._totais),
+        }
@@ -0,0 +1,73 @@
+"""
+Cache HTTP das ideias (ETag / If-None-Match e Last-Modified)
+A tabela versoes_ideias guarda uma versão por usuário, incrementada por trigger a cada
+INSERT/UPDATE/DELETE/COPY em ideias. O ETag sai da versão (uma leitura por chave primária),
+então uma coleção sem mudanças responde 304 sem consultar as ideias.
+"""
+
+import hashlib
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+# private: a resposta depende do token; no-cache: o navegador sempre revalida (If-None-Match)
+CACHE_CONTROL = "private, no-cache"
+
+
+async def versao_ideias(cur, usuario_id: int):
+    """(versao, atualizado_em) das ideias do usuário; (0, None) se ele nunca teve ideias"""
+    await cur.execute(
+        "SELECT versao, atualizado_em FROM versoes_ideias WHERE usuario_id = %s",
+        (usuario_id,)
+    )
+    linha = await cur.fetchone()
+    if not linha:
+        return 0, None
+    return linha["versao"], linha["atualizado_em"]
+
+
+def calcular_etag(usuario_id: int, versao: int, representacao: str = "") -> str:
+    """ETag forte: muda com a versão e com a representação (rota + parâmetros da consulta)"""
+    bruto = f"{usuario_id}:{versao}:{representacao}".encode("utf-8")
+    return '"' + hashlib.sha256(bruto).hexdigest()[:32] + '"'
+
+
+def _em_utc(momento):
+    """
+    timestamptz em UTC: o psycopg devolve o fuso da sessão (ex.: ZoneInfo('America/Sao_Paulo')),
+    e format_datetime(usegmt=True) só aceita timezone.utc
+    """
+    return momento.astimezone(timezone.utc)
+
+
+def headers_cache(etag: str, ultima_modificacao=None) -> dict:
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if ultima_modificacao is not None:
+        headers["Last-Modified"] = format_datetime(_em_utc(ultima_modificacao), usegmt=True)
+    return headers
+
+
+def nao_modificado(request, etag: str, ultima_modificacao=None) -> bool:
+    """
+    True se o cliente já tem a versão atual (responder 304).
+    If-None-Match tem prioridade; If-Modified-Since só vale quando ele não veio.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # Comparação fraca (RFC 9110): W/"x" e "x" são o mesmo ETag para If-None-Match
+        candidatos = {valor.strip() for valor in if_none_match.split(",")}
+        candidatos = {valor[2:] if valor.startswith("W/") else valor for valor in candidatos}
+        return etag in candidatos
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and ultima_modificacao is not None:
+        try:
+            desde = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if desde.tzinfo is None:
+            return False
+        # Last-Modified tem resolução de segundos
+        return _em_utc(ultima_modificacao).replace(microsecond=0) <= desde
+    return False
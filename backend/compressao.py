@@ -0,0 +1,217 @@
+"""
+Compressão das respostas (gzip / brotli)
+Middleware ASGI que respeita o Accept-Encoding do cliente (com pesos q=) e só comprime
+tipos de texto (JSON, NDJSON, CSV, HTML...) a partir de COMPRESSAO_MINIMO bytes.
+Respostas em streaming (ex.: /api/ideias/export) são comprimidas pedaço a pedaço, com flush
+a cada pedaço: o cliente continua recebendo as linhas conforme saem do banco.
+Brotli é opcional (pacote `brotli`); sem ele, só gzip.
+"""
+
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSAO_MINIMO = int(os.getenv("COMPRESSAO_MINIMO", "1024"))  # bytes; respostas menores vão sem compressão
+COMPRESSAO_NIVEL_GZIP = int(os.getenv("COMPRESSAO_NIVEL_GZIP", "6"))
+COMPRESSAO_NIVEL_BROTLI = int(os.getenv("COMPRESSAO_NIVEL_BROTLI", "4"))  # 0-11; acima de ~5 fica lento para respostas dinâmicas
+# Ordem de preferência do servidor quando o cliente aceita mais de um
+COMPRESSAO_ALGORITMOS = [
+    a.strip() for a in os.getenv("COMPRESSAO_ALGORITMOS", "br,gzip").split(",") if a.strip()
+]
+
+TIPOS_COMPRESSIVEIS = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+)
+
+
+class _Gzip:
+    def __init__(self, nivel: int):
+        # wbits=31: formato gzip (cabeçalho + crc), não deflate puro
+        self._compressor = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+
+    def pedaco(self, dados: bytes) -> bytes:
+        return self._compressor.compress(dados) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finalizar(self, dados: bytes = b"") -> bytes:
+        return self._compressor.compress(dados) + self._compressor.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    def __init__(self, nivel: int):
+        self._compressor = brotli.Compressor(quality=nivel)
+
+    def pedaco(self, dados: bytes) -> bytes:
+        return self._compressor.process(dados) + self._compressor.flush()
+
+    def finalizar(self, dados: bytes = b"") -> bytes:
+        return self._compressor.process(dados) + self._compressor.finish()
+
+
+def _algoritmos_disponiveis():
+    disponiveis = []
+    for algoritmo in COMPRESSAO_ALGORITMOS:
+        if algoritmo == "gzip" or (algoritmo == "br" and brotli is not None):
+            disponiveis.append(algoritmo)
+    return disponiveis
+
+
+def escolher_algoritmo(accept_encoding: str, disponiveis) -> str:
+    """Algoritmo aceito pelo cliente (q > 0), na ordem de preferência do servidor; None = sem compressão"""
+    pesos = {}
+    for item in accept_encoding.lower().split(","):
+        nome, _, parametros = item.strip().partition(";")
+        nome = nome.strip()
+        if not nome:
+            continue
+        peso = 1.0
+        parametros = parametros.strip()
+        if parametros.startswith("q="):
+            try:
+                peso = float(parametros[2:])
+            except ValueError:
+                peso = 0.0
+        pesos[nome] = peso
+
+    melhor, melhor_peso = None, 0.0
+    for algoritmo in disponiveis:
+        peso = pesos.get(algoritmo, pesos.get("*", 0.0))
+        if peso > melhor_peso:
+            melhor, melhor_peso = algoritmo, peso
+    return melhor
+
+
+def _com_vary(headers):
+    """Headers com Accept-Encoding no Vary, somado ao Vary que a rota já tenha (sem duplicar)"""
+    resultado = []
+    valores = []
+    for nome, valor in headers:
+        if nome.lower() == b"vary":
+            valores.extend(v.strip() for v in valor.split(b",") if v.strip())
+        else:
+            resultado.append((nome, valor))
+    if b"*" not in valores and not any(v.lower() == b"accept-encoding" for v in valores):
+        valores.append(b"Accept-Encoding")
+    resultado.append((b"vary", b", ".join(valores)))
+    return resultado
+
+
+class MiddlewareCompressao:
+    """Middleware ASGI de compressão (gzip/brotli) com tamanho mínimo e suporte a streaming"""
+
+    def __init__(self, app, minimo: int = COMPRESSAO_MINIMO):
+        self.app = app
+        self.minimo = minimo
+        self.disponiveis = _algoritmos_disponiveis()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD" or not self.disponiveis:
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for nome, valor in scope.get("headers", ()):
+            if nome == b"accept-encoding":
+                accept_encoding = valor.decode("latin-1")
+                break
+        algoritmo = escolher_algoritmo(accept_encoding, self.disponiveis) if accept_encoding else None
+
+        inicio = None  # http.response.start retido até decidir se comprime
+        buffer = []
+        tamanho_buffer = 0
+        compressor = None
+        decidido = False
+
+        async def enviar(mensagem):
+            nonlocal inicio, tamanho_buffer, compressor, decidido
+
+            if mensagem["type"] == "http.response.start":
+                headers = mensagem.get("headers", [])
+                if not self._compressivel(mensagem["status"], headers):
+                    decidido = True
+                    if mensagem["status"] == 304:
+                        # O 304 precisa repetir o Vary da resposta 200 que ele valida
+                        mensagem["headers"] = _com_vary(headers)
+                    await send(mensagem)
+                    return
+                # A resposta muda com o Accept-Encoding: caches precisam saber disso
+                mensagem["headers"] = _com_vary(headers)
+                if algoritmo is None:
+                    decidido = True
+                    await send(mensagem)
+                    return
+                inicio = mensagem
+                return
+
+            if mensagem["type"] != "http.response.body" or (decidido and compressor is None):
+                await send(mensagem)
+                return
+
+            corpo = mensagem.get("body", b"")
+            mais = mensagem.get("more_body", False)
+
+            if compressor is not None:
+                dados = compressor.pedaco(corpo) if mais else compressor.finalizar(corpo)
+                if dados or not mais:
+                    await send({"type": "http.response.body", "body": dados, "more_body": mais})
+                return
+
+            buffer.append(corpo)
+            tamanho_buffer += len(corpo)
+            if mais and tamanho_buffer < self.minimo:
+                return  # ainda não dá para saber se passa do mínimo
+
+            dados = b"".join(buffer)
+            buffer.clear()
+            decidido = True
+            if tamanho_buffer < self.minimo:
+                # Terminou abaixo do mínimo: vai como veio
+                await send(inicio)
+                await send({"type": "http.response.body", "body": dados, "more_body": False})
+                return
+
+            compressor = _Gzip(COMPRESSAO_NIVEL_GZIP) if algoritmo == "gzip" else _Brotli(COMPRESSAO_NIVEL_BROTLI)
+            if mais:
+                comprimido = compressor.pedaco(dados)
+                await send(self._inicio_comprimido(inicio, algoritmo, None))
+            else:
+                comprimido = compressor.finalizar(dados)
+                await send(self._inicio_comprimido(inicio, algoritmo, len(comprimido)))
+            await send({"type": "http.response.body", "body": comprimido, "more_body": mais})
+
+        await self.app(scope, receive, enviar)
+
+    def _compressivel(self, status: int, headers) -> bool:
+        if status < 200 or status in (204, 304):
+            return False
+        tipo = b""
+        for nome, valor in headers:
+            nome = nome.lower()
+            if nome == b"content-encoding":
+                return False  # já comprimida
+            if nome == b"content-type":
+                tipo = valor.lower()
+        return tipo.decode("latin-1").startswith(TIPOS_COMPRESSIVEIS) or b"+json" in tipo
+
+    @staticmethod
+    def _inicio_comprimido(inicio, algoritmo: str, tamanho):
+        headers = []
+        for nome, valor in inicio["headers"]:
+            nome_min = nome.lower()
+            if nome_min == b"content-length":
+                continue
+            if nome_min == b"etag" and not valor.startswith(b"W/"):
+                # O corpo comprimido não é byte a byte o original: ETag fraco (If-None-Match continua valendo)
+                valor = b"W/" + valor
+            headers.append((nome, valor))
+        headers.append((b"content-encoding", algoritmo.encode("latin-1")))
+        if tamanho is not None:
+            headers.append((b"content-length", str(tamanho).encode("latin-1")))
+        return {**inicio, "headers": headers}
@@ -0,0 +1,295 @@
+"""
+Cotas por usuário (assinaturas.limite_buscas / limite_embeddings)
+- Token bucket em memória por (usuário, recurso): capacidade = limite do plano,
+  reabastece a capacidade inteira a cada COTAS_PERIODO segundos
+- Limites do plano ficam em cache por COTAS_LIMITES_TTL segundos (uma consulta ao banco por usuário nesse tempo)
+- O saldo dos baldes é gravado em uso_cotas em segundo plano (write-behind) e recarregado na próxima leitura
+Limite NULL na assinatura = ilimitado (ex.: plano premium / admin)
+"""
+
+import asyncio
+import math
+import os
+import time
+
+import db_async
+from logs import obter_logger
+
+COTAS_PERIODO = float(os.getenv("COTAS_PERIODO", "86400"))  # segundos para reabastecer o limite inteiro
+COTAS_LIMITES_TTL = float(os.getenv("COTAS_LIMITES_TTL", "300"))  # segundos com os limites do plano em cache
+COTAS_GRAVACAO_INTERVALO = float(os.getenv("COTAS_GRAVACAO_INTERVALO", "30"))  # segundos entre gravações do saldo
+# Limites para usuários sem assinatura ativa (mesmos do plano free criado no cadastro)
+COTAS_PADRAO_BUSCAS = int(os.getenv("COTAS_PADRAO_BUSCAS", "10"))
+COTAS_PADRAO_EMBEDDINGS = int(os.getenv("COTAS_PADRAO_EMBEDDINGS", "10"))
+
+# Recursos controlados -> coluna de limite em assinaturas
+RECURSO_BUSCAS = "buscas"
+RECURSO_EMBEDDINGS = "embeddings"
+COLUNAS_LIMITE = {
+    RECURSO_BUSCAS: "limite_buscas",
+    RECURSO_EMBEDDINGS: "limite_embeddings",
+}
+
+logger = obter_logger("cotas")
+
+
+class CotaExcedidaError(Exception):
+    """O usuário gastou o limite do plano para o recurso"""
+
+    def __init__(self, recurso: str, limite: int, tentar_em: float):
+        self.recurso = recurso
+        self.limite = limite
+        self.tentar_em = tentar_em  # segundos até ter saldo de novo
+        super().__init__(f"Limite de {recurso} do plano atingido ({limite} a cada {COTAS_PERIODO / 3600:g}h)")
+
+    @property
+    def segundos_para_tentar(self) -> int:
+        """Valor do header Retry-After"""
+        return max(1, math.ceil(self.tentar_em))
+
+
+class Balde:
+    """Token bucket: `tokens` disponíveis, reabastecidos continuamente até `capacidade`"""
+
+    __slots__ = ("capacidade", "tokens", "atualizado_em")
+
+    def __init__(self, capacidade: int, tokens: float = None, atualizado_em: float = None):
+        self.capacidade = capacidade
+        self.tokens = float(capacidade) if tokens is None else float(tokens)
+        self.atualizado_em = time.time() if atualizado_em is None else atualizado_em
+
+    def _reabastecer(self, agora: float):
+        decorrido = max(agora - self.atualizado_em, 0.0)
+        self.tokens = min(float(self.capacidade), self.tokens + decorrido * self.capacidade / COTAS_PERIODO)
+        self.atualizado_em = agora
+
+    def espera(self, quantidade: int) -> float:
+        """Segundos até haver `quantidade` tokens"""
+        if self.capacidade <= 0:
+            return COTAS_PERIODO
+        return (quantidade - self.tokens) * COTAS_PERIODO / self.capacidade
+
+    def consumir(self, quantidade: int = 1) -> float:
+        """Retirar `quantidade` tokens; retorna 0 se conseguiu ou os segundos até haver saldo"""
+        self._reabastecer(time.time())
+        if self.tokens >= quantidade:
+            self.tokens -= quantidade
+            return 0.0
+        return self.espera(quantidade)
+
+    def consumir_ate(self, quantidade: int) -> int:
+        """Retirar até `quantidade` tokens inteiros; retorna quantos foram retirados (0 sem saldo)"""
+        self._reabastecer(time.time())
+        parcial = min(quantidade, int(self.tokens))
+        self.tokens -= parcial
+        return parcial
+
+
+class GerenciadorCotas:
+    """Cotas de todos os usuários do processo"""
+
+    def __init__(self, intervalo_gravacao: float = COTAS_GRAVACAO_INTERVALO, limites_ttl: float = COTAS_LIMITES_TTL):
+        self.intervalo_gravacao = intervalo_gravacao
+        self.limites_ttl = limites_ttl
+        self._limites = {}  # usuario_id -> (expira_em, {recurso: limite ou None})
+        self._baldes = {}  # (usuario_id, recurso) -> Balde
+        self._alterados = set()  # chaves de _baldes com saldo ainda não gravado
+        self._carregando = {}  # usuario_id -> Future (uma consulta por usuário mesmo com requisições simultâneas)
+        self._task = None
+        self._metricas = {
+            "permitidas": 0,
+            "bloqueadas": 0,
+            "devolvidas": 0,
+            "carregamentos": 0,
+            "erros_banco": 0,
+            "gravacoes": 0,
+        }
+
+    def iniciar(self):
+        if self._task:
+            return
+        self._task = asyncio.create_task(self._executar(), name="gravacao-cotas")
+
+    async def parar(self):
+        """Parar a task e gravar o saldo pendente"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.gravar()
+
+    def invalidar(self, usuario_id: int):
+        """Esquecer os limites em cache (ex.: depois de mudar o plano do usuário)"""
+        self._limites.pop(usuario_id, None)
+
+    async def _balde(self, usuario_id: int, recurso: str):
+        """(limite, balde) do recurso; (None, None) se for ilimitado"""
+        item = self._limites.get(usuario_id)
+        if item is None or item[0] <= time.monotonic():
+            await self._carregar(usuario_id)
+            item = self._limites[usuario_id]
+
+        limite = item[1].get(recurso)
+        if limite is None:
+            return None, None
+
+        chave = (usuario_id, recurso)
+        balde = self._baldes.get(chave)
+        if balde is None:
+            balde = self._baldes[chave] = Balde(limite)
+        elif balde.capacidade != limite:
+            balde.capacidade = limite  # plano mudou: o saldo se ajusta ao novo limite
+            balde.tokens = min(balde.tokens, float(limite))
+        return limite, balde
+
+    async def consumir(self, usuario_id: int, recurso: str, quantidade: int = 1):
+        """Gastar cota do recurso; lança CotaExcedidaError se não houver saldo"""
+        limite, balde = await self._balde(usuario_id, recurso)
+        if balde is None:
+            self._metricas["permitidas"] += 1
+            return  # ilimitado
+
+        tentar_em = balde.consumir(quantidade)
+        if tentar_em:
+            self._metricas["bloqueadas"] += 1
+            raise CotaExcedidaError(recurso, limite, tentar_em)
+        self._alterados.add((usuario_id, recurso))
+        self._metricas["permitidas"] += 1
+
+    async def consumir_ate(self, usuario_id: int, recurso: str, quantidade: int) -> int:
+        """
+        Gastar até `quantidade` do saldo que houver (ex.: lote da importação); retorna quanto foi gasto.
+        Lança CotaExcedidaError só se não houver saldo nenhum.
+        """
+        limite, balde = await self._balde(usuario_id, recurso)
+        if balde is None:
+            self._metricas["permitidas"] += 1
+            return quantidade  # ilimitado
+
+        parcial = balde.consumir_ate(quantidade)
+        if not parcial:
+            self._metricas["bloqueadas"] += 1
+            raise CotaExcedidaError(recurso, limite, balde.espera(1))
+        self._alterados.add((usuario_id, recurso))
+        self._metricas["permitidas"] += 1
+        return parcial
+
+    def devolver(self, usuario_id: int, recurso: str, quantidade: int = 1):
+        """Devolver cota gasta por uma operação que falhou (o saldo não passa do limite)"""
+        balde = self._baldes.get((usuario_id, recurso))
+        if balde is None:
+            return  # ilimitado (ou já saiu da memória)
+        balde.tokens = min(float(balde.capacidade), balde.tokens + quantidade)
+        self._alterados.add((usuario_id, recurso))
+        self._metricas["devolvidas"] += 1
+
+    async def _carregar(self, usuario_id: int):
+        pendente = self._carregando.get(usuario_id)
+        if pendente is not None:
+            await asyncio.shield(pendente)
+            return
+
+        futuro = asyncio.get_running_loop().create_future()
+        self._carregando[usuario_id] = futuro
+        try:
+            limites, ttl = await self._ler_banco(usuario_id)
+            self._limites[usuario_id] = (time.monotonic() + ttl, limites)
+            futuro.set_result(None)
+        except asyncio.CancelledError:
+            futuro.cancel()
+            raise
+        finally:
+            del self._carregando[usuario_id]
+
+    async def _ler_banco(self, usuario_id: int):
+        """Limites do plano ativo + saldo gravado dos baldes que ainda não estão em memória"""
+        self._metricas["carregamentos"] += 1
+        try:
+            async with db_async.conexao() as conn, conn.cursor() as cur:
+                await cur.execute(
+                    """
+                    SELECT limite_buscas, limite_embeddings
+                    FROM assinaturas
+                    WHERE usuario_id = %s
+                      AND status = 'ativa'
+                    ORDER BY id DESC
+                    LIMIT 1
+                    """,
+                    (usuario_id,)
+                )
+                assinatura = await cur.fetchone()
+                await cur.execute(
+                    "SELECT recurso, tokens, EXTRACT(EPOCH FROM atualizado_em) AS atualizado_em FROM uso_cotas WHERE usuario_id = %s",
+                    (usuario_id,)
+                )
+                saldos = await cur.fetchall()
+        except Exception as e:
+            # Banco fora do ar não deve derrubar a busca: liberar por pouco tempo e tentar de novo
+            self._metricas["erros_banco"] += 1
+            logger.warning("Erro ao carregar cotas do usuário %s (liberado temporariamente): %s", usuario_id, e)
+            return {recurso: None for recurso in COLUNAS_LIMITE}, min(30.0, self.limites_ttl)
+
+        if assinatura:
+            limites = {recurso: assinatura[coluna] for recurso, coluna in COLUNAS_LIMITE.items()}
+        else:
+            limites = {RECURSO_BUSCAS: COTAS_PADRAO_BUSCAS, RECURSO_EMBEDDINGS: COTAS_PADRAO_EMBEDDINGS}
+
+        for saldo in saldos:
+            chave = (usuario_id, saldo["recurso"])
+            limite = limites.get(saldo["recurso"])
+            if chave in self._baldes or limite is None:
+                continue  # o saldo em memória é mais recente que o gravado
+            self._baldes[chave] = Balde(limite, min(float(saldo["tokens"]), float(limite)), float(saldo["atualizado_em"]))
+        return limites, self.limites_ttl
+
+    async def _executar(self):
+        while True:
+            await asyncio.sleep(self.intervalo_gravacao)
+            try:
+                await self.gravar()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Erro na gravação das cotas")
+
+    async def gravar(self):
+        """Gravar em uso_cotas o saldo dos baldes alterados e liberar usuários inativos da memória"""
+        alterados, self._alterados = self._alterados, set()
+        linhas = [
+            (usuario_id, recurso, self._baldes[(usuario_id, recurso)].tokens,
+             self._baldes[(usuario_id, recurso)].atualizado_em)
+            for usuario_id, recurso in alterados if (usuario_id, recurso) in self._baldes
+        ]
+        if linhas:
+            try:
+                async with db_async.conexao() as conn, conn.cursor() as cur:
+                    await cur.executemany(
+                        """
+                        INSERT INTO uso_cotas (usuario_id, recurso, tokens, atualizado_em)
+                        VALUES (%s, %s, %s, to_timestamp(%s))
+                        ON CONFLICT (usuario_id, recurso)
+                        DO UPDATE SET tokens = EXCLUDED.tokens, atualizado_em = EXCLUDED.atualizado_em
+                        """,
+                        linhas
+                    )
+                    await conn.commit()
+                self._metricas["gravacoes"] += 1
+            except Exception as e:
+                self._metricas["erros_banco"] += 1
+                self._alterados |= alterados  # tentar de novo na próxima rodada
+                logger.warning("Erro ao gravar %d saldo(s) de cota: %s", len(linhas), e)
+
+        # Usuários com limites expirados e sem saldo pendente saem da memória (voltam do banco se aparecerem)
+        agora = time.monotonic()
+        expirados = {usuario_id for usuario_id, (expira_em, _) in self._limites.items() if expira_em <= agora}
+        for usuario_id in expirados:
+            del self._limites[usuario_id]
+        for chave in [c for c in self._baldes if c[0] in expirados and c not in self._alterados]:
+            del self._baldes[chave]
+
+    def metricas(self) -> dict:
+        return {
+            **self._metricas,
+            "usuarios_em_memoria": len(self._limites),
+            "saldos_pendentes": len(self._alterados),
+        }
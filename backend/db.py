@@ -0,0 +1,30 @@
+"""
+Configuração do PostgreSQL compartilhada pelo backend
+O pool de conexões das rotas fica em db_async.py; scripts avulsos (criar_admin.py) conectam direto
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Configuração do banco de dados (Supabase pooler)
+DB_CONFIG = {
+    "host": "aws-1-us-east-2.pooler.supabase.com",
+    "database": "postgres",
+    "user": "postgres.cldvwgtcfuuhziqelljf",
+    "password": os.getenv("SUPABASE_DB_PASSWORD"),
+    "port": 5432,
+}
+
+# Configurações do pool (podem ser alteradas pelo .env)
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "2"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # segundos esperando uma conexão livre
+DB_POOL_MAX_OCIOSA = float(os.getenv("DB_POOL_MAX_OCIOSA", "300"))  # segundos até fechar conexão ociosa
+DB_POOL_INTERVALO_CHECAGEM = float(os.getenv("DB_POOL_INTERVALO_CHECAGEM", "30"))  # segundos sem uso até testar com SELECT 1
+
+
+class PoolEsgotadoError(Exception):
+    """Nenhuma conexão ficou livre dentro do tempo limite"""
@@ -0,0 +1,141 @@
+"""
+Camada de acesso assíncrona ao PostgreSQL (psycopg 3 + psycopg_pool)
+Usada pelas rotas do FastAPI para não bloquear o event loop
+"""
+
+import time
+import weakref
+from contextlib import asynccontextmanager
+
+import numpy as np
+from pgvector.psycopg import register_vector_async
+from psycopg import pq
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+
+from db import (
+    DB_CONFIG,
+    DB_POOL_MIN,
+    DB_POOL_MAX,
+    DB_POOL_TIMEOUT,
+    DB_POOL_MAX_OCIOSA,
+    DB_POOL_INTERVALO_CHECAGEM,
+    PoolEsgotadoError,
+)
+
+# Momento em que cada conexão voltou ao pool (para o health check)
+_devolvidas_em = weakref.WeakKeyDictionary()
+
+
+def _parametros_conexao(config: dict) -> dict:
+    """Converter DB_CONFIG (padrão psycopg2) para os parâmetros do libpq"""
+    parametros = dict(config)
+    parametros["dbname"] = parametros.pop("database")
+    # Cursores retornam dicionários, como o RealDictCursor do psycopg2
+    parametros["row_factory"] = dict_row
+    return parametros
+
+
+def para_vetor(embedding) -> np.ndarray:
+    """Embedding (lista de floats) como numpy float32: vai para o banco no formato binário do pgvector"""
+    return np.asarray(embedding, dtype=np.float32)
+
+
+async def _configurar_conexao(conn):
+    """Registrar o tipo vector na conexão nova (dumper/loader binário do pgvector, sem texto "[...]")"""
+    await register_vector_async(conn)
+    await conn.commit()  # o pool exige a conexão fora de transação
+
+
+async def _checar_conexao(conn):
+    """Health check na retirada: só faz round trip se a conexão ficou parada muito tempo"""
+    devolvida_em = _devolvidas_em.get(conn)
+    if devolvida_em is not None and time.monotonic() - devolvida_em < DB_POOL_INTERVALO_CHECAGEM:
+        if conn.closed or conn.pgconn.status != pq.ConnStatus.OK:
+            raise ConnectionError("Conexão fechada")
+        return
+    await AsyncConnectionPool.check_connection(conn)
+
+
+async def _ao_devolver(conn):
+    _devolvidas_em[conn] = time.monotonic()
+
+
+pool = AsyncConnectionPool(
+    conninfo="",
+    kwargs=_parametros_conexao(DB_CONFIG),
+    min_size=DB_POOL_MIN,
+    max_size=DB_POOL_MAX,
+    timeout=DB_POOL_TIMEOUT,
+    max_idle=DB_POOL_MAX_OCIOSA,
+    configure=_configurar_conexao,
+    check=_checar_conexao,
+    reset=_ao_devolver,
+    open=False,
+)
+
+
+async def abrir_pool():
+    """Abrir o pool (chamar no startup da aplicação)"""
+    await pool.open(wait=False)
+
+
+async def fechar_pool():
+    await pool.close()
+
+
+async def retirar():
+    """Retirar uma conexão do pool (devolver com `devolver`)"""
+    try:
+        return await pool.getconn()
+    except PoolTimeout as e:
+        raise PoolEsgotadoError(
+            f"Nenhuma conexão livre em {DB_POOL_TIMEOUT}s (máximo do pool: {DB_POOL_MAX})"
+        ) from e
+
+
+async def devolver(conn):
+    """Devolver conexão ao pool (transações não confirmadas são desfeitas)"""
+    if conn is None:
+        return
+    if not conn.closed and conn.info.transaction_status != pq.TransactionStatus.IDLE:
+        try:
+            await conn.rollback()
+        except Exception:
+            pass
+    await pool.putconn(conn)
+
+
+@asynccontextmanager
+async def conexao():
+    """Uso: `async with conexao() as conn:`"""
+    conn = await retirar()
+    try:
+        yield conn
+    finally:
+        await devolver(conn)
+
+
+def metricas() -> dict:
+    """Estado atual do pool e contadores acumulados (mesmos nomes do pool síncrono)"""
+    stats = pool.get_stats()
+    total = stats.get("pool_size", 0)
+    ociosas = stats.get("pool_available", 0)
+    em_uso = total - ociosas
+    return {
+        "conexoes_abertas": stats.get("connections_num", 0),
+        "conexoes_perdidas": stats.get("connections_lost", 0),
+        "erros_conexao": stats.get("connections_errors", 0),
+        "retiradas": stats.get("requests_num", 0),
+        "esperas": stats.get("requests_queued", 0),
+        "esperando_agora": stats.get("requests_waiting", 0),
+        "timeouts": stats.get("requests_errors", 0),
+        "falhas_checagem": stats.get("returns_bad", 0),
+        "tempo_espera_total_ms": stats.get("requests_wait_ms", 0),
+        "minimo": pool.min_size,
+        "maximo": pool.max_size,
+        "em_uso": em_uso,
+        "ociosas": ociosas,
+        "total": total,
+        "saturacao": round(em_uso / pool.max_size, 3),
+    }
@@ -0,0 +1,177 @@
+"""
+Cache de embeddings em dois níveis
+1. LRU em memória (limitado por EMBEDDING_CACHE_TAMANHO)
+2. Tabela embedding_cache no Postgres, chave (modelo, sha256 do texto normalizado)
+Só chama a OpenAI quando o texto não está em nenhum dos dois
+Os vetores são guardados com EMBEDDING_DIMENSOES dimensões e norma L2 = 1 (ajustar_dimensoes).
+"""
+
+import asyncio
+import hashlib
+import os
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+import db_async
+from logs import obter_logger
+
+EMBEDDING_CACHE_TAMANHO = int(os.getenv("EMBEDDING_CACHE_TAMANHO", "5000"))
+# Conexões do pool usadas ao mesmo tempo pelo cache: um lote do worker (dezenas de textos em
+# paralelo) não pode ocupar o pool inteiro e deixar as rotas esperando
+EMBEDDING_CACHE_CONEXOES = int(os.getenv("EMBEDDING_CACHE_CONEXOES", "2"))
+# Dimensão dos embeddings (coluna ideias.embedding vector(N)); abaixo do tamanho do modelo, o vetor é
+# encurtado (Matryoshka). Trocar exige a migração database/migracoes/003_dimensao_embedding.sql
+EMBEDDING_DIMENSOES = int(os.getenv("EMBEDDING_DIMENSOES", "1536"))
+
+logger = obter_logger("embedding_cache")
+
+
+def normalizar_texto(texto: str) -> str:
+    """Normalizar unicode e espaços (o que não muda o significado do texto)"""
+    texto = unicodedata.normalize("NFC", texto or "")
+    return " ".join(texto.split())
+
+
+def texto_para_embedding(titulo: str, tag, ideia: str) -> str:
+    """Texto de uma ideia que vira embedding (título + tag + conteúdo)"""
+    return f"{titulo} {tag or ''} {ideia}".strip()
+
+
+def ajustar_dimensoes(embedding, dimensoes: int = EMBEDDING_DIMENSOES) -> np.ndarray:
+    """
+    Embedding em float32 com no máximo `dimensoes` valores e norma L2 = 1.
+    Os modelos text-embedding-3 são treinados com Matryoshka: os primeiros N valores,
+    renormalizados, são o embedding de N dimensões (o mesmo que a API devolve com dimensions=N).
+    """
+    vetor = db_async.para_vetor(embedding)[:dimensoes]
+    norma = np.linalg.norm(vetor)
+    return vetor / norma if norma > 0 else vetor
+
+
+def hash_texto(texto: str) -> str:
+    """sha256 do texto normalizado (hex, 64 caracteres)"""
+    return hashlib.sha256(normalizar_texto(texto).encode("utf-8")).hexdigest()
+
+
+class CacheEmbeddings:
+    """Cache de embeddings: memória -> Postgres -> OpenAI"""
+
+    def __init__(self, modelo: str, tamanho: int = EMBEDDING_CACHE_TAMANHO):
+        self.modelo = modelo
+        self.tamanho = tamanho
+        self._lru = OrderedDict()
+        self._em_andamento = {}  # hash -> Future (evita gerar o mesmo texto duas vezes ao mesmo tempo)
+        self._conexoes = None  # Semaphore criado dentro do loop (ver _limite_conexoes)
+        self._metricas = {
+            "hits_memoria": 0,
+            "hits_banco": 0,
+            "misses": 0,
+            "espera_em_andamento": 0,  # esperou outra requisição gerar o mesmo texto (fora da taxa de acerto)
+            "erros_banco": 0,
+        }
+
+    def _guardar_memoria(self, chave: str, embedding):
+        self._lru[chave] = embedding
+        self._lru.move_to_end(chave)
+        while len(self._lru) > self.tamanho:
+            self._lru.popitem(last=False)
+
+    def _limite_conexoes(self) -> asyncio.Semaphore:
+        if self._conexoes is None:
+            self._conexoes = asyncio.Semaphore(EMBEDDING_CACHE_CONEXOES)
+        return self._conexoes
+
+    async def _buscar_banco(self, chave: str):
+        try:
+            # binary=True: o vetor volta no formato binário do pgvector, direto para numpy
+            async with self._limite_conexoes(), db_async.conexao() as conn, conn.cursor(binary=True) as cur:
+                await cur.execute(
+                    "SELECT embedding FROM embedding_cache WHERE modelo = %s AND texto_hash = %s",
+                    (self.modelo, chave)
+                )
+                row = await cur.fetchone()
+                return row["embedding"] if row else None
+        except Exception as e:
+            self._metricas["erros_banco"] += 1
+            logger.warning("Erro ao ler cache de embeddings (ignorado): %s", e)
+            return None
+
+    async def _salvar_banco(self, chave: str, embedding):
+        try:
+            async with self._limite_conexoes(), db_async.conexao() as conn, conn.cursor() as cur:
+                await cur.execute(
+                    """
+                    INSERT INTO embedding_cache (modelo, texto_hash, embedding)
+                    VALUES (%s, %s, %b)
+                    ON CONFLICT (modelo, texto_hash) DO NOTHING
+                    """,
+                    (self.modelo, chave, embedding)
+                )
+                await conn.commit()
+        except Exception as e:
+            self._metricas["erros_banco"] += 1
+            logger.warning("Erro ao gravar cache de embeddings (ignorado): %s", e)
+
+    async def obter(self, texto: str, gerar):
+        """Retornar o embedding de `texto` (numpy float32); `gerar` é chamado (async) só em caso de miss"""
+        chave = hash_texto(texto)
+
+        while True:
+            embedding = self._lru.get(chave)
+            if embedding is not None:
+                self._lru.move_to_end(chave)
+                self._metricas["hits_memoria"] += 1
+                return embedding
+
+            # Outra requisição já está buscando o mesmo texto: esperar por ela
+            pendente = self._em_andamento.get(chave)
+            if pendente is None:
+                break
+            self._metricas["espera_em_andamento"] += 1
+            try:
+                return await asyncio.shield(pendente)
+            except asyncio.CancelledError:
+                if not pendente.cancelled():
+                    raise  # quem foi cancelada foi esta requisição
+                # A requisição que estava gerando foi cancelada: tentar de novo (esta pode gerar)
+
+        futuro = asyncio.get_running_loop().create_future()
+        self._em_andamento[chave] = futuro
+        try:
+            embedding = await self._buscar_banco(chave)
+            if embedding is not None:
+                self._metricas["hits_banco"] += 1
+            else:
+                self._metricas["misses"] += 1
+                embedding = await gerar(normalizar_texto(texto))
+                if embedding is not None and len(embedding):
+                    # float32 ocupa ~6 KB por vetor (uma lista de floats Python ocupa ~50 KB)
+                    embedding = ajustar_dimensoes(embedding)
+                    await self._salvar_banco(chave, embedding)
+                else:
+                    embedding = None
+            if embedding is not None:
+                self._guardar_memoria(chave, embedding)
+            futuro.set_result(embedding)
+            return embedding
+        except asyncio.CancelledError:
+            futuro.cancel()
+            raise
+        except Exception as e:
+            futuro.set_exception(e)
+            futuro.exception()  # marcar como lida se ninguém estiver esperando
+            raise
+        finally:
+            del self._em_andamento[chave]
+
+    def metricas(self) -> dict:
+        hits = self._metricas["hits_memoria"] + self._metricas["hits_banco"]
+        total = hits + self._metricas["misses"]
+        return {
+            **self._metricas,
+            "itens_memoria": len(self._lru),
+            "tamanho_maximo": self.tamanho,
+            "taxa_acerto": round(hits / total, 3) if total else 0.0,
+        }
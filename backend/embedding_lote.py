@@ -0,0 +1,87 @@
+"""
+Micro-lotes de embeddings
+Junta os pedidos que chegam ao mesmo tempo (durante alguns milissegundos ou até N textos)
+em uma única chamada embed_documents e devolve cada vetor para quem pediu
+"""
+
+import asyncio
+import os
+
+EMBEDDING_LOTE_JANELA_MS = float(os.getenv("EMBEDDING_LOTE_JANELA_MS", "10"))
+EMBEDDING_LOTE_MAX = int(os.getenv("EMBEDDING_LOTE_MAX", "64"))
+
+
+class MicroLoteEmbeddings:
+    """Agrupa chamadas concorrentes de `embed(texto)` em lotes para a OpenAI"""
+
+    def __init__(self, obter_modelo, janela_ms: float = EMBEDDING_LOTE_JANELA_MS,
+                 max_itens: int = EMBEDDING_LOTE_MAX):
+        self.obter_modelo = obter_modelo  # função que retorna o OpenAIEmbeddings (ou None)
+        self.janela = janela_ms / 1000
+        self.max_itens = max_itens
+        self._fila = []  # (texto, future)
+        self._timer = None
+        self._envios = set()  # tasks em andamento (referência forte até terminarem)
+        self._metricas = {
+            "pedidos": 0,
+            "lotes": 0,
+            "maior_lote": 0,
+            "erros": 0,
+        }
+
+    async def embed(self, texto: str):
+        """Embedding de um texto, enviado junto com os outros pedidos da mesma janela"""
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+        self._fila.append((texto, futuro))
+        self._metricas["pedidos"] += 1
+
+        if len(self._fila) >= self.max_itens:
+            self._disparar()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.janela, self._disparar)
+
+        return await futuro
+
+    def _disparar(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._fila:
+            lote, self._fila = self._fila[:self.max_itens], self._fila[self.max_itens:]
+            task = asyncio.get_running_loop().create_task(self._enviar(lote))
+            self._envios.add(task)
+            task.add_done_callback(self._envios.discard)
+
+    async def _enviar(self, lote):
+        # Pedidos cancelados (cliente desconectou) não precisam ir para a API
+        lote = [(texto, futuro) for texto, futuro in lote if not futuro.done()]
+        if not lote:
+            return
+
+        self._metricas["lotes"] += 1
+        self._metricas["maior_lote"] = max(self._metricas["maior_lote"], len(lote))
+        try:
+            modelo = self.obter_modelo()
+            if not modelo:
+                raise RuntimeError("Modelo de embeddings não configurado (OPENAI_API_KEY)")
+            vetores = await modelo.aembed_documents([texto for texto, _ in lote])
+        except Exception as e:
+            self._metricas["erros"] += 1
+            for _, futuro in lote:
+                if not futuro.done():
+                    futuro.set_exception(e)
+            return
+
+        for (_, futuro), vetor in zip(lote, vetores):
+            if not futuro.done():
+                futuro.set_result(vetor)
+
+    def metricas(self) -> dict:
+        lotes = self._metricas["lotes"]
+        return {
+            **self._metricas,
+            "media_por_lote": round(self._metricas["pedidos"] / lotes, 2) if lotes else 0.0,
+            "na_fila": len(self._fila),
+        }
@@ -0,0 +1,210 @@
+"""
+Worker de embeddings em segundo plano
+As rotas gravam a ideia com embedding_status = 'pending' e respondem na hora;
+estas tasks pegam lotes pendentes (FOR UPDATE SKIP LOCKED), geram os embeddings
+e atualizam a coluna embedding. Falhas são tentadas de novo com backoff exponencial.
+O lote é reservado numa transação curta (embedding_proxima_tentativa = agora + EMBEDDING_RESERVA):
+nenhuma conexão nem lock fica preso durante a chamada à OpenAI, e o resultado é gravado
+numa segunda transação só se a ideia não mudou nesse meio tempo.
+"""
+
+import asyncio
+import os
+
+import db_async
+from embedding_cache import hash_texto, texto_para_embedding
+from logs import obter_logger
+
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "2"))
+EMBEDDING_LOTE = int(os.getenv("EMBEDDING_LOTE", "32"))  # ideias por lote
+EMBEDDING_INTERVALO = float(os.getenv("EMBEDDING_INTERVALO", "5"))  # segundos entre varreduras sem trabalho
+EMBEDDING_MAX_TENTATIVAS = int(os.getenv("EMBEDDING_MAX_TENTATIVAS", "5"))
+EMBEDDING_BACKOFF_BASE = float(os.getenv("EMBEDDING_BACKOFF_BASE", "10"))  # segundos (dobra a cada tentativa)
+EMBEDDING_BACKOFF_MAX = float(os.getenv("EMBEDDING_BACKOFF_MAX", "3600"))
+EMBEDDING_RESERVA = float(os.getenv("EMBEDDING_RESERVA", "300"))  # segundos; depois disso outro worker pode pegar
+
+logger = obter_logger("embedding_worker")
+
+# Valores de ideias.embedding_status
+STATUS_PENDENTE = "pending"
+STATUS_PRONTO = "ready"
+STATUS_FALHOU = "failed"
+
+
+def erro_permanente(erro: BaseException) -> bool:
+    """Erro que não muda tentando de novo (ex.: 400 da OpenAI para um texto inválido); rate limit e falhas de rede não"""
+    return getattr(erro, "status_code", None) in (400, 422)
+
+
+def calcular_backoff(tentativas: int) -> float:
+    """Segundos até a próxima tentativa (10s, 20s, 40s, ... até EMBEDDING_BACKOFF_MAX)"""
+    return min(EMBEDDING_BACKOFF_BASE * (2 ** max(tentativas - 1, 0)), EMBEDDING_BACKOFF_MAX)
+
+
+class WorkerEmbeddings:
+    """Pool de tasks asyncio que processa a fila de embeddings pendentes"""
+
+    def __init__(self, gerar, workers: int = EMBEDDING_WORKERS, lote: int = EMBEDDING_LOTE,
+                 intervalo: float = EMBEDDING_INTERVALO, max_tentativas: int = EMBEDDING_MAX_TENTATIVAS,
+                 ao_atualizar=None, reserva: float = EMBEDDING_RESERVA):
+        self.gerar = gerar  # async (texto) -> embedding; levanta a exceção real em caso de erro
+        self.ao_atualizar = ao_atualizar  # (usuario_ids) depois de gravar embeddings (ex.: invalidar cache de buscas)
+        self.workers = workers
+        self.lote = lote
+        self.intervalo = intervalo
+        self.max_tentativas = max_tentativas
+        self.reserva = reserva
+        self._tasks = []
+        self._acordar = None  # criado em iniciar(), dentro do event loop do servidor
+        self._metricas = {
+            "lotes": 0,
+            "processadas": 0,
+            "falhas": 0,
+            "desistencias": 0,
+            "erros_worker": 0,
+        }
+
+    def iniciar(self):
+        if self._tasks:
+            return
+        self._acordar = asyncio.Event()
+        for i in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._executar(), name=f"worker-embeddings-{i}"))
+        logger.info("Worker de embeddings iniciado (%d task(s), lotes de %d)", self.workers, self.lote)
+
+    async def parar(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notificar(self):
+        """Avisar que há trabalho novo (evita esperar a próxima varredura)"""
+        if self._acordar:
+            self._acordar.set()
+
+    async def _executar(self):
+        while True:
+            try:
+                processadas = await self.processar_lote()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self._metricas["erros_worker"] += 1
+                logger.exception("Erro no worker de embeddings")
+                processadas = 0
+
+            if processadas:
+                continue  # ainda pode haver mais pendentes
+
+            self._acordar.clear()
+            try:
+                await asyncio.wait_for(self._acordar.wait(), timeout=self.intervalo)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _reservar_lote(self) -> list:
+        """Pegar um lote pendente e reservá-lo (transação curta; a conexão volta para o pool logo)"""
+        async with db_async.conexao() as conn, conn.cursor() as cur:
+            # SKIP LOCKED: vários workers (e processos) dividem a fila sem pegar a mesma linha;
+            # a reserva em embedding_proxima_tentativa esconde o lote dos outros até gravar o resultado
+            await cur.execute(
+                """
+                WITH lote AS (
+                    SELECT id
+                    FROM ideias
+                    WHERE embedding_status = %s
+                      AND (embedding_proxima_tentativa IS NULL OR embedding_proxima_tentativa <= NOW())
+                    ORDER BY id
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                UPDATE ideias i
+                SET embedding_proxima_tentativa = NOW() + make_interval(secs => %s)
+                FROM lote
+                WHERE i.id = lote.id
+                RETURNING i.id, i.usuario_id, i.titulo, i.tag, i.ideia, i.conteudo_hash, i.embedding_tentativas
+                """,
+                (STATUS_PENDENTE, self.lote, self.reserva)
+            )
+            pendentes = await cur.fetchall()
+            await conn.commit()
+        return pendentes
+
+    async def processar_lote(self) -> int:
+        """Processar um lote de ideias pendentes; retorna quantas foram pegas"""
+        pendentes = await self._reservar_lote()
+        if not pendentes:
+            return 0
+
+        # Sem conexão aberta durante a chamada à OpenAI
+        textos = [texto_para_embedding(p["titulo"], p["tag"], p["ideia"]) for p in pendentes]
+        resultados = await asyncio.gather(*(self.gerar(t) for t in textos), return_exceptions=True)
+
+        # Uma linha de VALUES por ideia: (id, embedding, embedding_hash, status, tentativas, backoff, erro, conteudo_hash)
+        linhas = []
+        prontas = falhas = 0
+        for pendente, texto, embedding in sorted(zip(pendentes, textos, resultados),
+                                                 key=lambda item: (item[0]["usuario_id"], item[0]["id"])):
+            if not isinstance(embedding, BaseException) and embedding is not None:
+                linhas.append((pendente["id"], db_async.para_vetor(embedding), hash_texto(texto), STATUS_PRONTO,
+                               0, None, None, pendente["conteudo_hash"]))
+                prontas += 1
+                continue
+
+            if isinstance(embedding, BaseException):
+                erro = f"{type(embedding).__name__}: {embedding}"
+            else:
+                erro = "Embedding não gerado"
+            tentativas = (pendente["embedding_tentativas"] or 0) + 1
+            desistir = tentativas >= self.max_tentativas or (
+                isinstance(embedding, BaseException) and erro_permanente(embedding)
+            )
+            if not desistir:
+                logger.warning("Embedding da ideia %s falhou (tentativa %d): %s", pendente["id"], tentativas, erro)
+            linhas.append((pendente["id"], None, None, STATUS_FALHOU if desistir else STATUS_PENDENTE,
+                           tentativas, calcular_backoff(tentativas), erro[:500], pendente["conteudo_hash"]))
+            falhas += 1
+            if desistir:
+                self._metricas["desistencias"] += 1
+
+        # Um UPDATE só para o lote inteiro (o trigger de versoes_ideias é por comando), em ordem de
+        # usuario_id. Só grava se a ideia continua pendente com o mesmo texto: uma edição (ou um
+        # embedding enviado pela rota) durante a chamada à OpenAI tem prioridade
+        valores = ", ".join(["(%s::bigint, %b::vector, %s::text, %s::text, %s::int, %s::float8, %s::text, %s::text)"]
+                            * len(linhas))
+        async with db_async.conexao() as conn, conn.cursor() as cur:
+            await cur.execute(
+                f"""
+                UPDATE ideias i
+                SET embedding = COALESCE(v.embedding, i.embedding),
+                    embedding_hash = COALESCE(v.embedding_hash, i.embedding_hash),
+                    embedding_status = v.status,
+                    embedding_tentativas = v.tentativas,
+                    embedding_proxima_tentativa = NOW() + make_interval(secs => v.backoff),
+                    embedding_erro = v.erro
+                FROM (VALUES {valores})
+                    AS v (id, embedding, embedding_hash, status, tentativas, backoff, erro, conteudo_hash)
+                WHERE i.id = v.id
+                  AND i.embedding_status = %s
+                  AND i.conteudo_hash IS NOT DISTINCT FROM v.conteudo_hash
+                RETURNING i.usuario_id, i.embedding_status
+                """,
+                [valor for linha in linhas for valor in linha] + [STATUS_PENDENTE]
+            )
+            gravadas = await cur.fetchall()
+            await conn.commit()
+
+        usuarios = {g["usuario_id"] for g in gravadas if g["embedding_status"] == STATUS_PRONTO}
+        if usuarios and self.ao_atualizar:
+            self.ao_atualizar(usuarios)
+        self._metricas["lotes"] += 1
+        self._metricas["processadas"] += prontas
+        self._metricas["falhas"] += falhas
+        return len(pendentes)
+
+    def metricas(self) -> dict:
+        return {
+            **self._metricas,
+            "tasks_ativas": sum(1 for t in self._tasks if not t.done()),
+        }
@@ -0,0 +1,275 @@
+"""
+Importação em massa de ideias (POST /api/ideias/import)
+O corpo (NDJSON ou CSV) é guardado num arquivo temporário conforme chega (em memória até
+IMPORTACAO_MEMORIA bytes, depois em disco, no máximo IMPORTACAO_MAX_BYTES): o corpo não pode ser
+lido depois da resposta, então o arquivo inteiro é guardado antes. A rota responde com o id do
+job e o arquivo é processado em segundo plano. A cada IMPORTACAO_LOTE ideias válidas um COPY grava o lote em ideias
+(embedding_status = 'pending') e o progresso do job em importacoes, na mesma transação.
+O worker gera os embeddings depois.
+"""
+
+import codecs
+import csv
+import json
+import os
+import tempfile
+
+from fastapi.concurrency import run_in_threadpool
+
+import db_async
+from embedding_cache import hash_texto, texto_para_embedding
+from embedding_worker import STATUS_PENDENTE
+from logs import obter_logger
+
+IMPORTACAO_LOTE = int(os.getenv("IMPORTACAO_LOTE", "1000"))  # ideias por COPY
+IMPORTACAO_MEMORIA = int(os.getenv("IMPORTACAO_MEMORIA", str(8 * 1024 * 1024)))  # bytes do arquivo em memória
+IMPORTACAO_MAX_BYTES = int(os.getenv("IMPORTACAO_MAX_BYTES", str(100 * 1024 * 1024)))  # tamanho máximo do arquivo
+IMPORTACAO_PEDACO = 64 * 1024  # bytes por leitura do arquivo guardado
+
+# Valores de importacoes.status
+STATUS_PROCESSANDO = "processando"
+STATUS_CONCLUIDA = "concluida"
+STATUS_INTERROMPIDA = "interrompida"
+
+FORMATOS = ("ndjson", "csv")
+
+# Tamanhos máximos das colunas de ideias
+TITULO_MAX = 255
+TAG_MAX = 100
+
+logger = obter_logger("importacao")
+
+
+class ArquivoGrandeDemaisError(Exception):
+    """O corpo da importação passou de IMPORTACAO_MAX_BYTES"""
+
+    def __init__(self, limite: int):
+        self.limite = limite
+        super().__init__(f"Arquivo maior que {limite} bytes")
+
+
+def detectar_formato(content_type: str):
+    """Formato pelo Content-Type (text/csv ou application/x-ndjson)"""
+    content_type = (content_type or "").lower()
+    if "csv" in content_type:
+        return "csv"
+    if "ndjson" in content_type or "jsonlines" in content_type or "json" in content_type:
+        return "ndjson"
+    return None
+
+
+async def guardar_corpo(stream, limite: int = IMPORTACAO_MAX_BYTES):
+    """
+    Copiar o corpo da requisição para um arquivo temporário (o corpo não pode ser lido depois da resposta).
+    Lança ArquivoGrandeDemaisError ao passar de `limite` bytes, sem ler o resto.
+    """
+    arquivo = tempfile.SpooledTemporaryFile(max_size=IMPORTACAO_MEMORIA)
+    tamanho = 0
+    try:
+        async for pedaco in stream:
+            tamanho += len(pedaco)
+            if tamanho > limite:
+                raise ArquivoGrandeDemaisError(limite)
+            # Acima de IMPORTACAO_MEMORIA a escrita vai para o disco: fora do event loop
+            await run_in_threadpool(arquivo.write, pedaco)
+    except BaseException:
+        arquivo.close()
+        raise
+    arquivo.seek(0)
+    return arquivo
+
+
+async def pedacos_do_arquivo(arquivo):
+    while True:
+        pedaco = await run_in_threadpool(arquivo.read, IMPORTACAO_PEDACO)
+        if not pedaco:
+            return
+        yield pedaco
+
+
+async def linhas_do_stream(stream):
+    """Quebrar os pedaços de bytes em linhas de texto (com o \\n), decodificando UTF-8 aos poucos"""
+    decodificador = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    resto = ""
+    async for pedaco in stream:
+        texto = resto + decodificador.decode(pedaco)
+        linhas = texto.split("\n")
+        resto = linhas.pop()
+        for linha in linhas:
+            yield linha + "\n"
+    resto += decodificador.decode(b"", final=True)
+    if resto:
+        yield resto
+
+
+async def registros_ndjson(linhas):
+    """Um objeto JSON por linha; linhas inválidas viram None"""
+    async for linha in linhas:
+        if not linha.strip():
+            continue
+        try:
+            registro = json.loads(linha)
+        except ValueError:
+            yield None
+            continue
+        yield registro if isinstance(registro, dict) else None
+
+
+async def registros_csv(linhas):
+    """CSV com cabeçalho (titulo, tag, ideia); campos entre aspas podem ter quebras de linha"""
+    cabecalho = None
+    pendente = ""
+    aspas = 0
+    async for linha in linhas:
+        pendente += linha
+        aspas += linha.count('"')
+        if aspas % 2:
+            continue  # campo entre aspas continua na próxima linha
+        registro, pendente, aspas = pendente, "", 0
+        if not registro.strip():
+            continue
+        campos = next(csv.reader([registro]))
+        if cabecalho is None:
+            cabecalho = [campo.strip().lower() for campo in campos]
+            continue
+        yield dict(zip(cabecalho, campos))
+    if pendente.strip():
+        yield None  # aspas sem fechar no fim do arquivo
+
+
+def registros(formato: str, linhas):
+    return registros_csv(linhas) if formato == "csv" else registros_ndjson(linhas)
+
+
+def validar_registro(registro):
+    """(titulo, tag, ideia) prontos para o COPY, ou None se o registro é inválido"""
+    if not registro:
+        return None
+    titulo, tag, ideia = registro.get("titulo"), registro.get("tag"), registro.get("ideia")
+    if not isinstance(titulo, str) or not isinstance(ideia, str) or not isinstance(tag, (str, type(None))):
+        return None
+    titulo, ideia, tag = titulo.strip(), ideia.strip(), (tag or "").strip() or None
+    if not titulo or not ideia or len(titulo) > TITULO_MAX or (tag and len(tag) > TAG_MAX):
+        return None
+    return titulo, tag, ideia
+
+
+async def criar_importacao(conn, usuario_id: int, formato: str) -> dict:
+    async with conn.cursor() as cur:
+        await cur.execute(
+            "INSERT INTO importacoes (usuario_id, formato, status) VALUES (%s, %s, %s) RETURNING *",
+            (usuario_id, formato, STATUS_PROCESSANDO)
+        )
+        importacao = await cur.fetchone()
+    await conn.commit()
+    return importacao
+
+
+class ImportadorIdeias:
+    """
+    Lê os registros, valida e grava em lotes.
+    `antes_do_lote(quantidade)` (async) retorna quantas ideias do lote podem ser gravadas (ex.: saldo
+    da cota; o resto é oferecido de novo) ou recusa lançando exceção;
+    `depois_do_lote()` é chamado após cada lote gravado (ex.: acordar o worker de embeddings);
+    `lote_nao_gravado(quantidade)` recebe as ideias aceitas por antes_do_lote cujo COPY falhou (ex.: devolver a cota).
+    """
+
+    def __init__(self, importacao_id: int, usuario_id: int, antes_do_lote=None, depois_do_lote=None,
+                 lote_nao_gravado=None, lote: int = IMPORTACAO_LOTE):
+        self.importacao_id = importacao_id
+        self.usuario_id = usuario_id
+        self.antes_do_lote = antes_do_lote
+        self.depois_do_lote = depois_do_lote
+        self.lote_nao_gravado = lote_nao_gravado
+        self.lote = lote
+        self.linhas_lidas = 0
+        self.linhas_importadas = 0
+        self.linhas_invalidas = 0
+
+    async def executar(self, registros_entrada):
+        """Importar tudo; em caso de erro o job fica 'interrompida' (os lotes já gravados continuam)"""
+        pendentes = []
+        try:
+            async for registro in registros_entrada:
+                self.linhas_lidas += 1
+                valido = validar_registro(registro)
+                if valido is None:
+                    self.linhas_invalidas += 1
+                    continue
+                pendentes.append(valido)
+                if len(pendentes) >= self.lote:
+                    await self._gravar(pendentes)
+                    pendentes = []
+            if pendentes:
+                await self._gravar(pendentes)
+                pendentes = []
+        except BaseException as e:
+            # Lidas mas não gravadas não contam como importadas
+            await self._finalizar(STATUS_INTERROMPIDA, str(e) or type(e).__name__)
+            raise
+        await self._finalizar(STATUS_CONCLUIDA)
+
+    async def _gravar(self, linhas):
+        while linhas:
+            permitidas = len(linhas)
+            if self.antes_do_lote:
+                permitidas = min(await self.antes_do_lote(len(linhas)), len(linhas))
+            try:
+                await self._copiar(linhas[:permitidas])
+            except BaseException:
+                if self.antes_do_lote and self.lote_nao_gravado:
+                    self.lote_nao_gravado(permitidas)
+                raise
+            linhas = linhas[permitidas:]
+
+    async def _copiar(self, linhas):
+        async with db_async.conexao() as conn, conn.cursor() as cur:
+            async with cur.copy(
+                "COPY ideias (titulo, tag, ideia, usuario_id, conteudo_hash, embedding_status, importacao_id) FROM STDIN"
+            ) as copy:
+                for titulo, tag, ideia in linhas:
+                    await copy.write_row((
+                        titulo, tag, ideia, self.usuario_id,
+                        hash_texto(texto_para_embedding(titulo, tag, ideia)), STATUS_PENDENTE, self.importacao_id,
+                    ))
+            await cur.execute(
+                """
+                UPDATE importacoes
+                SET linhas_lidas = %s,
+                    linhas_importadas = linhas_importadas + %s,
+                    linhas_invalidas = %s,
+                    atualizado_em = NOW()
+                WHERE id = %s
+                """,
+                (self.linhas_lidas, len(linhas), self.linhas_invalidas, self.importacao_id)
+            )
+            await conn.commit()
+
+        self.linhas_importadas += len(linhas)
+        if self.depois_do_lote:
+            self.depois_do_lote()
+
+    async def _finalizar(self, status: str, erro: str = None):
+        try:
+            async with db_async.conexao() as conn, conn.cursor() as cur:
+                await cur.execute(
+                    """
+                    UPDATE importacoes
+                    SET status = %s,
+                        linhas_lidas = %s,
+                        linhas_invalidas = %s,
+                        erro = %s,
+                        atualizado_em = NOW(),
+                        concluido_em = NOW()
+                    WHERE id = %s
+                    """,
+                    (status, self.linhas_lidas, self.linhas_invalidas, erro and erro[:500], self.importacao_id)
+                )
+                await conn.commit()
+        except Exception as e:
+            logger.warning("Erro ao finalizar importação %s: %s", self.importacao_id, e)
+
+        logger.info(
+            "Importação %s %s: %d lidas, %d importadas, %d inválidas",
+            self.importacao_id, status, self.linhas_lidas, self.linhas_importadas, self.linhas_invalidas
+        )
@@ -0,0 +1,187 @@
+"""
+Logs do backend
+- Saída em JSON (uma linha por evento) ou texto, com nível configurável
+- Handler com fila: a requisição só enfileira o registro; uma thread separada escreve no stdout
+- request_id por requisição (header X-Request-ID), propagado via contextvars
+- Amostragem para linhas de DEBUG muito frequentes
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_NIVEL = os.getenv("LOG_NIVEL", "INFO").upper()
+LOG_FORMATO = os.getenv("LOG_FORMATO", "json")  # json ou texto
+LOG_AMOSTRAGEM_DEBUG = float(os.getenv("LOG_AMOSTRAGEM_DEBUG", "1.0"))  # fração das linhas DEBUG mantidas
+
+# Logger raiz do projeto: os módulos usam obter_logger("app"), obter_logger("auth"), ...
+LOGGER_RAIZ = "sacola"
+
+request_id_atual: ContextVar[str] = ContextVar("request_id", default="-")
+
+# Atributos padrão do LogRecord (o resto veio de extra= e vai como campo no JSON)
+_ATRIBUTOS_PADRAO = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+_listener = None
+
+
+def obter_logger(nome: str) -> logging.Logger:
+    return logging.getLogger(f"{LOGGER_RAIZ}.{nome}")
+
+
+class FiltroRequestId(logging.Filter):
+    """Copiar o request_id do contexto para o registro (roda na thread da requisição)"""
+
+    def filter(self, record):
+        record.request_id = request_id_atual.get()
+        return True
+
+
+class FiltroAmostragem(logging.Filter):
+    """
+    Manter só uma fração dos registros de DEBUG (LOG_AMOSTRAGEM_DEBUG).
+    Um registro pode pedir a própria taxa: logger.debug(..., extra={"amostragem": 0.01})
+    """
+
+    def __init__(self, taxa_debug: float = LOG_AMOSTRAGEM_DEBUG):
+        super().__init__()
+        self.taxa_debug = taxa_debug
+
+    def filter(self, record):
+        taxa = getattr(record, "amostragem", None)
+        if taxa is None:
+            if record.levelno > logging.DEBUG:
+                return True
+            taxa = self.taxa_debug
+        return taxa >= 1.0 or random.random() < taxa
+
+
+class FormatadorJSON(logging.Formatter):
+    """Uma linha JSON por registro; campos de extra= entram no objeto"""
+
+    def format(self, record):
+        evento = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        for chave, valor in record.__dict__.items():
+            if chave not in _ATRIBUTOS_PADRAO and chave != "amostragem":
+                evento[chave] = valor
+        if record.exc_info:
+            evento["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            evento["exc"] = record.exc_text
+        return json.dumps(evento, ensure_ascii=False, default=str)
+
+
+class FormatadorTexto(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s [%(request_id)s] %(name)s: %(message)s")
+
+
+class _HandlerFila(QueueHandler):
+    """
+    QueueHandler que resolve a mensagem e o traceback antes de enfileirar,
+    mas deixa a formatação final (JSON/texto) para a thread do listener
+    """
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configurar_logs(nivel: str = LOG_NIVEL, formato: str = LOG_FORMATO):
+    """Configurar o logger "sacola" (pode ser chamado mais de uma vez)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    saida = logging.StreamHandler(sys.stdout)
+    saida.setFormatter(FormatadorJSON() if formato == "json" else FormatadorTexto())
+
+    fila = queue.SimpleQueue()
+    handler = _HandlerFila(fila)
+    handler.addFilter(FiltroAmostragem())
+    handler.addFilter(FiltroRequestId())
+
+    raiz = logging.getLogger(LOGGER_RAIZ)
+    raiz.setLevel(nivel)
+    raiz.addHandler(handler)
+    raiz.propagate = False
+
+    _listener = QueueListener(fila, saida, respect_handler_level=True)
+    _listener.start()
+    atexit.register(parar_logs)
+
+
+def parar_logs():
+    """Esvaziar a fila e parar a thread de escrita"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class MiddlewareRequestId:
+    """
+    Middleware ASGI: define o request_id da requisição (header X-Request-ID ou um novo),
+    devolve o mesmo header na resposta e registra uma linha de acesso com a duração
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.logger = obter_logger("http")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for nome, valor in scope.get("headers", ()):
+            if nome == b"x-request-id":
+                request_id = valor.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex[:16]
+        token = request_id_atual.set(request_id)
+
+        inicio = time.perf_counter()
+        status = 500
+
+        async def enviar(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+                mensagem.setdefault("headers", [])
+                mensagem["headers"] = list(mensagem["headers"]) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            self.logger.info(
+                "%s %s %s", scope["method"], scope["path"], status,
+                extra={
+                    "metodo": scope["method"],
+                    "caminho": scope["path"],
+                    "status": status,
+                    "duracao_ms": round((time.perf_counter() - inicio) * 1000, 2),
+                },
+            )
+            request_id_atual.reset(token)
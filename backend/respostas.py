@@ -0,0 +1,71 @@
+"""
+Respostas JSON rápidas (opt-in com JSON_RAPIDO=1)
+As linhas que vêm do banco já têm os tipos certos: em vez de validar cada uma com o response_model
+e converter com o encoder padrão, um serializador pronto por modelo só escolhe os campos do modelo
+e o orjson gera os bytes direto (datetime e float nativos).
+Sem o orjson instalado, usa o json da stdlib (mesma saída, mais lento).
+"""
+
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_RAPIDO = os.getenv("JSON_RAPIDO", "false").lower() in ("1", "true", "sim")
+
+
+def _padrao(valor):
+    """Tipos que o orjson não serializa sozinho (ex.: numeric do Postgres vem como Decimal)"""
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()  # só no fallback com json da stdlib
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+if orjson is not None:
+    def dumps(dados) -> bytes:
+        # OPT_UTC_Z: "Z" para UTC, igual ao pydantic
+        return orjson.dumps(dados, default=_padrao, option=orjson.OPT_UTC_Z)
+else:
+    def dumps(dados) -> bytes:
+        return json.dumps(dados, default=_padrao, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class SerializadorModelo:
+    """
+    Serializador pronto para linhas (dicts) no formato de um modelo pydantic, sem validação.
+    Só os campos do modelo presentes na linha vão para a resposta (como response_model_exclude_unset),
+    então colunas extras da consulta (ex.: usuario_id) não vazam.
+    """
+
+    def __init__(self, modelo):
+        self.modelo = modelo
+        self.campos = tuple(modelo.model_fields)
+
+    def _linha(self, linha) -> dict:
+        return {campo: linha[campo] for campo in self.campos if campo in linha}
+
+    def item(self, linha) -> bytes:
+        return dumps(self._linha(linha))
+
+    def lista(self, linhas) -> bytes:
+        return dumps([self._linha(linha) for linha in linhas])
+
+
+class RespostaJSONRapida(Response):
+    """Resposta JSON que aceita bytes já serializados (SerializadorModelo) ou qualquer valor para o dumps"""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
@@ -0,0 +1,147 @@
+"""
+Sugestões de títulos e tags (GET /api/ideias/sugestoes)
+Cada (usuário, campo) tem um índice de prefixos em memória com os valores distintos e a frequência:
+- prefixos curtos (até SUGESTOES_PROFUNDIDADE caracteres) ficam numa trie com o top-K já calculado
+- prefixos mais longos usam busca binária na lista ordenada (o intervalo já é pequeno)
+O índice é reconstruído quando a versão das ideias do usuário muda (versoes_ideias, ver cache_http.py).
+Usuários com valores distintos demais consultam o Postgres (índice lower(campo) text_pattern_ops).
+"""
+
+import bisect
+import heapq
+import os
+from collections import OrderedDict
+
+from cache_http import versao_ideias
+
+SUGESTOES_PROFUNDIDADE = int(os.getenv("SUGESTOES_PROFUNDIDADE", "4"))  # prefixos com top-K pronto
+SUGESTOES_LIMITE_MAX = int(os.getenv("SUGESTOES_LIMITE_MAX", "20"))  # K guardado em cada nó
+SUGESTOES_MAX_VALORES = int(os.getenv("SUGESTOES_MAX_VALORES", "50000"))  # acima disso, consulta o banco
+SUGESTOES_CACHE_MAX = int(os.getenv("SUGESTOES_CACHE_MAX", "1000"))  # índices (usuário, campo) em memória
+
+CAMPOS_SUGESTAO = ("titulo", "tag")
+
+
+def normalizar_prefixo(texto: str) -> str:
+    """Comparação sem diferenciar maiúsculas (mesma regra do lower() do índice no banco)"""
+    return texto.lstrip().lower()
+
+
+def _escapar_like(texto: str) -> str:
+    return texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class IndiceSugestoes:
+    """Valores distintos de um campo com a frequência, indexados por prefixo"""
+
+    __slots__ = ("valores", "chaves", "posicoes", "trie")
+
+    def __init__(self, frequencias):
+        # Ordem de relevância: mais frequente primeiro, depois alfabética
+        self.valores = sorted(frequencias, key=lambda item: (-item[1], item[0].lower(), item[0]))
+        # Lista ordenada pela chave normalizada (busca binária) -> posição no ranking
+        ordem = sorted(range(len(self.valores)), key=lambda i: self.valores[i][0].lower())
+        self.chaves = [self.valores[i][0].lower() for i in ordem]
+        self.posicoes = ordem
+
+        # Trie dos prefixos curtos: como os valores entram em ordem de relevância,
+        # os K primeiros que passam por um nó são o top-K daquele prefixo
+        self.trie = {}
+        for posicao, (valor, _) in enumerate(self.valores):
+            chave = valor.lower()
+            for tamanho in range(min(len(chave), SUGESTOES_PROFUNDIDADE) + 1):
+                melhores = self.trie.setdefault(chave[:tamanho], [])
+                if len(melhores) < SUGESTOES_LIMITE_MAX:
+                    melhores.append(posicao)
+
+    def buscar(self, prefixo: str, limite: int) -> list:
+        prefixo = normalizar_prefixo(prefixo)
+        if len(prefixo) <= SUGESTOES_PROFUNDIDADE:
+            posicoes = self.trie.get(prefixo, [])[:limite]
+        else:
+            inicio = bisect.bisect_left(self.chaves, prefixo)
+            fim = bisect.bisect_left(self.chaves, prefixo + "\uffff", inicio)
+            posicoes = heapq.nsmallest(limite, self.posicoes[inicio:fim])
+        return [self.valores[posicao] for posicao in posicoes]
+
+
+class CacheSugestoes:
+    """Índices de sugestões por (usuário, campo), válidos enquanto a versão das ideias não muda"""
+
+    def __init__(self, maximo: int = SUGESTOES_CACHE_MAX, max_valores: int = SUGESTOES_MAX_VALORES):
+        self.maximo = maximo
+        self.max_valores = max_valores
+        self._indices = OrderedDict()  # (usuario_id, campo) -> (versao, IndiceSugestoes ou None = usar o banco)
+        self._metricas = {
+            "hits": 0,
+            "reconstrucoes": 0,
+            "consultas_banco": 0,
+        }
+
+    async def sugerir(self, cur, usuario_id: int, campo: str, prefixo: str, limite: int) -> list:
+        """Top-`limite` valores distintos de `campo` que começam com `prefixo`: [(valor, frequencia)]"""
+        if campo not in CAMPOS_SUGESTAO:
+            raise ValueError(f"Campo sem sugestões: {campo}")
+
+        versao, _ = await versao_ideias(cur, usuario_id)
+        chave = (usuario_id, campo)
+        item = self._indices.get(chave)
+        if item is not None and item[0] == versao:
+            self._indices.move_to_end(chave)
+            self._metricas["hits"] += 1
+        else:
+            item = (versao, await self._construir(cur, usuario_id, campo))
+            self._indices[chave] = item
+            self._indices.move_to_end(chave)
+            while len(self._indices) > self.maximo:
+                self._indices.popitem(last=False)
+
+        indice = item[1]
+        if indice is None:
+            return await self._buscar_banco(cur, usuario_id, campo, prefixo, limite)
+        return indice.buscar(prefixo, limite)
+
+    async def _construir(self, cur, usuario_id: int, campo: str):
+        self._metricas["reconstrucoes"] += 1
+        await cur.execute(
+            f"""
+            SELECT {campo} AS valor, COUNT(*) AS frequencia
+            FROM ideias
+            WHERE usuario_id = %s
+              AND {campo} IS NOT NULL
+              AND {campo} <> ''
+            GROUP BY {campo}
+            LIMIT %s
+            """,
+            (usuario_id, self.max_valores + 1)
+        )
+        linhas = await cur.fetchall()
+        if len(linhas) > self.max_valores:
+            return None  # grande demais para a memória: consultas vão para o índice do banco
+        return IndiceSugestoes([(linha["valor"], linha["frequencia"]) for linha in linhas])
+
+    async def _buscar_banco(self, cur, usuario_id: int, campo: str, prefixo: str, limite: int) -> list:
+        """Prefixo via índice (usuario_id, lower(campo) text_pattern_ops)"""
+        self._metricas["consultas_banco"] += 1
+        await cur.execute(
+            f"""
+            SELECT {campo} AS valor, COUNT(*) AS frequencia
+            FROM ideias
+            WHERE usuario_id = %s
+              AND lower({campo}) LIKE %s
+              AND {campo} <> ''
+            GROUP BY {campo}
+            ORDER BY frequencia DESC, lower({campo}), {campo}
+            LIMIT %s
+            """,
+            (usuario_id, _escapar_like(normalizar_prefixo(prefixo)) + "%", limite)
+        )
+        return [(linha["valor"], linha["frequencia"]) for linha in await cur.fetchall()]
+
+    def metricas(self) -> dict:
+        consultas = self._metricas["hits"] + self._metricas["reconstrucoes"]
+        return {
+            **self._metricas,
+            "hit_rate": round(self._metricas["hits"] / consultas, 4) if consultas else 0.0,
+            "indices_em_memoria": len(self._indices),
+        }
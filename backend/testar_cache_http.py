@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""Testar os headers de cache HTTP (cache_http.py) com datas em fusos diferentes de UTC"""
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from cache_http import calcular_etag, headers_cache, nao_modificado
+
+try:
+    from zoneinfo import ZoneInfo
+    FUSOS = [timezone.utc, ZoneInfo("Etc/UTC"), ZoneInfo("America/Sao_Paulo"), timezone(timedelta(hours=-3))]
+except ImportError:  # Python 3.8
+    FUSOS = [timezone.utc, timezone(timedelta(hours=-3)), timezone(timedelta(hours=5, minutes=30))]
+
+
+def requisicao(**headers):
+    return SimpleNamespace(headers={nome.replace("_", "-"): valor for nome, valor in headers.items()})
+
+
+print("🧪 Testando cache_http.py...")
+momento_utc = datetime(2024, 3, 10, 15, 30, 45, 123456, tzinfo=timezone.utc)
+etag = calcular_etag(1, 7, "/api/ideias")
+
+for fuso in FUSOS:
+    momento = momento_utc.astimezone(fuso)
+    headers = headers_cache(etag, momento)
+    assert headers["Last-Modified"] == "Sun, 10 Mar 2024 15:30:45 GMT", (fuso, headers)
+
+    ultimo = headers["Last-Modified"]
+    assert nao_modificado(requisicao(if_modified_since=ultimo), etag, momento), fuso
+    assert not nao_modificado(requisicao(if_modified_since="Sun, 10 Mar 2024 15:30:44 GMT"), etag, momento), fuso
+    assert nao_modificado(requisicao(if_none_match=f"W/{etag}"), etag, momento), fuso
+    print(f"   ✅ {fuso}: {ultimo}")
+
+print("✅ Last-Modified e If-Modified-Since corretos em todos os fusos")
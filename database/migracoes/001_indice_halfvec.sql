@@ -0,0 +1,32 @@
+-- ============================================
+-- Migração 001: índice HNSW com embeddings halfvec
+-- Sacola de Ideias - busca com BUSCA_QUANTIZACAO=halfvec (backend/busca_vetorial.py)
+-- ============================================
+-- halfvec guarda 2 bytes por dimensão: o índice fica com metade do tamanho do
+-- idx_ideias_embedding (vector, 4 bytes por dimensão). O embedding completo continua na
+-- tabela; a busca pega candidatos por este índice e reordena pela distância exata.
+-- Requer pgvector >= 0.7.0. CREATE INDEX CONCURRENTLY não roda dentro de transação:
+--   psql -U seu_usuario -d sacola_ideias -f database/migracoes/001_indice_halfvec.sql
+
+-- Dimensão atual da coluna (1536 ou a definida pela migração 003)
+SELECT atttypmod AS dimensoes
+FROM pg_attribute
+WHERE attrelid = 'ideias'::regclass
+  AND attname = 'embedding' \gset
+
+-- A expressão precisa ser a mesma do ORDER BY da busca (ORDEM_QUANTIZADA em busca_vetorial.py)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_ideias_embedding_halfvec
+ON ideias
+USING hnsw ((embedding::halfvec(:dimensoes)) halfvec_cosine_ops)
+WITH (m = 16, ef_construction = 64);
+
+-- Tamanho dos índices vetoriais
+SELECT indexrelid::regclass AS indice,
+       pg_size_pretty(pg_relation_size(indexrelid)) AS tamanho
+FROM pg_index
+WHERE indrelid = 'ideias'::regclass
+  AND indexrelid::regclass::text LIKE 'idx_ideias_embedding%';
+
+-- Com BUSCA_QUANTIZACAO=halfvec no backend e a recall conferida (backend/benchmark_quantizacao.py),
+-- o índice completo deixa de ser usado e pode ser removido para liberar memória:
+-- DROP INDEX CONCURRENTLY IF EXISTS idx_ideias_embedding;
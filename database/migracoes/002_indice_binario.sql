@@ -0,0 +1,32 @@
+-- ============================================
+-- Migração 002: índice HNSW com embeddings binários (binary quantization)
+-- Sacola de Ideias - busca com BUSCA_QUANTIZACAO=binaria (backend/busca_vetorial.py)
+-- ============================================
+-- binary_quantize guarda 1 bit por dimensão (o sinal): o índice fica ~32x menor que o
+-- idx_ideias_embedding. A distância de Hamming é aproximada, então a busca pega
+-- BUSCA_RESCORE_FATOR x candidatos por este índice e reordena pelo embedding completo.
+-- Requer pgvector >= 0.7.0. CREATE INDEX CONCURRENTLY não roda dentro de transação:
+--   psql -U seu_usuario -d sacola_ideias -f database/migracoes/002_indice_binario.sql
+
+-- Dimensão atual da coluna (1536 ou a definida pela migração 003)
+SELECT atttypmod AS dimensoes
+FROM pg_attribute
+WHERE attrelid = 'ideias'::regclass
+  AND attname = 'embedding' \gset
+
+-- A expressão precisa ser a mesma do ORDER BY da busca (ORDEM_QUANTIZADA em busca_vetorial.py)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_ideias_embedding_binario
+ON ideias
+USING hnsw ((binary_quantize(embedding)::bit(:dimensoes)) bit_hamming_ops)
+WITH (m = 16, ef_construction = 64);
+
+-- Tamanho dos índices vetoriais
+SELECT indexrelid::regclass AS indice,
+       pg_size_pretty(pg_relation_size(indexrelid)) AS tamanho
+FROM pg_index
+WHERE indrelid = 'ideias'::regclass
+  AND indexrelid::regclass::text LIKE 'idx_ideias_embedding%';
+
+-- Com BUSCA_QUANTIZACAO=binaria no backend e a recall conferida (backend/benchmark_quantizacao.py),
+-- o índice completo deixa de ser usado e pode ser removido para liberar memória:
+-- DROP INDEX CONCURRENTLY IF EXISTS idx_ideias_embedding;
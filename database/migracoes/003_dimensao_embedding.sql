@@ -0,0 +1,72 @@
+-- ============================================
+-- Migração 003: dimensão dos embeddings (EMBEDDING_DIMENSOES no backend)
+-- Sacola de Ideias - embeddings encurtados (Matryoshka) do text-embedding-3-small
+-- ============================================
+-- Uso (a mesma dimensão configurada em EMBEDDING_DIMENSOES):
+--   psql -U seu_usuario -d sacola_ideias -v dimensoes=512 -f database/migracoes/003_dimensao_embedding.sql
+--
+-- Dimensão menor que a atual: os embeddings são encurtados no próprio banco, sem chamar a OpenAI
+-- (os primeiros N valores renormalizados = o que a API devolve com dimensions=N).
+-- Dimensão maior: não dá para recuperar os valores cortados; os embeddings são apagados e voltam
+-- para a fila (embedding_status = 'pending'), e o worker do backend gera todos de novo.
+--
+-- Requer pgvector >= 0.7.0 (subvector, l2_normalize). A tabela ideias fica bloqueada até o fim
+-- (ALTER COLUMN reescreve a tabela e o índice HNSW é recriado): rodar numa janela de manutenção,
+-- com o backend parado, e subir de novo já com EMBEDDING_DIMENSOES = dimensoes.
+
+\set ON_ERROR_STOP on
+
+\if :{?dimensoes}
+\else
+    \echo 'Informe a dimensão: psql ... -v dimensoes=512 -f database/migracoes/003_dimensao_embedding.sql'
+    \quit
+\endif
+
+SELECT atttypmod AS dimensoes_atuais,
+       atttypmod >= :dimensoes AS encurtar
+FROM pg_attribute
+WHERE attrelid = 'ideias'::regclass
+  AND attname = 'embedding' \gset
+
+\echo 'Embeddings: ' :dimensoes_atuais ' -> ' :dimensoes ' dimensões'
+
+BEGIN;
+
+-- O cache guarda cada dimensão com a própria chave (modelo@dimensões): a coluna aceita qualquer tamanho
+ALTER TABLE embedding_cache ALTER COLUMN embedding TYPE vector;
+
+-- Índices vetoriais dependem do tipo da coluna (os das migrações 001/002 são recriados rodando-as de novo)
+DROP INDEX IF EXISTS idx_ideias_embedding;
+DROP INDEX IF EXISTS idx_ideias_embedding_halfvec;
+DROP INDEX IF EXISTS idx_ideias_embedding_binario;
+
+\if :encurtar
+ALTER TABLE ideias
+    ALTER COLUMN embedding TYPE vector(:dimensoes)
+    USING l2_normalize(subvector(embedding, 1, :dimensoes))::vector(:dimensoes);
+\else
+ALTER TABLE ideias
+    ALTER COLUMN embedding TYPE vector(:dimensoes)
+    USING NULL::vector(:dimensoes);
+
+-- Reprocessar tudo pelo worker (backend/embedding_worker.py)
+UPDATE ideias
+SET embedding_status = 'pending',
+    embedding_hash = NULL,
+    embedding_tentativas = 0,
+    embedding_proxima_tentativa = NULL,
+    embedding_erro = NULL;
+\endif
+
+CREATE INDEX idx_ideias_embedding
+ON ideias
+USING hnsw (embedding vector_cosine_ops)
+WITH (m = 16, ef_construction = 64);
+
+COMMIT;
+
+-- Tamanho da tabela e do índice com a nova dimensão
+SELECT pg_size_pretty(pg_table_size('ideias')) AS tabela,
+       pg_size_pretty(pg_relation_size('idx_ideias_embedding')) AS indice_hnsw,
+       count(*) FILTER (WHERE embedding_status = 'pending') AS pendentes
+FROM ideias;
@@ -0,0 +1,59 @@
+-- ============================================
+-- Migração 004: gatilhos de ideias ignoram as colunas de controle do worker
+-- Sacola de Ideias - bancos criados antes desta mudança no schema.sql
+-- ============================================
+-- O worker de embeddings (backend/embedding_worker.py) reserva lotes e grava tentativas e erros
+-- com UPDATE. Antes, cada um desses UPDATE mudava updated_at e incrementava versoes_ideias
+-- (ETag das listagens, trie de sugestões, contagem da estratégia de busca) sem o conteúdo mudar.
+-- Depois desta migração:
+-- - updated_at só muda quando titulo, tag, ideia ou data mudam;
+-- - a versão só muda quando muda uma coluna que aparece nas respostas (inclui embedding_status).
+-- Não bloqueia a tabela por mais que a troca do gatilho:
+--   psql -U seu_usuario -d sacola_ideias -f database/migracoes/004_gatilhos_ideias.sql
+
+BEGIN;
+
+DROP TRIGGER IF EXISTS update_ideias_updated_at ON ideias;
+CREATE TRIGGER update_ideias_updated_at
+    BEFORE UPDATE OF titulo, tag, ideia, data ON ideias
+    FOR EACH ROW
+    WHEN ((OLD.titulo, OLD.tag, OLD.ideia, OLD.data) IS DISTINCT FROM (NEW.titulo, NEW.tag, NEW.ideia, NEW.data))
+    EXECUTE FUNCTION update_updated_at_column();
+
+CREATE OR REPLACE FUNCTION incrementar_versao_ideias()
+RETURNS TRIGGER AS $$
+DECLARE
+    usuarios BIGINT[];
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        UPDATE versoes_ideias SET versao = versao + 1, atualizado_em = CURRENT_TIMESTAMP;
+        RETURN NULL;
+    ELSIF TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT usuario_id) INTO usuarios FROM novas;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(DISTINCT usuario_id) INTO usuarios FROM antigas;
+    ELSE
+        SELECT array_agg(DISTINCT usuario_id) INTO usuarios
+        FROM (
+            SELECT unnest(ARRAY[n.usuario_id, a.usuario_id]) AS usuario_id
+            FROM novas n
+            JOIN antigas a ON a.id = n.id
+            WHERE (n.usuario_id, n.titulo, n.tag, n.ideia, n.data, n.updated_at,
+                   n.conteudo_hash, n.embedding_hash, n.embedding_status)
+                  IS DISTINCT FROM
+                  (a.usuario_id, a.titulo, a.tag, a.ideia, a.data, a.updated_at,
+                   a.conteudo_hash, a.embedding_hash, a.embedding_status)
+        ) afetadas;
+    END IF;
+
+    INSERT INTO versoes_ideias (usuario_id, versao, atualizado_em)
+    SELECT usuario_id, 1, CURRENT_TIMESTAMP
+    FROM unnest(usuarios) AS usuario_id
+    WHERE usuario_id IS NOT NULL
+    ON CONFLICT (usuario_id)
+    DO UPDATE SET versao = versoes_ideias.versao + 1, atualizado_em = EXCLUDED.atualizado_em;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
@@ -0,0 +1,11 @@
+-- ============================================
+-- Migração 005: remove o índice textual antigo do título
+-- Sacola de Ideias - bancos criados antes da busca full-text em busca_tsv
+-- ============================================
+-- A busca textual e a híbrida usam idx_ideias_busca_tsv (schema.sql, seção 11). O índice
+-- GIN idx_ideias_titulo, sobre to_tsvector('portuguese', titulo), não é usado por nenhuma
+-- consulta, mas era atualizado em cada INSERT e em cada UPDATE do título.
+-- DROP INDEX CONCURRENTLY não bloqueia escritas e não roda dentro de transação:
+--   psql -U seu_usuario -d sacola_ideias -f database/migracoes/005_remover_indice_titulo.sql
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_ideias_titulo;
@@ -15,12 +15,13 @@ CREATE TABLE IF NOT EXISTS ideias (
     data TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-    embedding vector(1536)  -- OpenAI text-embedding-3-small usa 1536 dimensões
+    -- OpenAI text-embedding-3-small usa 1536 dimensões (EMBEDDING_DIMENSOES padrão no backend).
+    -- Com outra EMBEDDING_DIMENSOES, rodar migracoes/003_dimensao_embedding.sql depois deste script
+    embedding vector(1536)
 );
 
 -- 3. Criar índices para melhorar performance
--- Índice para busca por título e tag (busca textual)
-CREATE INDEX IF NOT EXISTS idx_ideias_titulo ON ideias USING gin(to_tsvector('portuguese', titulo));
+-- Índice para filtro por tag (a busca textual usa idx_ideias_busca_tsv, seção 11)
 CREATE INDEX IF NOT EXISTS idx_ideias_tag ON ideias(tag);
 CREATE INDEX IF NOT EXISTS idx_ideias_data ON ideias(data DESC);
 
@@ -41,15 +42,17 @@ END;
 $$ language 'plpgsql';
 
 -- 5. Criar trigger para atualizar updated_at
+-- Só quando o conteúdo muda: o worker de embeddings atualiza as colunas embedding_* sem mexer em updated_at
 DROP TRIGGER IF EXISTS update_ideias_updated_at ON ideias;
 CREATE TRIGGER update_ideias_updated_at
-    BEFORE UPDATE ON ideias
+    BEFORE UPDATE OF titulo, tag, ideia, data ON ideias
     FOR EACH ROW
+    WHEN ((OLD.titulo, OLD.tag, OLD.ideia, OLD.data) IS DISTINCT FROM (NEW.titulo, NEW.tag, NEW.ideia, NEW.data))
     EXECUTE FUNCTION update_updated_at_column();
 
 -- 6. Função para buscar ideias por similaridade (usando cosine distance)
 CREATE OR REPLACE FUNCTION buscar_ideias_por_similaridade(
-    query_embedding vector(1536),
+    query_embedding vector,  -- mesma dimensão de ideias.embedding (EMBEDDING_DIMENSOES)
     similarity_threshold FLOAT DEFAULT 0.5,
     max_results INT DEFAULT 10
 )
@@ -87,3 +90,205 @@ COMMENT ON COLUMN ideias.titulo IS 'Título da ideia ou anotação';
 COMMENT ON COLUMN ideias.tag IS 'Tag opcional para categorização';
 COMMENT ON COLUMN ideias.ideia IS 'Conteúdo completo da ideia ou anotação';
 
+-- 8. Cache persistente de embeddings (evita chamar a OpenAI para textos repetidos)
+-- Chave: modelo + sha256 do texto normalizado (ver backend/embedding_cache.py)
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    modelo VARCHAR(100) NOT NULL,
+    texto_hash CHAR(64) NOT NULL,
+    embedding vector NOT NULL,  -- sem dimensão fixa: o modelo na chave inclui a dimensão (ex.: modelo@512)
+    criado_em TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (modelo, texto_hash)
+);
+
+COMMENT ON TABLE embedding_cache IS 'Embeddings já gerados, reaproveitados por buscas e edições com o mesmo texto';
+
+-- 9. Fingerprint do conteúdo que vira embedding (sha256 do texto normalizado)
+-- conteudo_hash: texto atual (titulo + tag + ideia); embedding_hash: texto usado para gerar o embedding salvo
+-- O backend só chama a OpenAI no UPDATE quando os dois são diferentes
+ALTER TABLE ideias ADD COLUMN IF NOT EXISTS conteudo_hash CHAR(64);
+ALTER TABLE ideias ADD COLUMN IF NOT EXISTS embedding_hash CHAR(64);
+
+-- Índice parcial para jobs de backfill encontrarem embeddings desatualizados sem varrer a tabela:
+-- SELECT id FROM ideias WHERE embedding_hash IS DISTINCT FROM conteudo_hash;
+CREATE INDEX IF NOT EXISTS idx_ideias_embedding_desatualizado
+ON ideias (id)
+WHERE embedding_hash IS DISTINCT FROM conteudo_hash;
+
+COMMENT ON COLUMN ideias.conteudo_hash IS 'sha256 do texto normalizado (titulo + tag + ideia) atual';
+COMMENT ON COLUMN ideias.embedding_hash IS 'sha256 do texto usado para gerar o embedding salvo';
+
+-- 10. Fila de embeddings (processada pelo worker em backend/embedding_worker.py)
+-- As rotas gravam a ideia com embedding_status = 'pending' e respondem sem esperar a OpenAI;
+-- o worker pega lotes com FOR UPDATE SKIP LOCKED e marca 'ready' (ou 'failed' após várias tentativas)
+ALTER TABLE ideias ADD COLUMN IF NOT EXISTS embedding_status VARCHAR(20) NOT NULL DEFAULT 'pending';
+ALTER TABLE ideias ADD COLUMN IF NOT EXISTS embedding_tentativas INT NOT NULL DEFAULT 0;
+ALTER TABLE ideias ADD COLUMN IF NOT EXISTS embedding_proxima_tentativa TIMESTAMP WITH TIME ZONE;
+ALTER TABLE ideias ADD COLUMN IF NOT EXISTS embedding_erro TEXT;
+
+-- Ideias antigas que já têm embedding (e cujo texto não mudou desde então) não entram na fila
+UPDATE ideias
+SET embedding_status = 'ready'
+WHERE embedding_status = 'pending'
+  AND embedding IS NOT NULL
+  AND embedding_hash IS NOT DISTINCT FROM conteudo_hash;
+
+-- Índice parcial: o worker só olha as linhas pendentes
+CREATE INDEX IF NOT EXISTS idx_ideias_embedding_pendente
+ON ideias (embedding_proxima_tentativa, id)
+WHERE embedding_status = 'pending';
+
+COMMENT ON COLUMN ideias.embedding_status IS 'pending (na fila), ready (embedding gerado) ou failed (desistiu após várias tentativas)';
+
+-- 11. Busca textual (full-text) sobre titulo, tag e ideia
+-- Coluna gerada e armazenada: o tsvector é calculado no INSERT/UPDATE e não a cada busca.
+-- Pesos: título (A) vale mais que a tag (B), que vale mais que o conteúdo (C)
+ALTER TABLE ideias ADD COLUMN IF NOT EXISTS busca_tsv tsvector
+GENERATED ALWAYS AS (
+    setweight(to_tsvector('portuguese', coalesce(titulo, '')), 'A') ||
+    setweight(to_tsvector('portuguese', coalesce(tag, '')), 'B') ||
+    setweight(to_tsvector('portuguese', coalesce(ideia, '')), 'C')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_ideias_busca_tsv ON ideias USING gin(busca_tsv);
+
+-- O índice antigo só sobre o título não é usado por nenhuma busca e custava em cada escrita
+DROP INDEX IF EXISTS idx_ideias_titulo;
+
+COMMENT ON COLUMN ideias.busca_tsv IS 'tsvector (portuguese) de titulo/tag/ideia para a busca textual e híbrida';
+
+-- 12. Listagem paginada por usuário (GET /api/ideias com cursor (data, id))
+-- usuario_id já existe nas instalações que usam login; garantir para bancos novos
+ALTER TABLE ideias ADD COLUMN IF NOT EXISTS usuario_id BIGINT;
+
+-- O cursor compara (data, id): data não pode ser NULL
+UPDATE ideias SET data = COALESCE(created_at, NOW()) WHERE data IS NULL;
+ALTER TABLE ideias ALTER COLUMN data SET NOT NULL;
+
+-- Cada página é uma descida no índice, sem OFFSET e sem ordenar todas as ideias do usuário
+CREATE INDEX IF NOT EXISTS idx_ideias_usuario_data_id
+ON ideias (usuario_id, data DESC, id DESC);
+
+-- 13. Saldo das cotas por usuário (backend/cotas.py)
+-- O controle é feito em memória (token bucket); o saldo é gravado aqui periodicamente
+-- para sobreviver a reinícios. Os limites vêm de assinaturas.limite_buscas / limite_embeddings.
+CREATE TABLE IF NOT EXISTS uso_cotas (
+    usuario_id BIGINT NOT NULL,
+    recurso VARCHAR(20) NOT NULL,
+    tokens DOUBLE PRECISION NOT NULL,
+    atualizado_em TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (usuario_id, recurso)
+);
+
+COMMENT ON TABLE uso_cotas IS 'Saldo do token bucket de cada usuário por recurso (buscas, embeddings)';
+
+-- 14. Importação em massa (POST /api/ideias/import, backend/importacao.py)
+-- Cada upload vira um job; o progresso é atualizado a cada lote gravado com COPY
+CREATE TABLE IF NOT EXISTS importacoes (
+    id BIGSERIAL PRIMARY KEY,
+    usuario_id BIGINT NOT NULL,
+    formato VARCHAR(10) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'processando',
+    linhas_lidas INT NOT NULL DEFAULT 0,
+    linhas_importadas INT NOT NULL DEFAULT 0,
+    linhas_invalidas INT NOT NULL DEFAULT 0,
+    erro TEXT,
+    criado_em TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    atualizado_em TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    concluido_em TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX IF NOT EXISTS idx_importacoes_usuario ON importacoes (usuario_id, id DESC);
+
+-- Ideias importadas guardam o job de origem
+ALTER TABLE ideias ADD COLUMN IF NOT EXISTS importacao_id BIGINT;
+
+COMMENT ON TABLE importacoes IS 'Jobs de importação em massa: processando, concluida ou interrompida';
+
+-- 15. Versão das ideias por usuário (ETag / Last-Modified em GET /api/ideias, backend/cache_http.py)
+-- Incrementada uma vez por comando (INSERT, UPDATE, DELETE, COPY) para cada usuário afetado.
+-- Diferente de MAX(updated_at), também muda quando ideias são apagadas.
+-- UPDATE só conta se mudou uma coluna que aparece nas respostas (COLUNAS_IDEIA no backend): a reserva
+-- e as novas tentativas do worker (embedding_tentativas, embedding_proxima_tentativa, embedding_erro)
+-- e o vetor em si não mudam a versão; a troca de embedding_status (pending -> ready) muda.
+CREATE TABLE IF NOT EXISTS versoes_ideias (
+    usuario_id BIGINT PRIMARY KEY,
+    versao BIGINT NOT NULL DEFAULT 0,
+    atualizado_em TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Cada gatilho só enxerga as tabelas de transição do próprio evento (novas e/ou antigas)
+CREATE OR REPLACE FUNCTION incrementar_versao_ideias()
+RETURNS TRIGGER AS $$
+DECLARE
+    usuarios BIGINT[];
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        UPDATE versoes_ideias SET versao = versao + 1, atualizado_em = CURRENT_TIMESTAMP;
+        RETURN NULL;
+    ELSIF TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT usuario_id) INTO usuarios FROM novas;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(DISTINCT usuario_id) INTO usuarios FROM antigas;
+    ELSE
+        SELECT array_agg(DISTINCT usuario_id) INTO usuarios
+        FROM (
+            SELECT unnest(ARRAY[n.usuario_id, a.usuario_id]) AS usuario_id
+            FROM novas n
+            JOIN antigas a ON a.id = n.id
+            WHERE (n.usuario_id, n.titulo, n.tag, n.ideia, n.data, n.updated_at,
+                   n.conteudo_hash, n.embedding_hash, n.embedding_status)
+                  IS DISTINCT FROM
+                  (a.usuario_id, a.titulo, a.tag, a.ideia, a.data, a.updated_at,
+                   a.conteudo_hash, a.embedding_hash, a.embedding_status)
+        ) afetadas;
+    END IF;
+
+    INSERT INTO versoes_ideias (usuario_id, versao, atualizado_em)
+    SELECT usuario_id, 1, CURRENT_TIMESTAMP
+    FROM unnest(usuarios) AS usuario_id
+    WHERE usuario_id IS NOT NULL
+    ON CONFLICT (usuario_id)
+    DO UPDATE SET versao = versoes_ideias.versao + 1, atualizado_em = EXCLUDED.atualizado_em;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Gatilhos por comando (FOR EACH STATEMENT): um COPY de 1000 ideias incrementa a versão uma vez
+DROP TRIGGER IF EXISTS versao_ideias_insert ON ideias;
+CREATE TRIGGER versao_ideias_insert
+    AFTER INSERT ON ideias
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION incrementar_versao_ideias();
+
+DROP TRIGGER IF EXISTS versao_ideias_update ON ideias;
+CREATE TRIGGER versao_ideias_update
+    AFTER UPDATE ON ideias
+    REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION incrementar_versao_ideias();
+
+DROP TRIGGER IF EXISTS versao_ideias_delete ON ideias;
+CREATE TRIGGER versao_ideias_delete
+    AFTER DELETE ON ideias
+    REFERENCING OLD TABLE AS antigas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION incrementar_versao_ideias();
+
+DROP TRIGGER IF EXISTS versao_ideias_truncate ON ideias;
+CREATE TRIGGER versao_ideias_truncate
+    AFTER TRUNCATE ON ideias
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION incrementar_versao_ideias();
+
+COMMENT ON TABLE versoes_ideias IS 'Versão das ideias de cada usuário (ETag das rotas de listagem e detalhe)';
+
+-- 16. Sugestões de títulos e tags por prefixo (GET /api/ideias/sugestoes, backend/sugestoes.py)
+-- O backend mantém um índice em memória por usuário; estes índices atendem os usuários
+-- com valores distintos demais para a memória (lower(campo) LIKE 'prefixo%')
+CREATE INDEX IF NOT EXISTS idx_ideias_usuario_titulo_prefixo
+ON ideias (usuario_id, lower(titulo) text_pattern_ops);
+
+CREATE INDEX IF NOT EXISTS idx_ideias_usuario_tag_prefixo
+ON ideias (usuario_id, lower(tag) text_pattern_ops)
+WHERE tag IS NOT NULL;
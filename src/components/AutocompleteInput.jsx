@@ -1,10 +1,15 @@
 import { useState, useEffect, useRef } from 'react'
+import { buscarSugestoes } from '../services/dbService'
+
+const LIMITE_SUGESTOES = 5
+const ESPERA_SUGESTOES_MS = 150
 
 function AutocompleteInput({ 
   value, 
   onChange, 
   placeholder, 
-  suggestions, 
+  campo, // 'titulo' ou 'tag': sugestões vêm de GET /api/ideias/sugestoes
+  excluir = '', // valor que não deve aparecer nas sugestões (ex.: o atual, na edição)
   icon,
   className = '',
   required = false 
@@ -14,28 +19,44 @@ function AutocompleteInput({
   const [selectedIndex, setSelectedIndex] = useState(-1)
   const inputRef = useRef(null)
   const containerRef = useRef(null)
+  const focadoRef = useRef(false)
 
   useEffect(() => {
-    // Só mostrar sugestões se o usuário estiver digitando ou focou no campo
-    if (suggestions.length > 0) {
-      if (value && value.length > 0) {
-        // Filtrar sugestões baseado no valor digitado
-        const filtered = suggestions
-          .filter(s => s.toLowerCase().includes(value.toLowerCase()))
-          .slice(0, 5)
-        
-        setFilteredSuggestions(filtered)
-        setIsOpen(filtered.length > 0 && filtered.some(s => s.toLowerCase() !== value.toLowerCase()))
-      } else {
-        // Se não houver valor, não mostrar sugestões automaticamente
-        setFilteredSuggestions([])
-        setIsOpen(false)
-      }
-    } else {
+    // Se não houver valor, não mostrar sugestões automaticamente
+    if (!value || value.length === 0) {
       setFilteredSuggestions([])
       setIsOpen(false)
+      return
+    }
+
+    // Pequena espera para não fazer uma requisição por tecla
+    let cancelado = false
+    const timeout = setTimeout(async () => {
+      try {
+        const valores = await buscarSugestoes(campo, value, LIMITE_SUGESTOES + 1)
+        if (cancelado) return // resposta de um valor que já mudou
+        const filtered = valores
+          .filter(s => s && s !== excluir)
+          .slice(0, LIMITE_SUGESTOES)
+        setFilteredSuggestions(filtered)
+        setIsOpen(
+          focadoRef.current &&
+          filtered.some(s => s.toLowerCase() !== value.toLowerCase())
+        )
+      } catch (error) {
+        // Sem sugestões se a API falhar: o campo continua funcionando
+        if (!cancelado) {
+          setFilteredSuggestions([])
+          setIsOpen(false)
+        }
+      }
+    }, ESPERA_SUGESTOES_MS)
+
+    return () => {
+      cancelado = true
+      clearTimeout(timeout)
     }
-  }, [value, suggestions])
+  }, [value, campo, excluir])
 
   useEffect(() => {
     const handleClickOutside = (event) => {
@@ -93,17 +114,15 @@ function AutocompleteInput({
           onChange={handleInputChange}
           onKeyDown={handleKeyDown}
           onFocus={() => {
+            focadoRef.current = true
             // Só mostrar sugestões se houver valor digitado
-            if (suggestions.length > 0 && value && value.length > 0) {
-              const filtered = suggestions
-                .filter(s => s.toLowerCase().includes(value.toLowerCase()))
-                .slice(0, 5)
-              if (filtered.length > 0) {
-                setFilteredSuggestions(filtered)
-                setIsOpen(true)
-              }
+            if (value && value.length > 0 && filteredSuggestions.length > 0) {
+              setIsOpen(true)
             }
           }}
+          onBlur={() => {
+            focadoRef.current = false
+          }}
           placeholder={placeholder}
           className={`modern-input w-full px-4 py-3 rounded-xl bg-gray-50 focus:bg-white focus:outline-none ${icon ? 'pl-10' : ''} ${className}`}
           required={required}
@@ -2,7 +2,7 @@ import { useState, useEffect } from 'react'
 import AutocompleteInput from './AutocompleteInput'
 import { showErrorToast } from '../utils/alerts'
 
-function IdeiaModal({ ideia, isOpen, onClose, onEdit, onCopy, titulosSugeridos = [], tagsSugeridas = [] }) {
+function IdeiaModal({ ideia, isOpen, onClose, onEdit, onCopy }) {
   const [copied, setCopied] = useState(false)
   const [editando, setEditando] = useState(false)
   const [titulo, setTitulo] = useState('')
@@ -184,7 +184,8 @@ function IdeiaModal({ ideia, isOpen, onClose, onEdit, onCopy, titulosSugeridos =
                     value={titulo}
                     onChange={setTitulo}
                     placeholder="Título da ideia"
-                    suggestions={titulosSugeridos.filter(t => t !== ideia.titulo)}
+                    campo="titulo"
+                    excluir={ideia.titulo}
                     required
                   />
                 </div>
@@ -194,7 +195,8 @@ function IdeiaModal({ ideia, isOpen, onClose, onEdit, onCopy, titulosSugeridos =
                     value={tag}
                     onChange={setTag}
                     placeholder="Tag (opcional)"
-                    suggestions={tagsSugeridas.filter(t => t !== ideia.tag && t)}
+                    campo="tag"
+                    excluir={ideia.tag || ''}
                   />
                 </div>
               </div>
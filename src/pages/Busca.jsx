@@ -13,8 +13,6 @@ function Busca() {
   const [apiKey, setApiKey] = useState(null) // Backend gerencia API Key, não precisa no frontend
   const [ideiaSelecionada, setIdeiaSelecionada] = useState(null)
   const [mostrarModal, setMostrarModal] = useState(false)
-  const [titulosSugeridos, setTitulosSugeridos] = useState([])
-  const [tagsSugeridas, setTagsSugeridas] = useState([])
   const timeoutRef = useRef(null)
 
   useEffect(() => {
@@ -23,29 +21,8 @@ function Busca() {
 
     // Carregar todas as ideias inicialmente
     carregarIdeias()
-    carregarSugestoes().catch(err => console.error('Erro ao carregar sugestões:', err))
   }, [])
 
-  const carregarSugestoes = async () => {
-    try {
-      const { buscarTodasIdeias } = await import('../services/dbService')
-      const ideias = await buscarTodasIdeias()
-      
-      // Extrair títulos únicos
-      const titulos = [...new Set(ideias.map(i => i.titulo).filter(Boolean))]
-      setTitulosSugeridos(titulos)
-      
-      // Extrair tags únicas
-      const tags = [...new Set(ideias.map(i => i.tag).filter(Boolean))]
-      setTagsSugeridas(tags)
-    } catch (error) {
-      console.log('Erro ao carregar sugestões:', error)
-      // Em caso de erro, não carregar sugestões (deixar vazio)
-      setTitulosSugeridos([])
-      setTagsSugeridas([])
-    }
-  }
-
   const carregarIdeias = async () => {
     try {
       const { buscarTodasIdeias } = await import('../services/dbService')
@@ -130,9 +107,6 @@ function Busca() {
         return r
       }))
     }
-    
-    // Recarregar sugestões
-    carregarSugestoes()
   }
 
   const handleCopy = () => {
@@ -169,9 +143,6 @@ function Busca() {
         await carregarIdeias()
       }
       
-      // Recarregar sugestões
-      await carregarSugestoes()
-      
       // Se estava editando essa ideia, fechar modal
       if (ideiaSelecionada && ideiaSelecionada.id === ideia.id) {
         setMostrarModal(false)
@@ -398,8 +369,6 @@ function Busca() {
         onClose={handleCloseModal}
         onEdit={handleEdit}
         onCopy={handleCopy}
-        titulosSugeridos={titulosSugeridos}
-        tagsSugeridas={tagsSugeridas}
       />
     </div>
   )
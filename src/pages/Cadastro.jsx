@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react'
+import { useState } from 'react'
 import { useTranslation } from 'react-i18next'
 import SacolaAnimacao from '../components/SacolaAnimacao'
 import AutocompleteInput from '../components/AutocompleteInput'
@@ -13,49 +13,12 @@ function Cadastro() {
   const [ideia, setIdeia] = useState('')
   const [mostrarSucesso, setMostrarSucesso] = useState(false)
   const [salvando, setSalvando] = useState(false)
-  const [titulosSugeridos, setTitulosSugeridos] = useState([])
-  const [tagsSugeridas, setTagsSugeridas] = useState([])
   const [editandoId, setEditandoId] = useState(null)
   const [imagemErro, setImagemErro] = useState(false)
 
   // Nota: A edição agora é feita diretamente no modal, então não precisamos mais
   // carregar ideias para editar aqui. Mas mantemos o código caso seja necessário.
 
-  // Carregar sugestões de títulos e tags das ideias existentes
-  useEffect(() => {
-    const carregarSugestoes = async () => {
-      try {
-        const { buscarTodasIdeias } = await import('../services/dbService')
-        const ideias = await buscarTodasIdeias()
-        
-        // Extrair títulos únicos
-        const titulos = [...new Set(ideias.map(i => i.titulo).filter(Boolean))]
-        setTitulosSugeridos(titulos)
-        
-        // Extrair tags únicas
-        const tags = [...new Set(ideias.map(i => i.tag).filter(Boolean))]
-        setTagsSugeridas(tags)
-      } catch (error) {
-        console.log('Erro ao carregar sugestões do banco, usando localStorage:', error)
-        // Fallback para localStorage
-        const ideias = JSON.parse(localStorage.getItem('sacola_ideias') || '[]')
-        const titulos = [...new Set(ideias.map(i => i.titulo).filter(Boolean))]
-        const tags = [...new Set(ideias.map(i => i.tag).filter(Boolean))]
-        setTitulosSugeridos(titulos)
-        setTagsSugeridas(tags)
-      }
-    }
-
-    carregarSugestoes()
-    
-    // Recarregar quando uma ideia for salva
-    if (mostrarSucesso) {
-      setTimeout(() => {
-        carregarSugestoes()
-      }, 300)
-    }
-  }, [mostrarSucesso])
-
   const handleSubmit = async (e) => {
     e.preventDefault()
     
@@ -258,18 +221,13 @@ function Cadastro() {
                       <path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M7 7h.01M7 3h5c.512 0 1.024.195 1.414.586l7 7a2 2 0 010 2.828l-7 7a2 2 0 01-2.828 0l-7-7A1.994 1.994 0 013 12V7a4 4 0 014-4z" />
                     </svg>
                     <span>{t('cadastro.titulo')}</span>
-                    {titulosSugeridos.length > 0 && (
-                      <span className="text-xs font-normal text-gray-400">
-                        ({titulosSugeridos.length} {t('cadastro.tagSugestoes', { count: titulosSugeridos.length })})
-                      </span>
-                    )}
                   </span>
                 </label>
                 <AutocompleteInput
                   value={titulo}
                   onChange={setTitulo}
                   placeholder={t('cadastro.tituloPlaceholder')}
-                  suggestions={titulosSugeridos}
+                  campo="titulo"
                   icon={
                     <svg className="w-4 h-4" fill="none" stroke="currentColor" viewBox="0 0 24 24">
                       <path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M7 7h.01M7 3h5c.512 0 1.024.195 1.414.586l7 7a2 2 0 010 2.828l-7 7a2 2 0 01-2.828 0l-7-7A1.994 1.994 0 013 12V7a4 4 0 014-4z" />
@@ -287,18 +245,13 @@ function Cadastro() {
                     </svg>
                     <span>{t('cadastro.tag')}</span>
                     <span className="text-xs font-normal text-gray-400">(opcional)</span>
-                    {tagsSugeridas.length > 0 && (
-                      <span className="text-xs font-normal text-gray-400">
-                        • {t('cadastro.tagSugestoes', { count: tagsSugeridas.length })}
-                      </span>
-                    )}
                   </span>
                 </label>
                 <AutocompleteInput
                   value={tag}
                   onChange={setTag}
                   placeholder="trabalho, pessoal, projeto..."
-                  suggestions={tagsSugeridas}
+                  campo="tag"
                   icon={
                     <svg className="w-4 h-4" fill="none" stroke="currentColor" viewBox="0 0 24 24">
                       <path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M7 7h.01M7 3h5c.512 0 1.024.195 1.414.586l7 7a2 2 0 010 2.828l-7 7a2 2 0 01-2.828 0l-7-7A1.994 1.994 0 013 12V7a4 4 0 014-4z" />
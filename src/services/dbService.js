@@ -77,6 +77,13 @@ export async function buscarTodasIdeias() {
   }
 }
 
+// Sugestões de títulos ou tags que começam com o prefixo (mais frequentes primeiro)
+export async function buscarSugestoes(campo, prefixo = '', limite = 10) {
+  const params = new URLSearchParams({ campo, prefixo, limite: String(limite) })
+  const sugestoes = await fetchAPI(`/ideias/sugestoes?${params}`)
+  return sugestoes.map(s => s.valor)
+}
+
 // Buscar ideia por ID
 export async function buscarIdeiaPorId(id) {
   try {
@@ -155,13 +162,15 @@ export async function deletarIdeia(id) {
 }
 
 // Buscar por similaridade (backend gera embedding automaticamente)
-export async function buscarPorSimilaridade(termoBusca) {
+// opcoes: { modo, limite, limiar, preset } (opcionais; o backend tem os padrões)
+export async function buscarPorSimilaridade(termoBusca, opcoes = {}) {
   try {
     // Backend gera embedding automaticamente, só enviar o termo
     return await fetchAPI('/ideias/buscar', {
       method: 'POST',
       body: JSON.stringify({
         termo: termoBusca,
+        ...opcoes,
       }),
     })
   } catch (error) {